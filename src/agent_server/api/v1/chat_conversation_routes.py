@@ -1,5 +1,5 @@
 
-from fastapi import APIRouter, Depends, Request, Response, Body
+from fastapi import APIRouter, Depends, Request, Response, Body, Query
 from fastapi.responses import Response
 
 from agent_server.app.chat.chat_conversation_service import ChatConversationService
@@ -13,6 +13,14 @@ async def chat_completions(pageIndex: int = Body(1),
     return await service.list_conversation(page_size=pageSize, page_num=pageIndex)
 
 
+@router.get("/page", summary="聊天会话游标分页")
+async def page_chat_conversation(cursor: str | None = Query(None, description="上一页返回的 next_cursor，为空时查询第一页"),
+                                 pageSize: int = Query(10, description="每页条数"),
+                                 withTotal: bool = Query(False, description="是否返回总条数估算值"),
+                                 service: ChatConversationService = Depends()):
+    return await service.page_conversation(cursor=cursor, page_size=pageSize, with_total=withTotal)
+
+
 @router.post("/add", summary="创建聊天会话")
 async def create_chat_conversation(name: str, service: ChatConversationService = Depends()):
     return await service.create_chat_conversation(name=name)
\ No newline at end of file
@@ -1,10 +1,10 @@
 import uuid
-from nltk import pr
 
 from fastapi import APIRouter, Request, Response, Body
 from fastapi.responses import StreamingResponse
 
 from agent_server.app.chat.chat_service import chat, chat_async
+from agent_server.app.chat.sse_stream import sse_stream, SSE_HEADERS
 from agent_server.schemas.chat.chat_request import ChatRequest
 from agent_server.utils.id_util import id_generator
 
@@ -28,9 +28,13 @@ async def chat_completions(request: Request, response: Response, data: ChatReque
     result_generator = chat_async(data)
     
     if streaming:
-        # 流式输出
-        return StreamingResponse(result_generator, media_type="text/event-stream", headers=headers)
+        # 流式输出：合并 token 后编码为 SSE 帧
+        return StreamingResponse(
+            sse_stream(result_generator, conversation_id),
+            media_type="text/event-stream",
+            headers=headers | SSE_HEADERS,
+        )
     else:
-        # 非流式，获取结果
-        result = await anext(result_generator)
-        return result
\ No newline at end of file
+        # 非流式，拼接全部片段；消费完生成器也保证对话结束后的会话保存逻辑执行
+        result = "".join([str(chunk) async for chunk in result_generator])
+        return {"content": result, "conversation_id": conversation_id}
\ No newline at end of file
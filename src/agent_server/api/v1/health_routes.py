@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from agent_server.app.health.health_service import health_service
+
+router = APIRouter(tags=["Health健康检查"])
+
+
+@router.get("/ready", summary="就绪探测：只检查关键依赖，未就绪时返回 503")
+async def ready():
+    report = await health_service.check(health_service.critical_names())
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@router.get("/health/deep", summary="深度健康检查：检查所有依赖并返回各依赖耗时")
+async def health_deep():
+    report = await health_service.check()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Query
+
+from agent_server.app.llm.model_health import model_health
+from agent_server.db.session import get_session_stats, reset_session_stats
+
+router = APIRouter(prefix="/monitor", tags=["Monitor运行监控"])
+
+
+@router.get("/db", summary="数据库Session、连接池与慢查询统计")
+async def db_stats(reset: bool = Query(False, description="返回统计后是否重置")):
+    stats = get_session_stats()
+    if reset:
+        reset_session_stats()
+    return stats
+
+
+@router.get("/models", summary="模型端点健康状态（后台探测结果）")
+async def model_stats():
+    return model_health.snapshot()
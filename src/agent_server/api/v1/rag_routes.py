@@ -1,54 +1,76 @@
-import os
-import pandas as pd
-import shutil
-
-from pathlib import Path
 from fastapi import FastAPI, APIRouter, Request, Response, UploadFile, File, Form
 from fastapi.responses import JSONResponse, HTMLResponse
 
-from langchain_community.document_loaders import TextLoader, CSVLoader, DirectoryLoader, PyPDFLoader, BSHTMLLoader
-
 from config.settings import Settings
-from app.rag.vector_store.base import VsServiceFactory, SupportedVSType
-
-# 定义加载器映射
-loader_mapping = {
-    ".csv": CSVLoader,
-    ".pdf": PyPDFLoader,
-    ".txt": lambda path: TextLoader(path, autodetect_encoding=True),
-    ".html": lambda path: BSHTMLLoader(path, open_encoding='utf-8')
-}
+from utils.kn_util import get_doc_path
+from agent_server.utils.file_util import save_upload_file
+from agent_server.app.rag.ingest.ingest_service import ingest_file, is_file_ingested
+from agent_server.app.rag.ingest.ingest_queue import IngestJob, ingest_queue
 
 router = APIRouter(prefix="/rag", tags=["RAG检索增强生成"])
 
+# 正在入库的文件（知识库名称, 文件哈希），避免同一文件并发上传时重复入库
+_ingesting_files: set[tuple[str, str]] = set()
+
 @router.post("/upload", summary="上传文件并保存到向量存储")
 async def upload_file(request: Request, file: UploadFile = File(...)):
-    # 保存上传的文件
-    file_path = f"{Settings.basic_settings.TEMP_FILE_PATH}/{file.filename}"
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
+    kn_name = "default"
+    # 流式保存上传的文件，按内容哈希存储到知识库文档目录
+    file_path, file_hash, file_size = await save_upload_file(file, get_doc_path(kn_name))
+
+    # 相同内容的文件正在入库或已入库，跳过重复入库
+    ingest_key = (kn_name, file_hash)
+    if ingest_key in _ingesting_files:
+        return Response(f"{file.filename} 已存在，无需重复保存")
+
     # loader = DirectoryLoader(
     #     path=Settings.basic_settings.TEMP_FILE_PATH,
     #     glob="**/*.*",
     #     loader_cls=lambda file_path: loader_mapping.get(Path(file_path).suffix.lower())(file_path),
     #     use_multithreading=True,
     # )
-    loader = loader_mapping.get(Path(file_path).suffix.lower(), TextLoader)(file_path)
-    documents = loader.load()
-    
-    vs_service = VsServiceFactory.get_service(vector_store_type=Settings.kn_settings.DEFAULT_VS_TYPE, kn_name="default")
-    vs_service.save_vector_store(documents)
-    
-    # 删除临时文件
-    os.remove(file_path)
+    # 检查与占用之间没有 await，并发上传同一文件时只有一个请求能通过
+    _ingesting_files.add(ingest_key)
+    try:
+        if await is_file_ingested(kn_name, file_hash):
+            return Response(f"{file.filename} 已存在，无需重复保存")
+
+        # 队列模式：只写入入库队列，由独立的入库进程处理，不占用对话所在进程的 CPU
+        if Settings.kn_settings.INGEST_MODE == "queue":
+            job = IngestJob(
+                kn_name=kn_name,
+                file_path=str(file_path),
+                file_name=file.filename or file_path.name,
+                file_hash=file_hash,
+                file_size=file_size,
+            )
+            if not await ingest_queue.enqueue(job):
+                return Response(f"{file.filename} 正在入库，无需重复保存")
+            return JSONResponse(status_code=202, content={"job_id": job.job_id, "status": "queued"})
+
+        await ingest_file(kn_name, file_path, file.filename or file_path.name, file_hash, file_size)
+    finally:
+        _ingesting_files.discard(ingest_key)
 
     return Response(f"{file.filename} 已成功保存")
 
+
+@router.get("/ingest/stats", summary="入库队列积压与入库进程吞吐")
+async def ingest_stats():
+    return await ingest_queue.stats()
+
+
+@router.get("/ingest/jobs/{job_id}", summary="查询入库任务状态")
+async def ingest_job(job_id: str):
+    job = await ingest_queue.get_job(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": f"入库任务 {job_id} 不存在"})
+    return job
+
 @router.post("/multi-upload/")
 async def multi_upload(files: list[UploadFile] = File(...)):
+    results = []
     for file in files:
-        file_path = f"{Settings.basic_settings.TEMP_FILE_PATH}/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    return {"filenames": [file.filename for file in files]}
\ No newline at end of file
+        _, file_hash, file_size = await save_upload_file(file, Settings.basic_settings.TEMP_FILE_PATH)
+        results.append({"filename": file.filename, "file_hash": file_hash, "file_size": file_size})
+    return {"filenames": [file.filename for file in files], "files": results}
\ No newline at end of file
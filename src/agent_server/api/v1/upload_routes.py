@@ -1,18 +1,22 @@
 import os
-import pandas as pd
 import shutil
+from functools import lru_cache
 
 from fastapi import FastAPI, APIRouter, Request, UploadFile, File, Form
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 
 router = APIRouter(prefix="/upload", tags=["Upload文件上传"])
 
-templates = Jinja2Templates(directory="templates")
+@lru_cache(maxsize=1)
+def get_templates():
+    """模板引擎（jinja2）在首次渲染页面时导入并创建"""
+    from fastapi.templating import Jinja2Templates
+
+    return Jinja2Templates(directory="templates")
 
 @router.get("/", response_class=HTMLResponse)
 async def upload_page(request: Request):
-    return templates.TemplateResponse("show_table.html", {"request": request, "df_html": None})
+    return get_templates().TemplateResponse("show_table.html", {"request": request, "df_html": None})
 
 @router.post("/upload", response_class=HTMLResponse)
 async def upload_file(request: Request, file: UploadFile = File(...)):
@@ -22,10 +26,13 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
         shutil.copyfileobj(file.file, buffer)
 
     # 读取Excel内容
+    # pandas 只在该接口中使用，按需导入
+    import pandas as pd
+
     df = pd.read_excel(file_location)
     df_html = df.to_html(classes="table table-bordered", index=False, border=0)
 
     # 删除临时文件
     os.remove(file_location)
 
-    return templates.TemplateResponse("show_table.html", {"request": request, "df_html": df_html})
\ No newline at end of file
+    return get_templates().TemplateResponse("show_table.html", {"request": request, "df_html": df_html})
\ No newline at end of file
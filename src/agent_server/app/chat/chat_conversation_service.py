@@ -1,5 +1,7 @@
 from agent_server.db.repository.chat_conversation_repository import chat_conversation_repository
-from agent_server.schemas.chat.chat_conversation_schema import ChatConversationCreate
+from agent_server.db.session import uow
+from agent_server.schemas.base import CursorPage
+from agent_server.schemas.chat.chat_conversation_schema import ChatConversationCreate, ChatConversationRead
 
 class ChatConversationService:
     def __init__(self):
@@ -12,6 +14,20 @@ class ChatConversationService:
         order_by: list[dict[str, str]] = [{"field":"updated_time", "direction":"desc"}]
         return await self.chat_conversation_repository.list(page_size=page_size, page_num=page_num, order_by=order_by)
 
+    async def page_conversation(self, cursor: str | None = None, page_size: int = 10, with_total: bool = False):
+        """
+        按更新时间倒序游标分页获取聊天会话
+        """
+        async with uow():
+            items, next_cursor = await self.chat_conversation_repository.get_page(cursor=cursor, limit=page_size)
+            total = await self.chat_conversation_repository.estimate_count() if with_total else None
+        return CursorPage[ChatConversationRead](
+            items=[ChatConversationRead.model_validate(item) for item in items],
+            next_cursor=next_cursor,
+            has_more=next_cursor is not None,
+            total=total,
+        )
+
     async def create_chat_conversation(self, name: str):
         """
         创建新的聊天会话
@@ -0,0 +1,162 @@
+import asyncio
+import contextvars
+import time
+
+from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from agent_server.config.settings import Settings
+from agent_server.utils.log_util import build_logger
+from agent_server.schemas.chat.chat_conversation_schema import ChatConversationCreate
+from agent_server.schemas.chat.chat_message_schema import ChatMessageCreate
+from agent_server.db.repository.chat_conversation_repository import chat_conversation_repository
+from agent_server.db.repository.chat_message_repository import chat_message_repository
+from agent_server.db.session import uow
+
+logger = build_logger("chat-service")
+
+
+"""
+聊天记录批量写入
+
+对话结束后只把本轮记录放入内存缓冲区，由后台任务批量写入数据库，对话请求不等待数据库写入：
+- 缓冲区达到 CHAT_MESSAGE_FLUSH_ROWS 条，或距离上次写入超过 CHAT_MESSAGE_FLUSH_INTERVAL_MS 时写入一次
+- 每次写入先用一条 INSERT ... ON CONFLICT DO NOTHING 创建本批涉及的会话，再用一条 INSERT 写入全部消息
+- 连接中断、超时等暂时性错误时记录保留在缓冲区中等待下次重试，每条记录最多写入 CHAT_MESSAGE_MAX_ATTEMPTS 次；
+  约束冲突、数据错误等重试也不会成功的错误直接丢弃本批记录，避免一批坏数据反复重试阻塞后续写入
+- 缓冲区超过 CHAT_MESSAGE_BUFFER_MAX 条时丢弃最早的记录
+- 应用关闭时写入缓冲区中剩余的记录
+"""
+
+# question/answer 列长度
+MAX_TEXT_LENGTH = 4096
+
+
+def is_transient_error(e: BaseException) -> bool:
+    """是否为重试可能成功的数据库错误：连接中断、连接池超时、数据库暂时不可用等"""
+    if isinstance(e, DBAPIError):
+        return e.connection_invalidated or isinstance(e, (OperationalError, InterfaceError))
+    return isinstance(e, (DisconnectionError, PoolTimeoutError, TimeoutError, ConnectionError))
+
+
+class ChatMessageWriter:
+
+    def __init__(self):
+        # (会话, 消息, 已尝试写入次数)
+        self._buffer: list[tuple[ChatConversationCreate, ChatMessageCreate, int]] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """启动后台写入任务，需在事件循环中调用"""
+        if self.running:
+            return
+        self._stopping = False
+        # 事件循环可能在测试或重启时发生变化，重新创建绑定当前循环的同步原语
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        # 使用空的上下文启动，避免继承调用方的工作单元Session
+        self._task = asyncio.create_task(self._run(), name="chat-message-writer", context=contextvars.Context())
+        logger.info("聊天记录批量写入任务已启动。")
+
+    async def stop(self) -> None:
+        """停止后台写入任务，并写入缓冲区中剩余的记录"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+        await self.flush()
+        logger.info("聊天记录批量写入任务已停止。")
+
+    def submit(
+        self,
+        *,
+        conversation_id: int,
+        question: str,
+        answer: str,
+        chat_type: str = "general",
+        meta_data: dict | None = None,
+    ) -> None:
+        """提交一轮对话记录，立即返回"""
+        conversation = ChatConversationCreate(id=conversation_id, name=question, chat_type="general")
+        message = ChatMessageCreate(
+            conversation_id=conversation_id,
+            chat_type=chat_type,
+            question=(question or "")[:MAX_TEXT_LENGTH],
+            answer=(answer or "")[:MAX_TEXT_LENGTH],
+            meta_data=meta_data or {},
+        )
+        self._buffer.append((conversation, message, 0))
+
+        buffer_max = Settings.db_settings.CHAT_MESSAGE_BUFFER_MAX
+        if len(self._buffer) > buffer_max:
+            dropped = len(self._buffer) - buffer_max
+            del self._buffer[:dropped]
+            logger.warning(f"聊天记录缓冲区已满，丢弃最早的 {dropped} 条记录")
+
+        if not self.running:
+            self.start()
+        if len(self._buffer) >= Settings.db_settings.CHAT_MESSAGE_FLUSH_ROWS:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """把缓冲区中的记录写入数据库，返回写入的消息数"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            batch, self._buffer = self._buffer, []
+            try:
+                # 会话与消息在同一个事务中写入
+                async with uow():
+                    await chat_conversation_repository.create_if_absent(objs_in=[c for c, _, _ in batch])
+                    count = len(await chat_message_repository.bulk_create(objs_in=[m for _, m, _ in batch]))
+            except Exception as e:
+                if not is_transient_error(e):
+                    self._drop(batch, f"写入失败且不可重试: {e!r}")
+                    return 0
+                max_attempts = Settings.db_settings.CHAT_MESSAGE_MAX_ATTEMPTS
+                retry = [(c, m, attempts + 1) for c, m, attempts in batch if attempts + 1 < max_attempts]
+                if len(retry) < len(batch):
+                    self._drop([item for item in batch if item[2] + 1 >= max_attempts],
+                               f"已尝试写入 {max_attempts} 次: {e!r}")
+                # 放回缓冲区头部，保持写入顺序
+                self._buffer[:0] = retry
+                if retry:
+                    logger.error(f"批量写入聊天记录失败，{len(retry)} 条记录等待重试: {e}")
+                return 0
+            logger.debug(f"批量写入聊天记录 {count} 条")
+            return count
+
+    @staticmethod
+    def _drop(batch: list[tuple[ChatConversationCreate, ChatMessageCreate, int]], reason: str) -> None:
+        conversation_ids = sorted({c.id for c, _, _ in batch})
+        logger.error(f"丢弃 {len(batch)} 条聊天记录，{reason}，conversation_id: {conversation_ids}")
+
+    async def _run(self) -> None:
+        last_flush = time.monotonic()
+        while not self._stopping:
+            interval = Settings.db_settings.CHAT_MESSAGE_FLUSH_INTERVAL_MS / 1000
+            timeout = max(0.0, last_flush + interval - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            if self._buffer:
+                await self.flush()
+            last_flush = time.monotonic()
+
+
+chat_message_writer = ChatMessageWriter()
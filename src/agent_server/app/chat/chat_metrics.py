@@ -0,0 +1,90 @@
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from agent_server.app.chat.chat_transcript import ChatTranscript
+from agent_server.core.metrics import (
+    CHAT_TIME_TO_FIRST_TOKEN,
+    CHAT_TOKENS_PER_SECOND,
+    CHAT_TURNS,
+    LLM_IN_FLIGHT,
+    RETRIEVAL_DURATION,
+)
+
+
+"""
+对话链路指标
+
+MetricsCallbackHandler 通过 RunnableConfig 挂载到整条链上，记录知识库检索耗时和各平台进行中的模型调用数；
+首 token 耗时与输出速度在对话结束时由 ChatTranscript 的计时得到，不在逐 token 路径上做额外工作
+"""
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """记录检索耗时与模型调用并发数"""
+
+    # 只做计数与计时，直接在事件循环中执行，不转交线程池
+    run_inline = True
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self._retriever_starts: dict[UUID, tuple[float, str]] = {}
+        self._llm_runs: set[UUID] = set()
+
+    def _llm_started(self, run_id: UUID) -> None:
+        self._llm_runs.add(run_id)
+        LLM_IN_FLIGHT.inc(platform=self.platform)
+
+    def _llm_finished(self, run_id: UUID) -> None:
+        if run_id in self._llm_runs:
+            self._llm_runs.discard(run_id)
+            LLM_IN_FLIGHT.dec(platform=self.platform)
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._llm_started(run_id)
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: list, *, run_id: UUID, **kwargs: Any) -> None:
+        self._llm_started(run_id)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._llm_finished(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._llm_finished(run_id)
+
+    def on_retriever_start(self, serialized: dict[str, Any], query: str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "retriever"
+        self._retriever_starts[run_id] = (time.perf_counter(), name)
+
+    def _retriever_finished(self, run_id: UUID) -> None:
+        started = self._retriever_starts.pop(run_id, None)
+        if started is not None:
+            start, name = started
+            RETRIEVAL_DURATION.observe(time.perf_counter() - start, retriever=name)
+
+    def on_retriever_end(self, documents: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._retriever_finished(run_id)
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._retriever_finished(run_id)
+
+    def release(self) -> None:
+        """对话被中断（如客户端断开）时，归还未收到结束事件的模型调用计数"""
+        for run_id in list(self._llm_runs):
+            self._llm_finished(run_id)
+
+
+def record_chat_turn(transcript: ChatTranscript, error: BaseException | None = None) -> None:
+    """对话结束时记录首 token 耗时、输出速度和对话轮数"""
+    platform = transcript.model_provider or ""
+    model = transcript.model_name or ""
+    CHAT_TURNS.inc(platform=platform, model=model, status="error" if error else "ok")
+    if transcript.first_token_time is None:
+        return
+    CHAT_TIME_TO_FIRST_TOKEN.observe(transcript.first_token_time - transcript.start_time, platform=platform, model=model)
+    generation_seconds = time.perf_counter() - transcript.first_token_time
+    # 只有一个片段（非流式）时无法计算输出速度
+    if transcript.streaming and transcript.chunk_count > 1 and generation_seconds > 0:
+        CHAT_TOKENS_PER_SECOND.observe((transcript.chunk_count - 1) / generation_seconds, platform=platform, model=model)
@@ -1,9 +1,7 @@
-import json
 import os
 import sys
 import asyncio
 import random
-import redis
 import html
 
 from fastapi import Depends
@@ -13,7 +11,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.callbacks import StdOutCallbackHandler
-from langchain.callbacks.streaming_aiter import AsyncIteratorCallbackHandler
 
 # 输出解析
 from langchain_core.output_parsers import StrOutputParser
@@ -41,16 +38,34 @@ from agent_server.app.llm.mode_factory import ModelFactory
 from agent_server.config.settings import Settings
 from agent_server.utils.log_util import build_logger
 from agent_server.utils.id_util import id_generator
+from agent_server.utils.redis_util import get_redis_client
 from agent_server.schemas.chat.chat_request import ChatRequest
 from agent_server.app.rag.vector_store.base import VsServiceFactory, SupportedVSType
+from agent_server.app.chat.chat_transcript import ChatTranscript
+from agent_server.app.chat.chat_metrics import MetricsCallbackHandler, record_chat_turn
+from agent_server.core.tracing import TracingCallbackHandler, span, start_trace, end_trace
+from agent_server.app.chat.chat_message_writer import chat_message_writer, MAX_TEXT_LENGTH
 
-from agent_server.schemas.chat.chat_conversation_schema import ChatConversationCreate
 from agent_server.db.models.chat_conversation_model import ChatConversation
-from agent_server.db.repository.chat_conversation_repository import chat_conversation_repository
 from agent_server.db.base import get_async_db, _AsyncSessionFactory
 
 logger = build_logger("chat-service")
 
+
+class TracedRedisChatMessageHistory(RedisChatMessageHistory):
+    """写入历史消息时记录 history_write 阶段耗时"""
+
+    def __init__(self, session_id: str, key_prefix: str = "message_store:", ttl: int | None = None):
+        # 复用进程内的 Redis 连接池，父类按 url 初始化时每轮对话都会创建新的连接池
+        self.redis_client = get_redis_client()
+        self.session_id = session_id
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+
+    def add_messages(self, messages) -> None:
+        with span("history_write", stage="history_write", standalone=False, messages=len(messages)):
+            super().add_messages(messages)
+
 # 初始化会话历史
 messages_list: dict[str, BaseChatMessageHistory] = {}
     
@@ -60,20 +75,20 @@ def chat(model_name: str, model_provider: str = "deepseek", input: str = ""):
     return message
 
 async def chat_async(data: ChatRequest):
+    """
+    对话，按片段产出模型输出的文本，由调用方负责编码（流式时见 sse_stream）
+    """
     model_provider = data.model_provider
     model_name = data.model_name
-    streaming = data.streaming or True
+    streaming = bool(data.streaming)
     
     input = data.input
     conversation_id = data.conversation_id
 
     # 定义回调处理器
     std_handler = StdOutCallbackHandler()
-    async_handler = AsyncIteratorCallbackHandler()
+    # 流式输出直接消费 astream，不再挂载 AsyncIteratorCallbackHandler：其队列没有消费者，每个 token 都会堆积在内存中
     callbacks = [std_handler]
-    if streaming:
-        # 将异步回调处理器添加到回调列表中
-        callbacks = [std_handler, async_handler]
 
     # 聊天模型
     chat_model = ModelFactory.get_model(model_provider, model_name, streaming, callbacks)
@@ -149,9 +164,8 @@ async def chat_async(data: ChatRequest):
     chain = rag_chain if data.enableLocal else conversational_chain
 
     def get_message_history(conversation_id: str) -> BaseChatMessageHistory:    
-        return RedisChatMessageHistory(
+        return TracedRedisChatMessageHistory(
             session_id=conversation_id, 
-            url=Settings.basic_settings.REDIS_URL,
             key_prefix=Settings.basic_settings.REDIS_PREFIX_CHAT_MEMORY,
             ttl=60 * 60 * 24 * 7  # 7 days
         )
@@ -175,20 +189,41 @@ async def chat_async(data: ChatRequest):
             ],
     )
     
+    # 每轮对话写入一条对话记录，逐 token 路径上不做日志、打印和 JSON 编码
+    transcript = ChatTranscript(
+        conversation_id=conversation_id,
+        input=input,
+        model_provider=model_provider,
+        model_name=model_name,
+        enable_local=data.enableLocal,
+        streaming=streaming,
+    )
+    # 检索耗时与模型调用并发数，通过 config 挂载到整条链上
+    metrics_handler = MetricsCallbackHandler(platform=model_provider or Settings.model_settings.DEFAULT_LLM_PLATFORM)
+    # 分阶段追踪：问题改写、向量化、检索、提示词、首 token、历史写入
+    trace = start_trace(
+        "chat_async",
+        conversation_id=str(conversation_id),
+        model_provider=model_provider,
+        model_name=model_name,
+        enable_local=data.enableLocal,
+    )
+    callbacks_config = [metrics_handler, TracingCallbackHandler(trace)]
+    # 持久化到聊天记录的回答，只累积到列长度上限
+    answer_parts: list[str] = []
+    answer_len = 0
     try:
         if streaming:
             #  异步流式输出（建议放在 async 函数中调用）:RunnableConfig
             async for chunk in message_history_chain.astream(
                 {"input": input},
-                config={"configurable": {"conversation_id": conversation_id}}
+                config={"configurable": {"conversation_id": conversation_id}, "callbacks": callbacks_config}
             ):
-                logger.info(f"conversation_id: {conversation_id}, chat stream: {html.escape(str(chunk))}")
-                print(chunk, end="", flush=True)
-                # response={"content":chunk, "conversation_id": conversation_id}    
-                     
                 if data.enableLocal:
-                    # RAG链返回的是字典，包含answer和context
+                    # RAG链返回的是字典，包含answer和context，只输出answer片段
                     if isinstance(chunk, dict):
+                        if 'context' in chunk:
+                            transcript.set_sources(chunk['context'])
                         content = chunk.get('answer')
                     else:
                         content = str(chunk)
@@ -196,8 +231,13 @@ async def chat_async(data: ChatRequest):
                     # 普通对话链返回的是字符串
                     content = chunk if isinstance(chunk, str) else str(chunk)
 
-                response = {"content": content, "conversation_id": conversation_id}
-                yield json.dumps(response)
+                if not content:
+                    continue
+                transcript.add_chunk(content)
+                if answer_len < MAX_TEXT_LENGTH:
+                    answer_parts.append(content)
+                    answer_len += len(content)
+                yield content
 
             # async for event in message_history_chain.astream_events(
             #     {"input": input},
@@ -210,41 +250,44 @@ async def chat_async(data: ChatRequest):
             # Use async invocation with proper configuration
             result = await message_history_chain.ainvoke(
                 {"input": input},
-                config={"configurable": {"conversation_id": conversation_id}}
+                config={"configurable": {"conversation_id": conversation_id}, "callbacks": callbacks_config}
             )
-            logger.info(f"conversation_id: {conversation_id}, chat result: {result}")
-            response={"content":result, "conversation_id": conversation_id}
-            yield json.dumps(response)
+            if data.enableLocal and isinstance(result, dict):
+                transcript.set_sources(result.get('context') or [])
+                result = result.get('answer')
+            transcript.set_answer(str(result))
+            answer_parts.append(str(result))
+            yield result
 
-        await save_chat_conversation(input, int(conversation_id))
+        stages = trace.breakdown()
+        transcript.extra.update({"trace_id": trace.trace_id, "stages": stages})
+        transcript.finish()
+        record_chat_turn(transcript)
+        # 会话与聊天记录由后台任务批量写入，不阻塞本次响应
+        chat_message_writer.submit(
+            conversation_id=int(conversation_id),
+            question=input,
+            answer="".join(answer_parts),
+            chat_type="rag" if data.enableLocal else "general",
+            meta_data={
+                "model_provider": model_provider,
+                "model_name": model_name,
+                **transcript.timings(),
+                "stages": stages,
+                "sources": transcript.sources,
+            },
+        )
     except Exception as e:
         # Handle errors appropriately
+        transcript.extra.update({"trace_id": trace.trace_id, "stages": trace.breakdown()})
+        transcript.finish(error=e)
+        record_chat_turn(transcript, error=e)
+        end_trace(trace, error=e)
         logger.error(f"Error in chat processing: {html.escape(str(e))}")
         raise  # Or return a custom error response
-
-async def save_chat_conversation(input: str, conversation_id: int):
-    chat_conversation = await chat_conversation_repository.get(id=conversation_id)
-    if chat_conversation:
-        return
-    
-    chat_conversation = await chat_conversation_repository.create(
-        obj_in = ChatConversationCreate(
-            id=conversation_id,
-            name=input,
-            chat_type="general"
-        )
-    )
-    logger.info(f"新增会话成功：{chat_conversation}")
-
-def get_redis_client():
-    redis_client = redis.Redis(
-        host='localhost',
-        port=6379,
-        password="",
-        db=0
-    )       
-    redis_client.ping()
-    return redis_client
+    finally:
+        metrics_handler.release()
+        end_trace(trace)
 
 if __name__ == "__main__":
     # message = chat("deepseek-chat", "deepseek", "请介绍下杭州的著名旅游景点")
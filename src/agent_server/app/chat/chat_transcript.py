@@ -0,0 +1,133 @@
+import random
+import time
+from datetime import datetime
+from typing import Any
+
+from agent_server.app.chat.sse_stream import dumps_json
+from agent_server.config.settings import Settings
+from agent_server.utils.log_util import build_logger, build_transcript_logger
+
+logger = build_logger("chat-service")
+
+
+"""
+对话记录
+
+每轮对话只写入一条结构化记录（而不是每个 token 一条日志），记录经后台线程写入 chat-transcript.jsonl：
+- 按 CHAT_TRANSCRIPT_SAMPLE_RATE 采样，出错的对话始终记录
+- 问题与回答按 CHAT_TRANSCRIPT_MAX_CHARS 截断，回答在流式输出过程中只累计到上限为止
+- CHAT_TOKEN_TRACE 开启时额外以 DEBUG 级别逐 token 记录，用于排查问题
+"""
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return text[:max_chars] + f"...(truncated {len(text) - max_chars} chars)"
+
+
+class ChatTranscript:
+    """
+    一轮对话的记录
+    """
+
+    def __init__(
+        self,
+        conversation_id: str,
+        input: str,
+        model_provider: str | None = None,
+        model_name: str | None = None,
+        enable_local: bool = False,
+        streaming: bool = True,
+    ):
+        basic_settings = Settings.basic_settings
+        self.enabled = basic_settings.CHAT_TRANSCRIPT_ENABLED
+        self.sampled = self.enabled and random.random() < basic_settings.CHAT_TRANSCRIPT_SAMPLE_RATE
+        self.max_chars = basic_settings.CHAT_TRANSCRIPT_MAX_CHARS
+        self.token_trace = basic_settings.CHAT_TOKEN_TRACE
+
+        self.conversation_id = conversation_id
+        self.input = input
+        self.model_provider = model_provider
+        self.model_name = model_name
+        self.enable_local = enable_local
+        self.streaming = streaming
+
+        self.start_time = time.perf_counter()
+        self.first_token_time: float | None = None
+        self.chunk_count = 0
+        self.answer_chars = 0
+        self._answer_parts: list[str] = []
+        self._answer_kept = 0
+        self.sources: list[dict[str, Any]] = []
+        self.extra: dict[str, Any] = {}
+
+    def add_chunk(self, content: str) -> None:
+        """记录一个输出片段"""
+        if self.first_token_time is None:
+            self.first_token_time = time.perf_counter()
+        self.chunk_count += 1
+        self.answer_chars += len(content)
+        # 回答只保留到截断上限，长回答不会在内存中完整累积
+        if self.sampled and (self.max_chars <= 0 or self._answer_kept < self.max_chars):
+            self._answer_parts.append(content)
+            self._answer_kept += len(content)
+        if self.token_trace:
+            logger.debug(f"conversation_id: {self.conversation_id}, chat stream: {content!r}")
+
+    def set_answer(self, answer: str) -> None:
+        """记录非流式输出的完整回答"""
+        self.add_chunk(answer)
+
+    def set_sources(self, documents: list) -> None:
+        """记录知识库检索到的文档来源"""
+        self.sources = [
+            {
+                "source": doc.metadata.get("source"),
+                "page": doc.metadata.get("page"),
+                "start_index": doc.metadata.get("start_index"),
+            }
+            for doc in documents
+        ]
+
+    def timings(self) -> dict[str, Any]:
+        """本轮对话的耗时统计"""
+        return {
+            "chunks": self.chunk_count,
+            "answer_chars": self.answer_chars,
+            "ttft_ms": round((self.first_token_time - self.start_time) * 1000, 1)
+            if self.first_token_time is not None else None,
+            "duration_ms": round((time.perf_counter() - self.start_time) * 1000, 1),
+        }
+
+    @property
+    def answer(self) -> str:
+        return "".join(self._answer_parts)
+
+    def to_record(self, error: BaseException | None = None) -> dict[str, Any]:
+        answer = self.answer
+        if self.max_chars > 0:
+            answer = answer[:self.max_chars]
+        if self.sampled and self.answer_chars > len(answer):
+            answer += f"...(truncated {self.answer_chars - len(answer)} chars)"
+        return {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "conversation_id": self.conversation_id,
+            "model_provider": self.model_provider,
+            "model_name": self.model_name,
+            "enable_local": self.enable_local,
+            "streaming": self.streaming,
+            "input": _truncate(self.input or "", self.max_chars),
+            "answer": answer,
+            **self.timings(),
+            "sources": self.sources,
+            "status": "error" if error else "ok",
+            "error": repr(error) if error else None,
+            **self.extra,
+        }
+
+    def finish(self, error: BaseException | None = None) -> None:
+        """对话结束时写入记录，出错的对话不受采样影响"""
+        if not self.enabled or not (self.sampled or error):
+            return
+        build_transcript_logger().info(dumps_json(self.to_record(error)).decode("utf-8"))
@@ -0,0 +1,143 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，未安装时使用标准库
+    orjson = None
+
+from agent_server.config.settings import Settings
+
+
+"""
+SSE 流式输出
+
+模型每生成一个 token 就写一次响应会产生大量很小的网络写入，高 token 速率下写入开销明显。
+这里把模型输出放入队列，在很短的时间/字节窗口内合并多个 token，再编码为标准 SSE 帧：
+    data: {"content": "...", "conversation_id": "..."}\\n\\n
+- 第一个 token 到达后立即开始计时，窗口结束或累计字节数达到上限时发送，首字延迟最多增加一个窗口
+- 生产与消费通过队列解耦，发送较慢时不会阻塞模型输出
+"""
+
+_END = object()
+
+
+class _StreamError:
+    """在队列中传递生产端异常"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def dumps_json(data: Any) -> bytes:
+    """JSON 编码为 UTF-8 字节，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_sse(data: Any, event: str | None = None) -> bytes:
+    """编码为一个 SSE 帧"""
+    frame = b"data: " + dumps_json(data) + b"\n\n"
+    if event:
+        frame = b"event: " + event.encode("utf-8") + b"\n" + frame
+    return frame
+
+
+async def coalesce_chunks(
+    chunks: AsyncIterator[str],
+    window_ms: int | None = None,
+    max_bytes: int | None = None,
+) -> AsyncIterator[str]:
+    """
+    在时间/字节窗口内合并文本片段
+
+    Args:
+        chunks: 文本片段异步迭代器
+        window_ms: 合并时间窗口（毫秒），默认使用配置 SSE_COALESCE_MS，0 表示不合并
+        max_bytes: 合并字节数上限，默认使用配置 SSE_COALESCE_BYTES
+    """
+    window_ms = Settings.basic_settings.SSE_COALESCE_MS if window_ms is None else window_ms
+    max_bytes = Settings.basic_settings.SSE_COALESCE_BYTES if max_bytes is None else max_bytes
+    if window_ms <= 0:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    window = window_ms / 1000
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def _pump():
+        try:
+            async for chunk in chunks:
+                queue.put_nowait(chunk)
+        except Exception as e:
+            queue.put_nowait(_StreamError(e))
+        finally:
+            queue.put_nowait(_END)
+
+    loop = asyncio.get_running_loop()
+    pump_task = asyncio.create_task(_pump())
+    try:
+        finished = False
+        while not finished:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, _StreamError):
+                raise item.error
+
+            buffer = [item]
+            size = len(item.encode("utf-8"))
+            deadline = loop.time() + window
+            while size < max_bytes:
+                # 先取走队列中已有的片段，队列为空时再等待到窗口结束
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        async with asyncio.timeout(timeout):
+                            item = await queue.get()
+                    except TimeoutError:
+                        break
+                if item is _END:
+                    finished = True
+                    break
+                if isinstance(item, _StreamError):
+                    # 先把已合并的内容发送出去，再抛出异常
+                    yield "".join(buffer)
+                    raise item.error
+                buffer.append(item)
+                size += len(item.encode("utf-8"))
+            yield "".join(buffer)
+    finally:
+        if not pump_task.done():
+            pump_task.cancel()
+            try:
+                await pump_task
+            except asyncio.CancelledError:
+                pass
+
+
+async def sse_stream(
+    chunks: AsyncIterator[str],
+    conversation_id: str,
+    window_ms: int | None = None,
+    max_bytes: int | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    把对话输出的文本片段合并后编码为 SSE 帧，用于 StreamingResponse
+    """
+    async for content in coalesce_chunks(chunks, window_ms=window_ms, max_bytes=max_bytes):
+        yield encode_sse({"content": content, "conversation_id": conversation_id})
+
+
+# StreamingResponse 使用的响应头：禁止缓存及反向代理缓冲，保证帧及时到达客户端
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
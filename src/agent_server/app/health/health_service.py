@@ -0,0 +1,157 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as aioredis
+
+from agent_server.config.settings import Settings
+from agent_server.utils.log_util import build_logger
+from agent_server.db.base import check_database_health
+from agent_server.db.pool_monitor import pool_monitor
+
+logger = build_logger("health")
+
+
+"""
+依赖健康检查
+
+- 各依赖并发检查，每个检查有独立超时，单个依赖卡住不影响其它检查与探测响应时间
+- 检查结果按依赖缓存 HEALTH_CHECK_CACHE_TTL 秒，缓存期内的探测直接返回缓存；同一依赖同时只有一个检查在执行
+- critical 依赖失败时未就绪（503）；非 critical 依赖失败时为 degraded，仍然就绪
+"""
+
+CheckFunc = Callable[[], Awaitable[dict[str, Any] | None]]
+
+
+class DependencyCheck:
+    """一个依赖的检查"""
+
+    def __init__(self, name: str, check: CheckFunc, critical: bool | Callable[[], bool] = True):
+        self.name = name
+        self.check = check
+        self._critical = critical
+        self._result: dict[str, Any] | None = None
+        self._expires_at = 0.0
+        self._inflight: asyncio.Future | None = None
+
+    @property
+    def critical(self) -> bool:
+        return self._critical() if callable(self._critical) else self._critical
+
+    async def _run(self, timeout: float) -> dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(self.check(), timeout=timeout)
+            result = {"status": "ok"}
+            if details:
+                result["details"] = details
+        except asyncio.TimeoutError:
+            result = {"status": "error", "error": f"timeout after {timeout}s"}
+        except Exception as e:
+            result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result["critical"] = self.critical
+        if result["status"] != "ok":
+            logger.warning(f"依赖检查失败 {self.name}: {result['error']}")
+        return result
+
+    async def _refresh(self, timeout: float, ttl: float) -> dict[str, Any]:
+        try:
+            result = await self._run(timeout)
+            self._result = result
+            self._expires_at = time.monotonic() + ttl
+            return result
+        finally:
+            self._inflight = None
+
+    async def result(self, timeout: float, ttl: float) -> dict[str, Any]:
+        if self._result is not None and time.monotonic() < self._expires_at:
+            return {**self._result, "cached": True}
+        # 其它探测正在检查该依赖时等待其结果；探测请求被取消时检查仍会完成并写入缓存
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh(timeout, ttl))
+        return await asyncio.shield(self._inflight)
+
+
+class HealthService:
+    """依赖健康检查注册表"""
+
+    def __init__(self):
+        self._checks: dict[str, DependencyCheck] = {}
+        self._redis: aioredis.Redis | None = None
+
+    def register(self, name: str, check: CheckFunc, critical: bool | Callable[[], bool] = True) -> None:
+        self._checks[name] = DependencyCheck(name, check, critical)
+
+    async def check(self, names: list[str] | None = None) -> dict[str, Any]:
+        """并发检查依赖，返回整体状态与各依赖的结果"""
+        timeout = Settings.basic_settings.HEALTH_CHECK_TIMEOUT
+        ttl = Settings.basic_settings.HEALTH_CHECK_CACHE_TTL
+        checks = [self._checks[name] for name in (names or self._checks)]
+        results = await asyncio.gather(*(check.result(timeout, ttl) for check in checks))
+        dependencies = {check.name: result for check, result in zip(checks, results)}
+
+        failed = [name for name, result in dependencies.items() if result["status"] != "ok"]
+        if any(dependencies[name]["critical"] for name in failed):
+            status = "unavailable"
+        elif failed:
+            status = "degraded"
+        else:
+            status = "ok"
+        return {"status": status, "ready": status != "unavailable", "dependencies": dependencies}
+
+    def critical_names(self) -> list[str]:
+        return [name for name, check in self._checks.items() if check.critical]
+
+    # ==================== 内置依赖检查 ====================
+
+    async def check_database(self) -> dict[str, Any]:
+        if not await check_database_health():
+            raise RuntimeError("SELECT 1 failed")
+        # 附带连接池状态，连接池耗尽时可以在探测结果中直接看到
+        pool = pool_monitor.snapshot()["pools"].get("async", {})
+        return {key: pool.get(key) for key in ("size", "checkedout", "overflow", "saturation") if key in pool}
+
+    async def check_redis(self) -> None:
+        if self._redis is None:
+            timeout = Settings.basic_settings.HEALTH_CHECK_TIMEOUT
+            self._redis = aioredis.from_url(
+                Settings.basic_settings.REDIS_URL,
+                socket_connect_timeout=timeout,
+                socket_timeout=timeout,
+            )
+        await self._redis.ping()
+
+    async def check_vector_store(self) -> dict[str, Any]:
+        from agent_server.app.rag.vector_store.base import VsServiceFactory
+
+        vs_type = Settings.kn_settings.DEFAULT_VS_TYPE
+        await VsServiceFactory.get_service_class(vs_type).aping()
+        return {"type": vs_type}
+
+    async def check_embedding(self) -> dict[str, Any]:
+        from agent_server.app.llm.model_health import model_health
+        from agent_server.utils.llm_util import get_default_embedding
+
+        # 读取后台探测的结果，探测请求不调用嵌入模型
+        embed_model = get_default_embedding()
+        state = model_health.register_embed_model(embed_model)
+        if not state.available:
+            raise RuntimeError(state.error)
+        return {"model": embed_model, "status": state.status, "last_checked_at": state.last_checked_at}
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+health_service = HealthService()
+health_service.register("database", health_service.check_database)
+health_service.register("redis", health_service.check_redis)
+health_service.register("vector_store", health_service.check_vector_store)
+health_service.register(
+    "embedding",
+    health_service.check_embedding,
+    critical=lambda: Settings.basic_settings.HEALTH_EMBEDDING_CRITICAL,
+)
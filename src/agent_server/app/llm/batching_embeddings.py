@@ -0,0 +1,76 @@
+import os
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+from agent_server.app.llm.forwarding_embeddings import ForwardingEmbeddings
+from agent_server.config.settings import Settings
+from agent_server.utils.batch_util import MicroBatcher
+
+
+"""
+查询嵌入的动态批处理
+
+每轮对话各自嵌入一次查询，并发对话多时会产生大量只有一个文本的嵌入请求。
+同一进程中同一模型并发的 aembed_query 在很短的窗口内（EMBEDDING_QUERY_BATCH_CONFIG.max_wait_ms）合并为一次
+aembed_documents 调用，再把结果分发回各个对话；批次大小与增加的等待时间记录在 micro_batch_* 指标中。
+
+只用于查询与文档嵌入方式相同的模型（OpenAI 兼容接口），DashScope、Ollama 对查询另有处理，不做合并。
+
+批处理器绑定首次创建时的嵌入模型客户端，按 (模型, 接口地址, API Key) 区分；
+model_settings 重新加载后全部丢弃，之后的查询使用新配置创建的客户端与批处理参数。
+"""
+
+_batchers: dict[tuple[str, str, str], MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_query_batcher(model: str, embeddings: Embeddings, base_url: str = "", api_key: str = "") -> MicroBatcher:
+    """获取本进程中该模型端点的查询批处理器，首次调用时用传入的嵌入模型创建"""
+    key = (model, base_url, api_key)
+    batcher = _batchers.get(key)
+    if batcher is not None:
+        return batcher
+    with _batchers_lock:
+        if key not in _batchers:
+            config = Settings.model_settings.EMBEDDING_QUERY_BATCH_CONFIG
+            _batchers[key] = MicroBatcher(
+                embeddings.aembed_documents,
+                max_batch_size=int(config.get("max_batch_size", 16)),
+                max_wait_ms=float(config.get("max_wait_ms", 5)),
+                name=f"embedding-query:{model}",
+            )
+        return _batchers[key]
+
+
+def _clear_batchers(old, new) -> None:
+    # 在配置监视线程中调用；正在等待的查询仍由旧批处理器完成
+    with _batchers_lock:
+        _batchers.clear()
+
+
+Settings.on_change("model_settings", _clear_batchers)
+
+
+def _reset_after_fork() -> None:
+    global _batchers, _batchers_lock
+    _batchers = {}
+    _batchers_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class BatchingEmbeddings(ForwardingEmbeddings):
+    """
+    合并并发查询的嵌入模型包装，只改变 aembed_query，其它调用与属性访问转发给被包装的模型
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, base_url: str = "", api_key: str = ""):
+        super().__init__(embeddings)
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await get_query_batcher(self.model, self.embeddings, self.base_url, self.api_key).submit(text)
@@ -0,0 +1,30 @@
+from langchain_core.embeddings import Embeddings
+
+
+class ForwardingEmbeddings(Embeddings):
+    """
+    嵌入模型包装的基类，嵌入调用与其它属性访问都转发给被包装的模型，子类只覆盖需要改变的方法
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def __getattr__(self, name: str):
+        # 只有在实例自身找不到属性时才会调用；copy、pickle 还原时实例尚无 embeddings，需抛出 AttributeError。
+        # 特殊方法不转发，否则 deepcopy 等会取到被包装模型的 __deepcopy__，得到去掉包装的副本
+        embeddings = self.__dict__.get("embeddings")
+        if embeddings is None or (name.startswith("__") and name.endswith("__")):
+            raise AttributeError(name)
+        return getattr(embeddings, name)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.embeddings.aembed_query(text)
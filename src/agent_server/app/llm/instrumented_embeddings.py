@@ -0,0 +1,39 @@
+from langchain_core.embeddings import Embeddings
+
+from agent_server.app.llm.forwarding_embeddings import ForwardingEmbeddings
+from agent_server.core.metrics import EMBEDDING_DURATION, EMBEDDING_TEXTS
+from agent_server.core.tracing import span
+
+
+class InstrumentedEmbeddings(ForwardingEmbeddings):
+    """
+    记录嵌入耗时与文本数的嵌入模型包装，处于追踪中时记录 embedding 阶段，其它属性访问转发给被包装的模型
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str):
+        super().__init__(embeddings)
+        self.model = model
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        EMBEDDING_TEXTS.inc(len(texts), model=self.model, operation="documents")
+        with EMBEDDING_DURATION.time(model=self.model, operation="documents"), \
+                span("embedding", stage="embedding", standalone=False, model=self.model, operation="documents"):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        EMBEDDING_TEXTS.inc(model=self.model, operation="query")
+        with EMBEDDING_DURATION.time(model=self.model, operation="query"), \
+                span("embedding", stage="embedding", standalone=False, model=self.model, operation="query"):
+            return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        EMBEDDING_TEXTS.inc(len(texts), model=self.model, operation="documents")
+        with EMBEDDING_DURATION.time(model=self.model, operation="documents"), \
+                span("embedding", stage="embedding", standalone=False, model=self.model, operation="documents"):
+            return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        EMBEDDING_TEXTS.inc(model=self.model, operation="query")
+        with EMBEDDING_DURATION.time(model=self.model, operation="query"), \
+                span("embedding", stage="embedding", standalone=False, model=self.model, operation="query"):
+            return await self.embeddings.aembed_query(text)
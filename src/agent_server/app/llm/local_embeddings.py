@@ -0,0 +1,148 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from langchain_core.embeddings import Embeddings
+
+from agent_server.config.settings import Settings
+from agent_server.utils.batch_util import MicroBatcher
+from agent_server.utils.log_util import build_logger
+
+
+"""
+本地嵌入模型（platform_type=local）
+
+在进程内使用 FlagEmbedding 的 BGEM3FlagModel 计算稠密向量，不经过网络，也没有按次计费：
+- 模型在每个进程中首次使用时加载一次，之后所有请求共用；fork 出的子进程重新加载
+- 推理在专用线程池中执行，不阻塞事件循环；线程数由 LOCAL_EMBEDDING_CONFIG.inference_threads 控制
+- 不同协程并发的 aembed_query / aembed_documents 通过动态批处理合并为一次 encode 调用
+"""
+
+logger = build_logger("model-factory")
+
+
+def get_local_embedding_config(model_name: str) -> dict[str, Any]:
+    config = dict(Settings.model_settings.LOCAL_EMBEDDING_CONFIG)
+    model_paths = config.pop("model_paths", {}) or {}
+    config["model_path"] = model_paths.get(model_name, model_name)
+    return config
+
+
+class LocalEmbeddingRuntime:
+    """
+    一个本地嵌入模型在本进程中的运行时：模型、推理线程池与动态批处理器
+    """
+
+    def __init__(self, model_name: str, config: dict[str, Any] | None = None):
+        self.model_name = model_name
+        self.config = config or get_local_embedding_config(model_name)
+        self._model = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, int(self.config.get("inference_threads", 1))),
+            thread_name_prefix=f"embed-{model_name}",
+        )
+        self.batcher = MicroBatcher(
+            self.aencode,
+            max_batch_size=int(self.config.get("batch_size", 32)),
+            max_wait_ms=float(self.config.get("max_wait_ms", 10)),
+            name=f"local-embedding:{model_name}",
+        )
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        try:
+            from FlagEmbedding import BGEM3FlagModel
+        except ImportError as e:
+            raise ImportError("本地嵌入模型需要安装 FlagEmbedding: pip install FlagEmbedding") from e
+
+        model_path = self.config["model_path"]
+        logger.info(f"加载本地嵌入模型: model={self.model_name}, path={model_path}, pid={os.getpid()}")
+        return BGEM3FlagModel(
+            model_path,
+            use_fp16=bool(self.config.get("use_fp16", False)),
+            devices=self.config.get("device") or None,
+        )
+
+    def encode(self, texts: list[str]) -> list[list[float]]:
+        """在当前线程中推理，只应在推理线程池中调用"""
+        output = self.model.encode(
+            texts,
+            batch_size=int(self.config.get("batch_size", 32)),
+            max_length=int(self.config.get("max_length", 512)),
+            return_dense=True,
+            return_sparse=False,
+            return_colbert_vecs=False,
+        )
+        return [vector.tolist() for vector in output["dense_vecs"]]
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """同步调用：提交到推理线程池并等待，多个线程同时调用时共享同一组推理线程"""
+        return self._executor.submit(self.encode, texts).result()
+
+    async def aencode(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.encode, texts)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_runtimes: dict[str, LocalEmbeddingRuntime] = {}
+_runtimes_lock = threading.Lock()
+
+
+def get_local_runtime(model_name: str) -> LocalEmbeddingRuntime:
+    """获取本进程中该模型的运行时，首次调用时创建（模型在首次推理时加载）"""
+    runtime = _runtimes.get(model_name)
+    if runtime is not None:
+        return runtime
+    with _runtimes_lock:
+        if model_name not in _runtimes:
+            _runtimes[model_name] = LocalEmbeddingRuntime(model_name)
+        return _runtimes[model_name]
+
+
+def _reset_after_fork() -> None:
+    # 子进程不能复用父进程的推理线程池，模型也在子进程中重新加载
+    global _runtimes, _runtimes_lock
+    _runtimes = {}
+    _runtimes_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    进程内的 BGE-M3 嵌入模型，同一进程中的实例共用一个模型与推理线程池
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def runtime(self) -> LocalEmbeddingRuntime:
+        return get_local_runtime(self.model)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        return self.runtime.embed(list(texts))
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.runtime.embed([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.runtime.batcher.submit_many(list(texts))
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.runtime.batcher.submit(text)
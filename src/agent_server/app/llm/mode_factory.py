@@ -2,26 +2,20 @@ from typing import Any
 
 
 import os
-from sysconfig import get_platform
 import time
 
 from dotenv import load_dotenv
 
-from langchain.chat_models import init_chat_model
-# from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
-from langchain_deepseek import ChatDeepSeek
 from langchain_core.callbacks import Callbacks
 from langchain_core.embeddings import Embeddings
-from langchain_community.llms.tongyi import Tongyi
-from langchain_community.embeddings import DashScopeEmbeddings
 
-from FlagEmbedding import BGEM3FlagModel
+# 各平台的模型类（openai/httpx、dashscope 等）在首次使用时导入，不拖慢服务启动
 
 from pydantic import BaseModel, ConfigDict, Field, SecretStr, model_validator
 
 from agent_server.config.settings import Settings
 from agent_server.utils.log_util import build_logger
+from agent_server.app.llm.instrumented_embeddings import InstrumentedEmbeddings
 from agent_server.utils.llm_util import (
     get_model_info,
     get_default_embedding,
@@ -57,6 +51,7 @@ class ModelFactory:
 
         llm_config = Settings.model_settings.LLM_MODEL_CONFIG.get("llm_model", {})
         if model_provider == "openai":
+            from langchain_openai import ChatOpenAI
             chat_model = ChatOpenAI(
                     api_key=SecretStr(model_info.get("api_key")),
                     base_url=model_info.get("api_base_url"),
@@ -68,6 +63,7 @@ class ModelFactory:
             return chat_model
         if model_provider == "gemini":
             # return init_chat_model(model_name, model_provider=model_provider)
+            from langchain_google_genai import ChatGoogleGenerativeAI
             chat_model = ChatGoogleGenerativeAI(
                     api_key=SecretStr(model_info.get("api_key")),
                     model=model_name,
@@ -94,6 +90,7 @@ class ModelFactory:
             #     api_key=api_key,
             #     api_base=api_base
             # )
+            from langchain_deepseek import ChatDeepSeek
             chat_model = ChatDeepSeek(
                     api_key=SecretStr(model_info.get("api_key")),
                     model=model_name,
@@ -106,6 +103,7 @@ class ModelFactory:
             )
             return chat_model
         elif model_provider == "dashscope":
+            from langchain_community.llms.tongyi import Tongyi
             chat_model = Tongyi(
                 model=model_name,
                 api_key=SecretStr(model_info.get("api_key")),
@@ -117,6 +115,7 @@ class ModelFactory:
                 timeout=llm_config.get("timeout", 30),
                 callbacks=callbacks,
             )
+            return chat_model
         else:
             raise ValueError(f"Unsupported model provider: {model_provider}")
 
@@ -130,7 +129,7 @@ class ModelFactory:
         embed_model: str = "",
         local_wrap: bool = False,  # use local wrapped api
     ) -> Embeddings:
-        from langchain_community.embeddings import OllamaEmbeddings
+        from langchain_community.embeddings import DashScopeEmbeddings, OllamaEmbeddings
         from langchain_openai import OpenAIEmbeddings
 
         embed_model = embed_model or get_default_embedding()
@@ -143,14 +142,18 @@ class ModelFactory:
             api_key = model_info.get("api_key")
             api_base_url = model_info.get("api_base_url")
             
-            if platform_type == "dashscope":
+            if platform_type == "local":
+                # 在本进程中加载模型，并发请求动态合并为批次推理
+                from agent_server.app.llm.local_embeddings import LocalEmbeddings
+                embeddings = LocalEmbeddings(model=embed_model)
+            elif platform_type == "dashscope":
                 if not api_key:
                     raise ValueError("Dashscope API key is not provided.")
-                return DashScopeEmbeddings(model=embed_model, dashscope_api_key=api_key)
+                embeddings = DashScopeEmbeddings(model=embed_model, dashscope_api_key=api_key)
             elif platform_type == "ollama":
                 if not api_base_url:
                     raise ValueError("Ollama API base URL is not provided.")
-                return OllamaEmbeddings(base_url=api_base_url.replace("/v1", ""), model=embed_model)
+                embeddings = OllamaEmbeddings(base_url=api_base_url.replace("/v1", ""), model=embed_model)
             else:
                 # For other platforms, including OpenAI-compatible ones
                 kwargs = {}
@@ -165,10 +168,21 @@ class ModelFactory:
                     kwargs["openai_api_base"] = f"{api_address()}/v1"
                     kwargs["openai_api_key"] = "EMPTY"
 
-                return OpenAIEmbeddings(
+                embeddings = OpenAIEmbeddings(
                     model=embed_model,
                     **kwargs,
                 )
+                # 合并并发对话的查询嵌入，减少只有一个文本的嵌入请求
+                if Settings.model_settings.EMBEDDING_QUERY_BATCH_CONFIG.get("enabled", True):
+                    from agent_server.app.llm.batching_embeddings import BatchingEmbeddings
+                    embeddings = BatchingEmbeddings(
+                        embeddings,
+                        model=embed_model,
+                        base_url=kwargs.get("openai_api_base", ""),
+                        api_key=kwargs.get("openai_api_key", ""),
+                    )
+            # 记录嵌入耗时与文本数
+            return InstrumentedEmbeddings(embeddings, model=embed_model)
         except Exception as e:
             logger.exception(f"failed to create Embeddings for model: {embed_model}.")
             raise e
@@ -176,18 +190,12 @@ class ModelFactory:
 
     '''
     check weather embed_model accessable, use default embed model if None
+    只读取后台探测缓存的状态，不调用模型
     '''
     @classmethod
     def check_embed_model(cls, embed_model: str = "") -> tuple[bool, str]:
-        try:
-            embed_model = embed_model or get_default_embedding()
-            embeddings = cls.get_embeddings(cls, embed_model=embed_model)
-            if embeddings is None:
-                return False, f"Failed to create Embeddings for model: {embed_model}."
-            embeddings.embed_query("this is a test")
-            return True, ""
-        except Exception as e:
-            msg = f"failed to access embed model '{embed_model}': {e}"
-            logger.error(msg)
-            return False, msg
+        from agent_server.app.llm.model_health import model_health
+
+        embed_model = embed_model or get_default_embedding()
+        return model_health.embed_model_status(embed_model)
    
\ No newline at end of file
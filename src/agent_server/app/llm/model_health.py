@@ -0,0 +1,168 @@
+import asyncio
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable
+
+from agent_server.config.settings import Settings
+from agent_server.utils.log_util import build_logger
+
+
+"""
+模型端点健康状态
+
+- 每个模型端点在后台按 MODEL_HEALTH_CHECK_INTERVAL 秒探测一次，连续失败时探测间隔指数退避，
+  最长 MODEL_HEALTH_CHECK_MAX_BACKOFF 秒，避免在模型服务故障或限流时继续加压
+- 请求路径上只读取缓存的状态，不会触发真实的模型调用；尚未探测过的端点视为可用
+- 首次查询某个嵌入模型时自动登记，由后台任务在下一轮探测
+"""
+
+logger = build_logger("model-health")
+
+STATUS_UNKNOWN = "unknown"
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+# 后台任务检查是否有到期端点的间隔（秒）
+TICK_INTERVAL = 1.0
+
+ProbeFunc = Callable[[], Awaitable[None]]
+
+
+@dataclass
+class ModelEndpointState:
+    name: str
+    kind: str
+    status: str = STATUS_UNKNOWN
+    error: str = ""
+    latency_ms: float | None = None
+    consecutive_failures: int = 0
+    last_checked_at: float | None = None
+    last_ok_at: float | None = None
+    next_check_at: float = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.status != STATUS_ERROR
+
+
+@dataclass
+class _Endpoint:
+    state: ModelEndpointState
+    probe: ProbeFunc
+    probing: bool = field(default=False)
+
+
+class ModelHealthRegistry:
+    """
+    模型端点健康状态注册表，每个进程一个，后台任务在应用 lifespan 中启动
+    """
+
+    def __init__(self):
+        self._endpoints: dict[str, _Endpoint] = {}
+        self._task: asyncio.Task | None = None
+
+    def register(self, name: str, probe: ProbeFunc, kind: str = "embedding") -> ModelEndpointState:
+        """登记一个端点，已登记时返回现有状态"""
+        endpoint = self._endpoints.get(name)
+        if endpoint is None:
+            endpoint = _Endpoint(ModelEndpointState(name=name, kind=kind), probe)
+            self._endpoints[name] = endpoint
+        return endpoint.state
+
+    def register_embed_model(self, embed_model: str) -> ModelEndpointState:
+        """登记嵌入模型，探测时调用一次 aembed_query"""
+        key = f"embedding:{embed_model}"
+        if key in self._endpoints:
+            return self._endpoints[key].state
+
+        embeddings = None
+
+        async def probe() -> None:
+            nonlocal embeddings
+            from agent_server.app.llm.mode_factory import ModelFactory
+
+            if embeddings is None:
+                embeddings = ModelFactory.get_embeddings(embed_model=embed_model)
+            await embeddings.aembed_query("health check")
+
+        return self.register(key, probe, kind="embedding")
+
+    def get(self, name: str) -> ModelEndpointState | None:
+        endpoint = self._endpoints.get(name)
+        return endpoint.state if endpoint else None
+
+    def embed_model_status(self, embed_model: str) -> tuple[bool, str]:
+        """读取嵌入模型的缓存状态，不调用模型"""
+        state = self.register_embed_model(embed_model)
+        if state.available:
+            return True, ""
+        return False, f"failed to access embed model '{embed_model}': {state.error}"
+
+    def snapshot(self) -> dict[str, dict]:
+        return {name: asdict(endpoint.state) for name, endpoint in self._endpoints.items()}
+
+    # ==================== 后台探测 ====================
+    def started(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.started():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def probe_due(self) -> None:
+        """并发探测所有到期的端点"""
+        now = time.monotonic()
+        due = [e for e in self._endpoints.values() if not e.probing and e.state.next_check_at <= now]
+        if due:
+            await asyncio.gather(*(self._probe(endpoint) for endpoint in due))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe_due()
+            except Exception as e:
+                logger.exception(f"模型健康检查失败: {e}")
+            await asyncio.sleep(TICK_INTERVAL)
+
+    async def _probe(self, endpoint: _Endpoint) -> None:
+        state = endpoint.state
+        interval = Settings.basic_settings.MODEL_HEALTH_CHECK_INTERVAL
+        endpoint.probing = True
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(endpoint.probe(), timeout=Settings.basic_settings.HEALTH_CHECK_TIMEOUT)
+        except Exception as e:
+            state.status = STATUS_ERROR
+            state.error = f"{type(e).__name__}: {e}" if str(e) else f"{type(e).__name__}"
+            state.consecutive_failures += 1
+            # 指数退避并加入随机抖动，避免多个 worker 进程同时探测
+            delay = min(interval * 2 ** state.consecutive_failures, Settings.basic_settings.MODEL_HEALTH_CHECK_MAX_BACKOFF)
+            delay *= random.uniform(0.9, 1.1)
+            if state.consecutive_failures == 1:
+                logger.warning(f"模型端点不可用 {state.name}: {state.error}")
+        else:
+            if state.status == STATUS_ERROR:
+                logger.info(f"模型端点已恢复 {state.name}")
+            state.status = STATUS_OK
+            state.error = ""
+            state.consecutive_failures = 0
+            state.last_ok_at = time.time()
+            delay = interval
+        finally:
+            endpoint.probing = False
+        state.latency_ms = round((time.perf_counter() - start) * 1000, 1)
+        state.last_checked_at = time.time()
+        state.next_check_at = time.monotonic() + delay
+
+
+model_health = ModelHealthRegistry()
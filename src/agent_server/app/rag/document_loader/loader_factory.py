@@ -0,0 +1,32 @@
+from pathlib import Path
+from typing import Callable, Iterator
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+from langchain_community.document_loaders import TextLoader, CSVLoader, BSHTMLLoader
+
+from agent_server.app.rag.document_loader.parallel_pdf_loader import ParallelPyPDFLoader
+
+
+# 定义加载器映射
+loader_mapping: dict[str, Callable[[str], BaseLoader]] = {
+    ".csv": CSVLoader,
+    ".pdf": ParallelPyPDFLoader,
+    ".txt": lambda path: TextLoader(path, autodetect_encoding=True),
+    ".html": lambda path: BSHTMLLoader(path, open_encoding='utf-8')
+}
+
+
+def get_document_loader(file_path: str) -> BaseLoader:
+    """
+    根据文件扩展名获取文档加载器，未知类型按文本加载
+    """
+    loader_cls = loader_mapping.get(Path(file_path).suffix.lower(), TextLoader)
+    return loader_cls(file_path)
+
+
+def lazy_load_documents(file_path: str) -> Iterator[Document]:
+    """
+    流式加载文档：PDF 按页、CSV 按行逐个产出，不会一次性把整个文件读入内存
+    """
+    yield from get_document_loader(file_path).lazy_load()
@@ -0,0 +1,163 @@
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+from agent_server.config.settings import Settings
+from agent_server.utils.process_util import get_cpu_count, get_process_pool
+
+
+"""
+多进程 PDF 文本提取
+
+PyPDFLoader 在单线程中逐页提取文本，数百页的扫描报告入库时文本提取占了大部分耗时。
+这里把 PDF 按页码区间切分为多个任务，分发到共享进程池中提取，再按页码顺序产出：
+- 子进程只接收文件路径和页码区间，各自打开文件，避免在进程间传输 PDF 对象
+- 同时在途的任务数有上限，已提取但未消费的页面不会无限堆积
+- 每页的 page_content 与 metadata 与 PyPDFLoader(mode="page") 保持一致
+"""
+
+# 在途任务数为进程数的倍数，保证消费当前任务时其它进程仍有任务可做
+TASKS_IN_FLIGHT_PER_WORKER = 2
+
+
+def _normalize_metadata(metadata: dict[str, Any]) -> dict[str, Any]:
+    """与 langchain_community 的 PyPDFParser 保持一致的 PDF 元数据规范化"""
+    new_metadata: dict[str, Any] = {}
+    map_key = {"page_count": "total_pages", "file_path": "source"}
+    for k, v in metadata.items():
+        if type(v) not in [str, int]:
+            v = str(v)
+        k = k[1:] if k.startswith("/") else k
+        k = k.lower()
+        if k in ["creationdate", "moddate"]:
+            try:
+                new_metadata[k] = datetime.strptime(v.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                new_metadata[k] = v
+        elif k in map_key:
+            new_metadata[map_key[k]] = v
+            new_metadata[k] = v
+        elif isinstance(v, str):
+            new_metadata[k] = v.strip()
+        else:
+            new_metadata[k] = v
+    return new_metadata
+
+
+def _extract_page_text(page, extraction_mode: str) -> str:
+    import pypdf
+
+    if pypdf.__version__.startswith("3"):
+        return page.extract_text().strip()
+    return page.extract_text(extraction_mode=extraction_mode).strip()
+
+
+def _extract_page_range(
+    file_path: str,
+    start: int,
+    end: int,
+    password: str | None = None,
+    extraction_mode: str = "plain",
+) -> list[tuple[str, str]]:
+    """子进程中执行：提取 [start, end) 页的文本，返回 (页面文本, 页码标签) 列表"""
+    import pypdf
+
+    reader = pypdf.PdfReader(file_path, password=password)
+    page_labels = reader.page_labels
+    return [
+        (_extract_page_text(reader.pages[i], extraction_mode), page_labels[i])
+        for i in range(start, end)
+    ]
+
+
+class ParallelPyPDFLoader(BaseLoader):
+    """
+    多进程提取文本的 PDF 加载器，按页产出文档，输出与 PyPDFLoader 一致
+    """
+
+    def __init__(
+        self,
+        file_path: str | Path,
+        password: str | None = None,
+        extraction_mode: str = "plain",
+        pages_per_task: int = 0,
+        min_parallel_pages: int = -1,
+        max_workers: int = 0,
+    ) -> None:
+        """
+        Args:
+            file_path: PDF 文件路径
+            password: PDF 密码
+            extraction_mode: pypdf 文本提取模式，"plain" 或 "layout"
+            pages_per_task: 每个任务处理的页数，0 表示使用配置 PDF_PAGES_PER_TASK
+            min_parallel_pages: 使用多进程的最小页数，-1 表示使用配置 PDF_PARALLEL_MIN_PAGES
+            max_workers: 进程数，0 表示使用配置 SPLIT_WORKERS
+        """
+        self.file_path = str(file_path)
+        self.password = password
+        self.extraction_mode = extraction_mode
+        kn_settings = Settings.kn_settings
+        self.pages_per_task = max(1, pages_per_task or kn_settings.PDF_PAGES_PER_TASK)
+        self.min_parallel_pages = (
+            min_parallel_pages if min_parallel_pages >= 0 else kn_settings.PDF_PARALLEL_MIN_PAGES
+        )
+        self.max_workers = max_workers or kn_settings.SPLIT_WORKERS
+
+    def _iter_page_ranges(self, total_pages: int) -> Iterator[tuple[int, int]]:
+        for start in range(0, total_pages, self.pages_per_task):
+            yield start, min(start + self.pages_per_task, total_pages)
+
+    def lazy_load(self) -> Iterator[Document]:
+        import pypdf
+
+        reader = pypdf.PdfReader(self.file_path, password=self.password)
+        total_pages = len(reader.pages)
+        doc_metadata = _normalize_metadata(
+            {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+            | dict(reader.metadata or {})
+            | {"source": self.file_path, "total_pages": total_pages}
+        )
+
+        workers = self.max_workers if self.max_workers > 0 else get_cpu_count()
+        if workers <= 1 or total_pages < max(self.min_parallel_pages, 2):
+            # 页数较少时直接在当前进程中提取，复用已经打开的 reader
+            page_labels = reader.page_labels
+            for i, page in enumerate(reader.pages):
+                yield self._build_document(
+                    _extract_page_text(page, self.extraction_mode), i, page_labels[i], doc_metadata
+                )
+            return
+        del reader
+
+        pool = get_process_pool(workers)
+        max_in_flight = workers * TASKS_IN_FLIGHT_PER_WORKER
+        pending: deque = deque()
+        try:
+            for start, end in self._iter_page_ranges(total_pages):
+                pending.append((start, pool.submit(
+                    _extract_page_range, self.file_path, start, end, self.password, self.extraction_mode
+                )))
+                if len(pending) >= max_in_flight:
+                    yield from self._collect(pending.popleft(), doc_metadata)
+            while pending:
+                yield from self._collect(pending.popleft(), doc_metadata)
+        finally:
+            # 调用方提前停止迭代时取消尚未开始的任务
+            for _, future in pending:
+                future.cancel()
+
+    def _collect(self, task: tuple, doc_metadata: dict[str, Any]) -> Iterator[Document]:
+        start, future = task
+        for offset, (text, page_label) in enumerate(future.result()):
+            yield self._build_document(text, start + offset, page_label, doc_metadata)
+
+    @staticmethod
+    def _build_document(text: str, page: int, page_label: str, doc_metadata: dict[str, Any]) -> Document:
+        return Document(
+            page_content=text,
+            metadata=doc_metadata | {"page": page, "page_label": page_label},
+        )
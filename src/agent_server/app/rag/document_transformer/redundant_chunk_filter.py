@@ -0,0 +1,134 @@
+from collections import defaultdict
+from typing import Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+"""
+文本块级近似重复过滤
+
+替代 EmbeddingsRedundantFilter：后者在分割前对整篇文档重新嵌入，并构造 n×n 相似度矩阵。
+这里直接使用入库时已经计算好的文本块嵌入向量：
+- 文本块数量较少时按块计算精确余弦相似度，每次只构造 block_size×block_size 的矩阵
+- 文本块数量较多时使用随机超平面 LSH 生成候选对，只与同桶的已保留文本块比较
+两种方式都保留每组近似重复中最先出现的文本块，内存占用与文本块数量线性相关。
+"""
+
+# 精确比较的最大文本块数量，超过后使用 LSH 生成候选对
+EXACT_MAX_CHUNKS = 10000
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def _exact_keep_indices(vectors: np.ndarray, threshold: float, block_size: int) -> list[int]:
+    """分块精确比较，返回需要保留的文本块下标"""
+    kept: list[int] = []
+    kept_blocks: list[np.ndarray] = []
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        # 与此前已保留的文本块比较
+        redundant = np.zeros(len(block), dtype=bool)
+        for kept_block in kept_blocks:
+            redundant |= (block @ kept_block.T).max(axis=1) >= threshold
+
+        # 块内按顺序比较，只与本块中已保留的文本块比较
+        sims = block @ block.T
+        block_kept: list[int] = []
+        for i in range(len(block)):
+            if redundant[i]:
+                continue
+            if block_kept and sims[i, block_kept].max() >= threshold:
+                continue
+            block_kept.append(i)
+
+        if block_kept:
+            kept.extend(start + i for i in block_kept)
+            kept_blocks.append(block[block_kept])
+    return kept
+
+
+def _lsh_keep_indices(
+    vectors: np.ndarray,
+    threshold: float,
+    block_size: int,
+    num_tables: int,
+    num_bits: int,
+    seed: int,
+) -> list[int]:
+    """随机超平面 LSH 生成候选，返回需要保留的文本块下标"""
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((num_tables * num_bits, vectors.shape[1])).astype(vectors.dtype)
+    weights = (1 << np.arange(num_bits, dtype=np.int64))
+
+    buckets: list[dict[int, list[int]]] = [defaultdict(list) for _ in range(num_tables)]
+    kept: list[int] = []
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        # 每个文本块在每张哈希表中的签名：num_tables 个 num_bits 位整数
+        bits = (block @ planes.T > 0).reshape(len(block), num_tables, num_bits)
+        signatures = bits.astype(np.int64) @ weights
+
+        for offset, row_signatures in enumerate(signatures):
+            index = start + offset
+            candidates: set[int] = set()
+            for table, signature in zip(buckets, row_signatures.tolist()):
+                candidates.update(table.get(signature, ()))
+            if candidates:
+                candidate_ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+                if (vectors[candidate_ids] @ vectors[index]).max() >= threshold:
+                    continue
+            kept.append(index)
+            for table, signature in zip(buckets, row_signatures.tolist()):
+                table[signature].append(index)
+    return kept
+
+
+def find_non_redundant_indices(
+    embeddings: Sequence[Sequence[float]] | np.ndarray,
+    similarity_threshold: float = 0.95,
+    block_size: int = 1024,
+    exact_max_chunks: int = EXACT_MAX_CHUNKS,
+    num_tables: int = 10,
+    num_bits: int = 12,
+    seed: int = 0,
+) -> list[int]:
+    """
+    查找需要保留的文本块下标（升序），余弦相似度达到 similarity_threshold 的文本块只保留最先出现的一个
+
+    Args:
+        embeddings: 文本块嵌入向量，形状为 n×d
+        similarity_threshold: 判定为近似重复的余弦相似度阈值
+        block_size: 每次参与矩阵运算的文本块数量
+        exact_max_chunks: 文本块数量不超过该值时精确比较，否则使用 LSH
+        num_tables: LSH 哈希表数量，越多召回率越高
+        num_bits: 每张哈希表的签名位数，越多候选越少
+        seed: LSH 随机超平面种子，保证结果可复现
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim != 2 or len(vectors) == 0:
+        return list(range(len(vectors)))
+
+    vectors = _normalize(vectors)
+    if len(vectors) <= exact_max_chunks:
+        return _exact_keep_indices(vectors, similarity_threshold, block_size)
+    return _lsh_keep_indices(vectors, similarity_threshold, block_size, num_tables, num_bits, seed)
+
+
+def filter_redundant_chunks(
+    documents: list[Document],
+    embeddings: list[list[float]],
+    similarity_threshold: float = 0.95,
+) -> tuple[list[Document], list[list[float]]]:
+    """
+    过滤近似重复的文本块，返回保留的文本块及其对应的嵌入向量
+    """
+    if len(documents) != len(embeddings):
+        raise ValueError(f"documents({len(documents)}) 与 embeddings({len(embeddings)}) 数量不一致")
+
+    keep = find_non_redundant_indices(embeddings, similarity_threshold=similarity_threshold)
+    return [documents[i] for i in keep], [embeddings[i] for i in keep]
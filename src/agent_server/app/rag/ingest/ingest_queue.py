@@ -0,0 +1,229 @@
+import json
+import time
+from dataclasses import asdict, dataclass, field
+
+import redis.asyncio as aioredis
+
+from agent_server.config.settings import Settings
+from agent_server.utils.id_util import id_generator
+
+
+"""
+文档入库队列
+
+基于 Redis 列表的可靠队列：
+- 上传接口 LPUSH 任务到待处理队列，入库进程使用 BLMOVE 把任务原子地移动到自己的处理中列表，
+  处理完成后再从处理中列表删除；入库进程异常退出时，任务留在处理中列表，由其它入库进程在其心跳过期后放回待处理队列
+- 同一知识库中相同内容的文件在入库完成前只会入队一次
+- 每个任务的状态保存在独立的 hash 中，供上传方查询
+"""
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# 去重标记、任务状态与入队在一个脚本中原子执行，避免入队失败后去重标记残留，导致该文件再也无法入队
+# KEYS: 去重集合、任务 hash、待处理队列；ARGV: 去重键、任务状态过期秒数、任务内容、任务状态字段与值
+_ENQUEUE_SCRIPT = """
+if redis.call('sadd', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('hset', KEYS[2], unpack(ARGV, 4))
+redis.call('expire', KEYS[2], ARGV[2])
+redis.call('lpush', KEYS[3], ARGV[3])
+return 1
+"""
+
+
+@dataclass
+class IngestJob:
+    kn_name: str
+    file_path: str
+    file_name: str
+    file_hash: str
+    file_size: int
+    job_id: str = field(default_factory=lambda: str(id_generator.next_id()))
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+
+    @property
+    def dedupe_key(self) -> str:
+        return f"{self.kn_name}:{self.file_hash}"
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def loads(cls, raw: str) -> "IngestJob":
+        return cls(**json.loads(raw))
+
+
+class IngestQueue:
+    """
+    文档入库队列，上传接口与入库进程共用
+    """
+
+    def __init__(self, redis_url: str | None = None, prefix: str | None = None):
+        self._redis_url = redis_url
+        self.prefix = prefix or f"{Settings.basic_settings.REDIS_PREFIX}ingest:"
+        self._redis: aioredis.Redis | None = None
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        # 首次使用时创建，绑定当前进程与事件循环
+        if self._redis is None:
+            self._redis = aioredis.from_url(
+                self._redis_url or Settings.basic_settings.REDIS_URL,
+                decode_responses=True,
+            )
+        return self._redis
+
+    @property
+    def queue_key(self) -> str:
+        return f"{self.prefix}queue"
+
+    @property
+    def inflight_key(self) -> str:
+        return f"{self.prefix}inflight"
+
+    @property
+    def stats_key(self) -> str:
+        return f"{self.prefix}stats"
+
+    def processing_key(self, worker_id: str) -> str:
+        return f"{self.prefix}processing:{worker_id}"
+
+    def worker_key(self, worker_id: str) -> str:
+        return f"{self.prefix}worker:{worker_id}"
+
+    def job_key(self, job_id: str) -> str:
+        return f"{self.prefix}job:{job_id}"
+
+    def _set_job(self, pipe, job_id: str, **fields) -> None:
+        pipe.hset(self.job_key(job_id), mapping={k: str(v) for k, v in fields.items()})
+        pipe.expire(self.job_key(job_id), Settings.kn_settings.INGEST_JOB_TTL)
+
+    # ==================== 上传接口 ====================
+    async def enqueue(self, job: IngestJob) -> bool:
+        """任务入队，相同文件正在排队或入库时返回 False"""
+        fields = {
+            "status": JOB_QUEUED,
+            "kn_name": job.kn_name,
+            "file_name": job.file_name,
+            "enqueued_at": job.enqueued_at,
+        }
+        added = await self.redis.eval(
+            _ENQUEUE_SCRIPT,
+            3,
+            self.inflight_key,
+            self.job_key(job.job_id),
+            self.queue_key,
+            job.dedupe_key,
+            Settings.kn_settings.INGEST_JOB_TTL,
+            job.dumps(),
+            *(item for k, v in fields.items() for item in (k, str(v))),
+        )
+        return bool(added)
+
+    async def get_job(self, job_id: str) -> dict | None:
+        """查询任务状态"""
+        job = await self.redis.hgetall(self.job_key(job_id))
+        return job or None
+
+    # ==================== 入库进程 ====================
+    async def dequeue(self, worker_id: str, timeout: float = 1.0) -> tuple[IngestJob, str] | None:
+        """
+        取出一个任务并移动到该进程的处理中列表，队列为空时最多等待 timeout 秒
+
+        返回任务与其原始内容，完成或失败时凭原始内容从处理中列表删除
+        """
+        raw = await self.redis.blmove(self.queue_key, self.processing_key(worker_id), timeout, "RIGHT", "LEFT")
+        if raw is None:
+            return None
+        return IngestJob.loads(raw), raw
+
+    async def mark_running(self, job: IngestJob, worker_id: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            self._set_job(pipe, job.job_id, status=JOB_RUNNING, worker_id=worker_id, attempts=job.attempts + 1,
+                          started_at=time.time())
+            await pipe.execute()
+
+    async def complete(self, worker_id: str, raw: str, job: IngestJob, docs_count: int, seconds: float) -> None:
+        """任务完成：移出处理中列表并累计吞吐统计，在同一个事务中执行"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            self._set_job(pipe, job.job_id, status=JOB_DONE, docs_count=docs_count, seconds=round(seconds, 3),
+                          finished_at=time.time())
+            pipe.hincrby(self.stats_key, "completed", 1)
+            pipe.hincrby(self.stats_key, "docs", docs_count)
+            pipe.hincrbyfloat(self.stats_key, "seconds", seconds)
+            pipe.srem(self.inflight_key, job.dedupe_key)
+            pipe.lrem(self.processing_key(worker_id), 1, raw)
+            await pipe.execute()
+
+    async def fail(self, worker_id: str, raw: str, job: IngestJob, error: str, retry: bool) -> None:
+        """任务失败：retry 为 True 时重新放回待处理队列，否则标记为失败"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if retry:
+                job.attempts += 1
+                self._set_job(pipe, job.job_id, status=JOB_QUEUED, error=error)
+                pipe.lpush(self.queue_key, job.dumps())
+            else:
+                self._set_job(pipe, job.job_id, status=JOB_FAILED, error=error, finished_at=time.time())
+                pipe.hincrby(self.stats_key, "failed", 1)
+                pipe.srem(self.inflight_key, job.dedupe_key)
+            pipe.lrem(self.processing_key(worker_id), 1, raw)
+            await pipe.execute()
+
+    async def heartbeat(self, worker_id: str, info: dict, ttl: int) -> None:
+        """上报入库进程的状态与吞吐，超过 ttl 秒未上报视为进程已退出"""
+        await self.redis.set(self.worker_key(worker_id), json.dumps(info, ensure_ascii=False), ex=ttl)
+
+    async def remove_worker(self, worker_id: str) -> None:
+        await self.redis.delete(self.worker_key(worker_id))
+
+    async def recover(self) -> int:
+        """把已退出的入库进程处理中列表里的任务放回待处理队列，返回恢复的任务数"""
+        recovered = 0
+        processing_prefix = self.processing_key("")
+        async for key in self.redis.scan_iter(match=f"{processing_prefix}*"):
+            worker_id = key[len(processing_prefix):]
+            if await self.redis.exists(self.worker_key(worker_id)):
+                continue
+            while await self.redis.lmove(key, self.queue_key, "RIGHT", "LEFT") is not None:
+                recovered += 1
+        return recovered
+
+    # ==================== 统计 ====================
+    async def stats(self) -> dict:
+        """待处理任务数、处理中任务数、累计吞吐与各入库进程的状态"""
+        processing = 0
+        async for key in self.redis.scan_iter(match=f"{self.processing_key('')}*"):
+            processing += await self.redis.llen(key)
+
+        workers = []
+        async for key in self.redis.scan_iter(match=f"{self.worker_key('')}*"):
+            info = await self.redis.get(key)
+            if info:
+                workers.append(json.loads(info))
+
+        totals = await self.redis.hgetall(self.stats_key)
+        completed = int(totals.get("completed", 0))
+        seconds = float(totals.get("seconds", 0))
+        return {
+            "backlog": await self.redis.llen(self.queue_key),
+            "processing": processing,
+            "completed": completed,
+            "failed": int(totals.get("failed", 0)),
+            "docs": int(totals.get("docs", 0)),
+            "avg_job_seconds": round(seconds / completed, 3) if completed else 0.0,
+            "workers": sorted(workers, key=lambda w: w.get("worker_id", "")),
+        }
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+ingest_queue = IngestQueue()
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+
+from config.settings import Settings
+from app.rag.vector_store.base import VsServiceFactory
+from app.rag.document_loader.loader_factory import get_document_loader, lazy_load_documents
+from agent_server.db.repository.knowledge_file_repository import knowledge_file_repository
+from agent_server.schemas.knowledge.knowledge_file_schema import KnowledgeFileCreate
+
+
+async def is_file_ingested(kn_name: str, file_hash: str) -> bool:
+    """相同内容的文件是否已入库"""
+    return await knowledge_file_repository.get_by_hash(kb_name=kn_name, file_hash=file_hash) is not None
+
+
+async def ingest_file(kn_name: str, file_path: str | Path, file_name: str, file_hash: str, file_size: int) -> int:
+    """
+    文件入库：流式加载、按批次分割、嵌入并写入向量库，然后记录已入库的文件哈希
+
+    上传接口（INGEST_MODE=inline）与入库进程共用，返回写入向量库的文本块数
+    文本块 id 由知识库名称、文件哈希与文本块序号确定，入库失败重试时覆盖上次已写入的文本块，不会重复写入
+    """
+    file_path = Path(file_path)
+    # 流式加载：按页/行产出文档，按批次分割、嵌入并写入向量库
+    documents = lazy_load_documents(str(file_path))
+
+    vs_service = VsServiceFactory.get_service(vector_store_type=Settings.kn_settings.DEFAULT_VS_TYPE, kn_name=kn_name)
+    docs_count = await run_in_threadpool(
+        vs_service.save_vector_store_batches, documents, id_prefix=f"{kn_name}:{file_hash}"
+    )
+
+    # 记录已入库的文件哈希
+    await knowledge_file_repository.create(obj_in=KnowledgeFileCreate(
+        file_name=file_name or file_path.name,
+        file_ext=file_path.suffix,
+        file_hash=file_hash,
+        kb_name=kn_name,
+        document_loader_name=get_document_loader(str(file_path)).__class__.__name__,
+        text_splitter_name=vs_service.recursive_text_splitter.__class__.__name__,
+        file_size=file_size,
+        docs_count=docs_count,
+    ))
+    return docs_count
@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+
+# 入库依赖中的部分模块以 config.xxx / app.xxx 方式导入，需要把 agent_server 目录加入 sys.path
+AGENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if AGENT_DIR not in sys.path:
+    sys.path.append(AGENT_DIR)
+
+from agent_server.config.settings import Settings  # noqa: E402
+from agent_server.utils.log_util import build_logger  # noqa: E402
+from agent_server.utils.id_util import id_generator, MULTI_PROCESS_ENV  # noqa: E402
+from agent_server.utils.process_util import get_process_pool_workers, shutdown_process_pool  # noqa: E402
+from agent_server.app.rag.ingest.ingest_queue import IngestQueue, IngestJob, ingest_queue  # noqa: E402
+
+
+"""
+文档入库进程
+
+独立于 API 服务运行，消费上传接口写入的入库队列（INGEST_MODE=queue）：
+
+    python -m agent_server.app.rag.ingest.ingest_worker --concurrency 4
+
+- 每个进程同时处理 concurrency 个文件，嵌入模型调用等 IO 在事件循环与线程中并发
+- PDF 解析、文本分割等 CPU 密集型任务使用本进程自己的进程池，不占用 API 进程的 CPU
+- 定期上报心跳与吞吐，可通过 GET /api/rag/ingest/stats 查看积压与各进程的处理速度
+"""
+
+logger = build_logger("ingest-worker")
+
+# 心跳上报间隔与过期时间（秒），心跳过期的进程视为已退出，其处理中的任务会被放回队列
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TTL = 30
+
+# 队列为空时单次等待时间（秒），也是收到停止信号后的最长响应时间
+DEQUEUE_TIMEOUT = 1.0
+
+
+class IngestWorker:
+    """
+    入库进程：从入库队列取出任务并执行入库
+    """
+
+    def __init__(
+        self,
+        queue: IngestQueue | None = None,
+        concurrency: int | None = None,
+        worker_id: str | None = None,
+        ingest_func=None,
+    ):
+        self.queue = queue or ingest_queue
+        self.concurrency = max(1, concurrency or Settings.kn_settings.INGEST_WORKER_CONCURRENCY)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        if ingest_func is None:
+            # 入库依赖（向量库、嵌入模型、加载器）较重，只在入库进程中导入
+            from agent_server.app.rag.ingest.ingest_service import ingest_file, is_file_ingested
+
+            async def ingest_func(job: IngestJob) -> int:
+                if await is_file_ingested(job.kn_name, job.file_hash):
+                    return 0
+                return await ingest_file(job.kn_name, job.file_path, job.file_name, job.file_hash, job.file_size)
+        self._ingest = ingest_func
+
+        self.processed = 0
+        self.failed = 0
+        self.docs = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.time()
+        self._tasks: set[asyncio.Task] = set()
+        self._stop_event: asyncio.Event | None = None
+
+    def info(self) -> dict:
+        """进程状态与吞吐"""
+        uptime = max(time.time() - self.started_at, 1e-6)
+        return {
+            "worker_id": self.worker_id,
+            "pid": os.getpid(),
+            "concurrency": self.concurrency,
+            "running": len(self._tasks),
+            "processed": self.processed,
+            "failed": self.failed,
+            "docs": self.docs,
+            "uptime_seconds": round(uptime, 1),
+            "jobs_per_minute": round(self.processed * 60 / uptime, 3),
+            "docs_per_second": round(self.docs / uptime, 3),
+            # 处理任务的时间占比，接近 1 说明该进程已满负荷，需要增加入库进程
+            "utilization": round(self.busy_seconds / (uptime * self.concurrency), 3),
+            "process_pool_workers": get_process_pool_workers(),
+        }
+
+    def stop(self) -> None:
+        """停止取新任务，正在处理的任务完成后 run 返回"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def run(self) -> None:
+        self._stop_event = asyncio.Event()
+        self.started_at = time.time()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        await self.queue.heartbeat(self.worker_id, self.info(), HEARTBEAT_TTL)
+        recovered = await self.queue.recover()
+        logger.info(f"入库进程已启动: worker_id={self.worker_id}, concurrency={self.concurrency}, 恢复任务数={recovered}")
+        heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        try:
+            while not self._stop_event.is_set():
+                await semaphore.acquire()
+                try:
+                    item = await self.queue.dequeue(self.worker_id, timeout=DEQUEUE_TIMEOUT)
+                except Exception as e:
+                    semaphore.release()
+                    logger.warning(f"读取入库队列失败: {e}")
+                    await asyncio.sleep(DEQUEUE_TIMEOUT)
+                    continue
+                if item is None:
+                    semaphore.release()
+                    continue
+                task = asyncio.create_task(self._process(*item, semaphore))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            heartbeat_task.cancel()
+            try:
+                await heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            await self.queue.remove_worker(self.worker_id)
+            logger.info(f"入库进程已停止: {self.info()}")
+
+    async def _process(self, job: IngestJob, raw: str, semaphore: asyncio.Semaphore) -> None:
+        start = time.perf_counter()
+        try:
+            await self.queue.mark_running(job, self.worker_id)
+            docs_count = await self._ingest(job)
+        except Exception as e:
+            retry = job.attempts + 1 < Settings.kn_settings.INGEST_MAX_ATTEMPTS
+            logger.error(f"文件入库失败: job_id={job.job_id}, file={job.file_name}, attempts={job.attempts + 1}, "
+                         f"retry={retry}, error={e}")
+            self.failed += 1
+            try:
+                await self.queue.fail(self.worker_id, raw, job, str(e), retry)
+            except Exception as ack_error:
+                # 任务留在处理中列表，进程退出后由其它入库进程恢复
+                logger.error(f"更新入库任务状态失败: job_id={job.job_id}, error={ack_error}")
+        else:
+            seconds = time.perf_counter() - start
+            self.processed += 1
+            self.docs += docs_count
+            logger.info(f"文件入库完成: job_id={job.job_id}, file={job.file_name}, docs={docs_count}, "
+                        f"seconds={seconds:.2f}")
+            try:
+                await self.queue.complete(self.worker_id, raw, job, docs_count, seconds)
+            except Exception as ack_error:
+                logger.error(f"更新入库任务状态失败: job_id={job.job_id}, error={ack_error}")
+        finally:
+            self.busy_seconds += time.perf_counter() - start
+            semaphore.release()
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await self.queue.heartbeat(self.worker_id, self.info(), HEARTBEAT_TTL)
+                # 顺带恢复其它已退出进程遗留的任务
+                if recovered := await self.queue.recover():
+                    logger.warning(f"已将 {recovered} 个遗留的入库任务放回队列")
+            except Exception as e:
+                logger.warning(f"上报入库进程心跳失败: {e}")
+
+
+async def run_worker(concurrency: int | None = None) -> None:
+    from agent_server.db.base import setup_database_connection, close_database_connection
+    from agent_server.app.rag.vector_store.engine_registry import vs_engine_registry
+    from agent_server.app.llm.model_health import model_health
+    from agent_server.utils.llm_util import get_default_embedding
+
+    # 与 API 进程一样，连接池在本进程中创建
+    await setup_database_connection()
+    await vs_engine_registry.startup([Settings.kn_settings.DEFAULT_VS_TYPE])
+    await asyncio.to_thread(lambda: id_generator.node_id)
+    # 后台探测默认嵌入模型，check_embed_model 只读取本进程的探测结果
+    model_health.register_embed_model(get_default_embedding())
+    model_health.start()
+    worker = IngestWorker(concurrency=concurrency)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:  # Windows
+            pass
+
+    try:
+        await worker.run()
+    finally:
+        await model_health.stop()
+        await worker.queue.close()
+        await vs_engine_registry.close()
+        await close_database_connection()
+        shutdown_process_pool()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="文档入库进程，消费上传接口写入的入库队列")
+    parser.add_argument("--concurrency", type=int, default=Settings.kn_settings.INGEST_WORKER_CONCURRENCY,
+                        help="同时处理的文件数")
+    args = parser.parse_args(argv)
+    # 入库进程与 API 进程同时运行，不能按进程号分配雪花ID节点
+    os.environ.setdefault(MULTI_PROCESS_ENV, "1")
+    asyncio.run(run_worker(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
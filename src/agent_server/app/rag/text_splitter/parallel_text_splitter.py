@@ -0,0 +1,117 @@
+from functools import partial
+from typing import Sequence
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from agent_server.core.metrics import CacheStats
+from agent_server.utils.process_util import get_cpu_count, get_process_pool
+
+
+"""
+多进程文档分割
+
+tiktoken 计算长度的递归分割是纯 CPU 计算，单线程分割数千页 PDF 时其它核心处于空闲状态。
+这里按文本长度把文档切成连续的分片，分发到进程池中分割，再按分片顺序拼接结果：
+- 每个文档只在一个分片中分割，metadata 与 start_index 与串行分割完全一致
+- 分片连续且按提交顺序收集结果，输出顺序稳定
+"""
+
+# 每个进程缓存分割器，避免每个分片都重新加载 tiktoken 编码
+_splitter_cache: dict[tuple, RecursiveCharacterTextSplitter] = {}
+# 只统计当前进程中的命中情况，进程池子进程中的命中不会汇总到这里
+splitter_cache_stats = CacheStats()
+
+# 分片数量为进程数的倍数，页面长度不均时可以更好地负载均衡
+SHARDS_PER_WORKER = 4
+
+
+def get_tiktoken_splitter(
+    chunk_size: int,
+    chunk_overlap: int,
+    separators: tuple[str, ...],
+) -> RecursiveCharacterTextSplitter:
+    """获取按 tiktoken 编码计算长度的递归分割器，同一参数在进程内只创建一次"""
+    key = (chunk_size, chunk_overlap, separators)
+    splitter = _splitter_cache.get(key)
+    if splitter is not None:
+        splitter_cache_stats.hit()
+    else:
+        splitter_cache_stats.miss()
+        splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            add_start_index=True,
+            separators=list(separators),
+        )
+        _splitter_cache[key] = splitter
+    return splitter
+
+
+def _split_shard(
+    shard: list[Document],
+    chunk_size: int,
+    chunk_overlap: int,
+    separators: tuple[str, ...],
+) -> list[Document]:
+    """子进程中执行：分割一个分片内的文档"""
+    splitter = get_tiktoken_splitter(chunk_size, chunk_overlap, separators)
+    return splitter.split_documents(shard)
+
+
+def shard_documents(documents: Sequence[Document], num_shards: int) -> list[list[Document]]:
+    """
+    按文本长度把文档划分为不超过 num_shards 个连续分片，每个分片的文本总长度尽量接近
+    """
+    if not documents:
+        return []
+    num_shards = max(1, min(num_shards, len(documents)))
+    total = sum(len(doc.page_content) for doc in documents)
+    target = total / num_shards
+
+    shards: list[list[Document]] = []
+    current: list[Document] = []
+    current_size = 0
+    for doc in documents:
+        current.append(doc)
+        current_size += len(doc.page_content)
+        if current_size >= target and len(shards) < num_shards - 1:
+            shards.append(current)
+            current = []
+            current_size = 0
+    if current:
+        shards.append(current)
+    return shards
+
+
+def parallel_split_documents(
+    documents: Sequence[Document],
+    chunk_size: int,
+    chunk_overlap: int,
+    separators: Sequence[str],
+    max_workers: int = 0,
+) -> list[Document]:
+    """
+    使用进程池分割文档，结果与 RecursiveCharacterTextSplitter.from_tiktoken_encoder(add_start_index=True) 串行分割一致
+
+    Args:
+        documents: 待分割文档
+        chunk_size: 分块大小（token 数）
+        chunk_overlap: 分块重叠大小（token 数）
+        separators: 分隔符优先级列表
+        max_workers: 进程数，0 表示使用 CPU 核数
+    """
+    workers = max_workers if max_workers > 0 else get_cpu_count()
+    split_shard = partial(
+        _split_shard,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=tuple(separators),
+    )
+    if workers <= 1 or len(documents) < 2:
+        return split_shard(list(documents))
+
+    shards = shard_documents(documents, workers * SHARDS_PER_WORKER)
+    # executor.map 按提交顺序返回结果，保证输出顺序稳定
+    results = get_process_pool(workers).map(split_shard, shards)
+    return [doc for shard_docs in results for doc in shard_docs]
@@ -1,18 +1,17 @@
 
 import operator
 import os
+import uuid
 from abc import ABC, abstractmethod
+from functools import cached_property
+from itertools import batched
 from pathlib import Path
-from typing import Any, Union
-from webbrowser import get
+from typing import Any, Iterable, Union
 
 from sqlalchemy.orm import Session
 
 #from langchain.schema import Document
 from langchain_core.documents import Document
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_community.document_transformers import EmbeddingsRedundantFilter
-from langchain_experimental.text_splitter import SemanticChunker
 from langchain_text_splitters import (
     CharacterTextSplitter,
     RecursiveCharacterTextSplitter, 
@@ -26,6 +25,12 @@ from utils.log_util import build_logger
 from utils.llm_util import (
     get_default_embedding,
 )
+from agent_server.app.rag.text_splitter.parallel_text_splitter import parallel_split_documents, get_tiktoken_splitter
+from agent_server.app.rag.document_transformer.redundant_chunk_filter import filter_redundant_chunks
+from agent_server.core.tracing import span
+
+
+logger = build_logger("vector-store-service")
 
 
 class SupportedVSType:
@@ -47,9 +52,19 @@ def get_doc_path(knowledge_name: str):
     return os.path.join(get_kn_path(knowledge_name), "content")
 
 
+def make_chunk_ids(id_prefix: str, count: int) -> list[str]:
+    """
+    按前缀与文本块序号生成确定的文本块 id（UUID 格式），同一文件重新入库时生成相同的 id
+    """
+    return [str(uuid.uuid5(uuid.NAMESPACE_URL, f"chunk:{id_prefix}:{i}")) for i in range(count)]
+
+
 
 class VsService(ABC):
 
+    # 递归文本分割的分隔符优先级列表
+    split_separators: list[str] = ["\n\n", "\n", " ", ""]
+
     # CharacterTextSplitter一般用于简单文本的分割，用于将长文本分割成更小的块(chunks)，以便更好地处理大文本数据。
     char_text_splitter: CharacterTextSplitter = CharacterTextSplitter(
             separator="",  # 没有分割符，也就是连贯分割
@@ -59,13 +74,7 @@ class VsService(ABC):
         )
     
     # RecursiveCharacterTextSplitter采用递归方式尝试多种分隔符来分割文本，直到获得合适大小的块，它会优先在段落、句子等自然边界处分割，保持文本语义完整性。
-    recursive_text_splitter: RecursiveCharacterTextSplitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=Settings.kn_settings.CHUNK_SIZE, # 分块大小
-        chunk_overlap=Settings.kn_settings.OVERLAP_SIZE, # 分块重叠大小
-        # length_function=len, # 文本长度计算函数
-        add_start_index=True,  # 原始文档中每个块的起始位置
-        separators=["\n\n", "\n", " ", ""]  # 分隔符优先级列表
-    )
+    # 基于 tiktoken 编码计算长度，加载编码较慢（首次还需下载），在首次分割时创建，见 recursive_text_splitter
     
     # HTMLHeaderTextSplitter可以根据HTML的标题结构（h1-h6）来智能地分割文档内容，同时保留标题和内容的层次关系。
     html_text_splitter = HTMLHeaderTextSplitter(
@@ -88,13 +97,6 @@ class VsService(ABC):
         self.kn_info = kn_info or Settings.kn_settings.KN_INFO.get(kn_name, f"关于{kn_name}的知识库")
         self.embed_model = embed_model
         self.embeddings = ModelFactory.get_embeddings(self.embed_model)
-        # 语义文本分割器, 使用嵌入模型进行文本分割
-        self.semantic_text_splitter = SemanticChunker(
-            self.embeddings,
-            breakpoint_threshold_type="percentile",
-            breakpoint_threshold_amount=30,  # 差异值，百分之五十
-            number_of_chunks=None
-        )
         self.kn_path = get_kn_path(self.kn_name)
         self.doc_path = get_doc_path(self.kn_name)
         self.do_init()
@@ -102,6 +104,31 @@ class VsService(ABC):
     
     def __repr__(self) -> str:
         return f"{self.kn_name} @ {self.embed_model}"
+
+    @property
+    def recursive_text_splitter(self) -> RecursiveCharacterTextSplitter:
+        """
+        递归文本分割器，按 tiktoken 编码计算长度，同一分块参数在进程内共享
+        """
+        return get_tiktoken_splitter(
+            Settings.kn_settings.CHUNK_SIZE, # 分块大小
+            Settings.kn_settings.OVERLAP_SIZE, # 分块重叠大小
+            tuple(self.split_separators), # 分隔符优先级列表
+        )
+
+    @cached_property
+    def semantic_text_splitter(self):
+        """
+        语义文本分割器, 使用嵌入模型进行文本分割；langchain_experimental 导入较慢，首次使用时创建
+        """
+        from langchain_experimental.text_splitter import SemanticChunker
+
+        return SemanticChunker(
+            self.embeddings,
+            breakpoint_threshold_type="percentile",
+            breakpoint_threshold_amount=30,  # 差异值，百分之五十
+            number_of_chunks=None
+        )
     
     def do_init(self) -> None:
         pass
@@ -113,9 +140,10 @@ class VsService(ABC):
         raise NotImplementedError("Subclasses should implement this method.")
     
     @abstractmethod
-    def save_vector_store(self, docs: list[Document]) -> list[str]:
+    def save_vector_store(self, docs: list[Document], id_prefix: str | None = None) -> list[str]:
         """
         保存向量库:FAISS保存到磁盘，milvus,PGVector,ES保存到数据库。
+        id_prefix 不为空时按前缀与文本块序号生成确定的 id，见 add_to_vector_store
         """
         pass
     
@@ -139,23 +167,107 @@ class VsService(ABC):
     
     def split_document(self, 
                       documents: list[Document],
-                      enable_filter: bool = False,) -> list[Document]:
+                      parallel: bool | None = None,) -> list[Document]:
         """
         递归文本分割器
+        parallel 为 None 时，文档数量达到 SPLIT_PARALLEL_MIN_DOCS 则使用多进程分割，结果与串行分割一致
+        近似重复文本块的过滤在 add_to_vector_store 中进行，过滤时计算的嵌入向量直接写入向量库
         """
-        if enable_filter:
-            # 根据文档嵌入后相似度进行冗余内容的过滤，相似度超过0.8，则会去掉
-            docFilter = EmbeddingsRedundantFilter(
-                embeddings=self.embeddings, 
-                similarity_threshold=0.8)
-            documents = list(docFilter.transform_documents(documents))
+        if parallel is None:
+            parallel = (Settings.kn_settings.SPLIT_WORKERS != 1
+                        and len(documents) >= Settings.kn_settings.SPLIT_PARALLEL_MIN_DOCS)
 
-        docs = self.recursive_text_splitter.split_documents(documents)
+        with span("split_document", stage="split", documents=len(documents), parallel=parallel):
+            if parallel:
+                docs = parallel_split_documents(
+                    documents,
+                    chunk_size=Settings.kn_settings.CHUNK_SIZE,
+                    chunk_overlap=Settings.kn_settings.OVERLAP_SIZE,
+                    separators=self.split_separators,
+                    max_workers=Settings.kn_settings.SPLIT_WORKERS,
+                )
+            else:
+                docs = self.recursive_text_splitter.split_documents(documents)
 
         return docs
 
+    def filter_redundant_documents(
+        self,
+        docs: list[Document],
+        embeddings: list[list[float]] | None = None,
+    ) -> tuple[list[Document], list[list[float]]]:
+        """
+        过滤近似重复的文本块，返回保留的文本块及其嵌入向量
+        未传入 embeddings 时使用当前嵌入模型计算
+        """
+        if not docs:
+            return [], []
+        if embeddings is None:
+            embeddings = self.embeddings.embed_documents([doc.page_content for doc in docs])
+        with span("filter_redundant_documents", stage="redundant_filter", chunks=len(docs)):
+            return filter_redundant_chunks(
+                docs,
+                embeddings,
+                similarity_threshold=Settings.kn_settings.REDUNDANT_SIMILARITY_THRESHOLD,
+            )
+
+    def add_to_vector_store(self, docs: list[Document], id_prefix: str | None = None) -> list[str]:
+        """
+        将分割后的文本块写入向量库
+        开启 ENABLE_REDUNDANT_FILTER 时，先计算嵌入向量并过滤近似重复的文本块，再直接写入向量，避免重复嵌入
+        id_prefix 不为空时在过滤前按文本块序号生成确定的 id，向量库按 id 覆盖写入，入库失败重试时不会重复写入
+        """
+        if id_prefix is not None:
+            for doc, doc_id in zip(docs, make_chunk_ids(id_prefix, len(docs))):
+                doc.id = doc_id
+
+        if not Settings.kn_settings.ENABLE_REDUNDANT_FILTER:
+            with span("add_documents", stage="vector_write", chunks=len(docs)):
+                return self.store.add_documents(docs, ids=[doc.id for doc in docs] if id_prefix is not None else None)
+
+        total = len(docs)
+        docs, embeddings = self.filter_redundant_documents(docs)
+        if len(docs) < total:
+            logger.info(f"Filtered {total - len(docs)} redundant chunks out of {total}.")
+        with span("add_embeddings", stage="vector_write", chunks=len(docs)):
+            return self.store.add_embeddings(
+                texts=[doc.page_content for doc in docs],
+                embeddings=embeddings,
+                metadatas=[doc.metadata for doc in docs],
+                ids=[doc.id for doc in docs] if id_prefix is not None else None,
+            )
+
+    def save_vector_store_batches(
+        self,
+        documents: Iterable[Document],
+        batch_size: int = 0,
+        id_prefix: str | None = None,
+    ) -> int:
+        """
+        流式保存向量库：按批次分割、嵌入并写入，内存占用只与批次大小相关，与文件大小无关
+        documents 可以是 loader.lazy_load() 返回的生成器，返回写入的文本块数量
+        id_prefix 不为空时每个批次以 "{id_prefix}:{批次序号}" 为前缀生成确定的文本块 id，同一文件重新入库时覆盖而不是重复写入
+        """
+        batch_size = batch_size or Settings.kn_settings.INGEST_BATCH_SIZE
+        total = 0
+        # 整个入库过程为一次追踪，每个批次为其中的一个 Span
+        with span("save_vector_store_batches", kn_name=self.kn_name, batch_size=batch_size):
+            for batch_no, batch in enumerate(batched(documents, batch_size)):
+                with span("save_vector_store_batch", documents=len(batch)):
+                    batch_prefix = f"{id_prefix}:{batch_no}" if id_prefix is not None else None
+                    total += len(self.save_vector_store(list(batch), id_prefix=batch_prefix))
+        logger.info(f"Saved {total} chunks to vector store in batches of {batch_size} documents.")
+        return total
+
     def check_embed_model(self) -> tuple[bool, str]:
         return ModelFactory.check_embed_model(self.embed_model)
+
+    @classmethod
+    async def aping(cls) -> None:
+        """
+        检查向量库连接是否可用，不可用时抛出异常；用于健康检查，不需要创建服务实例
+        """
+        raise NotImplementedError(f"{cls.__name__} does not support health check.")
     
     
 class VsServiceFactory:
@@ -166,39 +278,42 @@ class VsServiceFactory:
         kn_name: str = None,
         kn_info: str = None,
     ) -> VsService:
-        if isinstance(vector_store_type, str):
-            vector_store_type = getattr(SupportedVSType, vector_store_type.upper())
-        
         params = {
             "embed_model": embed_model,
             "kn_name": kn_name,
             "kn_info": kn_info,
         }
-        
+        return VsServiceFactory.get_service_class(vector_store_type)(**params)
+
+    @staticmethod
+    def get_service_class(vector_store_type: Union[str, SupportedVSType]) -> type[VsService]:
+        if isinstance(vector_store_type, str):
+            vector_store_type = getattr(SupportedVSType, vector_store_type.upper())
+
         if SupportedVSType.PG == vector_store_type:
             from app.rag.vector_store.vs_pg_service import (
                 VsPGService,
             )
 
-            return VsPGService(**params)
+            return VsPGService
         elif SupportedVSType.RELYT == vector_store_type:
             from app.rag.vector_store.vs_relyt_service import (
                 VsRelytService,
             )
 
-            return VsRelytService(**params)
+            return VsRelytService
         # elif SupportedVSType.ES == vector_store_type:
         #     from app.rag.vector_store.vs_es_service import (
         #         VsESService,
         #     )
 
-        #     return VsESService(**params)
+        #     return VsESService
         else:  
             from app.rag.vector_store.vs_relyt_service import (
                 VsRelytService,
             )
 
-            return VsRelytService(**params)
+            return VsRelytService
 
     # @staticmethod
     # def get_service_by_name(kn_name: str) -> VsService:
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable
+
+from agent_server.config.settings import Settings
+from agent_server.utils.log_util import build_logger
+from agent_server.db.pool_monitor import pool_monitor, instrumented_pool_class, InstrumentedAsyncAdaptedQueuePool
+from agent_server.app.rag.vector_store.base import SupportedVSType
+
+
+"""
+向量库引擎注册表
+
+向量库服务不再在类定义时创建引擎，而是通过注册表获取进程内的引擎：
+- 应用 lifespan 启动时为默认向量库创建引擎，关闭时释放连接池
+- 多 worker 部署时每个进程在 fork 之后各自创建引擎，fork 出的子进程丢弃父进程的引擎，不复用其连接
+- 脚本等没有 lifespan 的场景，首次获取时创建
+"""
+
+logger = build_logger("vector-store-engine")
+
+
+@dataclass
+class EngineSpec:
+    create: Callable[[], Any]  # 创建引擎
+    close: Callable[[Any], Awaitable[None]]  # 释放连接池
+    discard: Callable[[Any], None] | None = None  # fork 出的子进程中丢弃继承的引擎，不能关闭父进程的连接
+
+
+def _vs_config(vs_type: str) -> dict[str, Any]:
+    return Settings.kn_settings.VS_CONFIG.get(vs_type) or {}
+
+
+def _pool_kwargs() -> dict[str, Any]:
+    db_settings = Settings.db_settings
+    return {
+        "pool_size": db_settings.VS_POOL_SIZE,
+        "max_overflow": db_settings.VS_MAX_OVERFLOW,
+        "pool_timeout": db_settings.POOL_TIMEOUT,
+        "pool_recycle": db_settings.POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def _create_pg_engine():
+    from langchain_postgres import PGEngine
+
+    # PGEngine 在后台线程的事件循环中使用 asyncpg 连接池，同步接口也通过该事件循环执行
+    engine = PGEngine.from_connection_string(
+        url=_vs_config(SupportedVSType.PG).get("connection_uri"),
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        **_pool_kwargs(),
+    )
+    pool_monitor.register("vs_pg", engine._pool)
+    return engine
+
+
+async def _close_pg_engine(engine) -> None:
+    pool_monitor.unregister("vs_pg")
+    await engine.close()
+
+
+def _discard_pg_engine(engine) -> None:
+    # 后台事件循环线程不会被 fork 到子进程中，需要丢弃父进程的事件循环，子进程首次创建引擎时重新启动
+    pg_engine_cls = type(engine)
+    pg_engine_cls._default_loop = None
+    pg_engine_cls._default_thread = None
+
+
+def _create_relyt_engine():
+    import sqlalchemy
+
+    url = _vs_config(SupportedVSType.RELYT).get("connection_uri")
+    engine = sqlalchemy.create_engine(
+        url,
+        poolclass=instrumented_pool_class(url),
+        **_pool_kwargs(),
+    )
+    pool_monitor.register("vs_relyt", engine)
+    return engine
+
+
+async def _close_relyt_engine(engine) -> None:
+    pool_monitor.unregister("vs_relyt")
+    await asyncio.to_thread(engine.dispose)
+
+
+def _discard_relyt_engine(engine) -> None:
+    # close=False：只丢弃连接池中的连接对象，不关闭父进程仍在使用的连接
+    engine.dispose(close=False)
+
+
+class VsEngineRegistry:
+    """
+    向量库引擎注册表，按向量库类型管理进程内的引擎
+    """
+
+    def __init__(self):
+        self._specs: dict[str, EngineSpec] = {}
+        self._engines: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        vs_type: str,
+        create: Callable[[], Any],
+        close: Callable[[Any], Awaitable[None]],
+        discard: Callable[[Any], None] | None = None,
+    ) -> None:
+        """注册向量库类型的引擎创建与释放方法"""
+        self._specs[vs_type] = EngineSpec(create=create, close=close, discard=discard)
+
+    def get_engine(self, vs_type: str) -> Any:
+        """获取向量库引擎，未创建时创建"""
+        engine = self._engines.get(vs_type)
+        if engine is not None:
+            return engine
+
+        spec = self._specs.get(vs_type)
+        if spec is None:
+            raise ValueError(f"Unsupported vector store engine: {vs_type}")
+        with self._lock:
+            engine = self._engines.get(vs_type)
+            if engine is None:
+                engine = spec.create()
+                self._engines[vs_type] = engine
+                logger.info(f"向量库引擎已创建: {vs_type}, pid={os.getpid()}")
+        return engine
+
+    def started(self) -> list[str]:
+        """已创建引擎的向量库类型"""
+        return list(self._engines)
+
+    async def startup(self, vs_types: Iterable[str]) -> None:
+        """应用启动时创建引擎，未注册的类型跳过"""
+        for vs_type in vs_types:
+            if vs_type in self._specs:
+                self.get_engine(vs_type)
+
+    async def close(self) -> None:
+        """释放所有引擎的连接池"""
+        with self._lock:
+            engines = list(self._engines.items())
+            self._engines.clear()
+        for vs_type, engine in engines:
+            try:
+                await self._specs[vs_type].close(engine)
+                logger.info(f"向量库引擎已关闭: {vs_type}")
+            except Exception as e:
+                logger.warning(f"关闭向量库引擎失败: {vs_type}, {e}")
+
+    def _after_fork(self) -> None:
+        # fork 出的子进程不能复用父进程的连接池与后台线程
+        engines = list(self._engines.items())
+        self._engines.clear()
+        self._lock = threading.Lock()
+        for vs_type, engine in engines:
+            discard = self._specs[vs_type].discard
+            if discard is not None:
+                try:
+                    discard(engine)
+                except Exception:
+                    pass
+
+
+vs_engine_registry = VsEngineRegistry()
+vs_engine_registry.register(SupportedVSType.PG, _create_pg_engine, _close_pg_engine, _discard_pg_engine)
+vs_engine_registry.register(SupportedVSType.RELYT, _create_relyt_engine, _close_relyt_engine, _discard_relyt_engine)
+
+os.register_at_fork(after_in_child=vs_engine_registry._after_fork)
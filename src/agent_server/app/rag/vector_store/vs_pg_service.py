@@ -2,12 +2,15 @@ from gc import collect
 import json
 from typing import override
 
+from sqlalchemy import text
+
 from langchain_core.documents import Document
 from langchain_core.embeddings import DeterministicFakeEmbedding
 from langchain_postgres import PGEngine, PGVectorStore
 from langchain_postgres.v2.indexes import DistanceStrategy
 
 from .base import VsService, SupportedVSType
+from agent_server.app.rag.vector_store.engine_registry import vs_engine_registry
 from app.llm.mode_factory import ModelFactory
 from utils.log_util import build_logger
 from config.settings import Settings
@@ -19,7 +22,12 @@ class VsPGService(VsService):
     """
     pgvector向量库服务
     """
-    engine = PGEngine.from_connection_string(url=Settings.kn_settings.VS_CONFIG.get(SupportedVSType.PG).get("connection_uri"))
+    @classmethod
+    def get_engine(cls) -> PGEngine:
+        """
+        获取当前进程的 PGEngine，由应用 lifespan 创建与关闭，见 engine_registry
+        """
+        return vs_engine_registry.get_engine(SupportedVSType.PG)
 
     def do_init(self):
         self.init_vector_store()
@@ -36,7 +44,7 @@ class VsPGService(VsService):
         #     vector_size=VECTOR_SIZE,
         # )
         self.store = PGVectorStore.create_sync(
-            engine=VsPGService.engine,
+            engine=self.get_engine(),
             embedding_service=ModelFactory.get_embeddings(embed_model=self.embed_model),
             table_name=table_name,
             id_column="id",
@@ -45,7 +53,7 @@ class VsPGService(VsService):
         )
         
     @override
-    def save_vector_store(self, docs: list[Document]) -> list[str]:
+    def save_vector_store(self, docs: list[Document], id_prefix: str | None = None) -> list[str]:
         """
         保存向量库:FAISS保存到磁盘，milvus,PGVector,ES保存到数据库。
         """
@@ -55,7 +63,7 @@ class VsPGService(VsService):
         
         splitter_docs = self.split_document(docs)
         
-        doc_ids = self.store.add_documents(splitter_docs)
+        doc_ids = self.add_to_vector_store(splitter_docs, id_prefix=id_prefix)
         logger.info(f"Saved {len(splitter_docs)} documents to PGVector store.")
         return doc_ids
     
@@ -82,6 +90,19 @@ class VsPGService(VsService):
         logger.info("Retrieved PGVector store retriever.")
         return retriever
 
+    @classmethod
+    async def aping(cls) -> None:
+        """
+        检查 pgvector 连接，PGEngine 的连接池运行在其自身的事件循环中
+        """
+        engine = cls.get_engine()
+
+        async def _ping():
+            async with engine._pool.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        await engine._run_as_async(_ping())
+
 if __name__ == "__main__":
     
     import os
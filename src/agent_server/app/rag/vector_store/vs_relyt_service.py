@@ -1,8 +1,8 @@
+import asyncio
 from gc import collect
 import json
 from typing import override
 
-import sqlalchemy
 from sqlalchemy import text
 from sqlalchemy.engine.base import Engine
 from sqlalchemy.orm import Session
@@ -11,7 +11,8 @@ from langchain.schema import Document
 from langchain_community.vectorstores.pgvector import PGVector, DistanceStrategy
 
 
-from .base import VsService, SupportedVSType
+from .base import VsService, SupportedVSType, make_chunk_ids
+from agent_server.app.rag.vector_store.engine_registry import vs_engine_registry
 from app.llm.mode_factory import ModelFactory
 from utils.log_util import build_logger
 from config.settings import Settings
@@ -23,9 +24,12 @@ class VsRelytService(VsService):
     """
     pgvector向量库服务
     """
-    engine: Engine = sqlalchemy.create_engine(
-        Settings.kn_settings.VS_CONFIG.get(SupportedVSType.RELYT).get("connection_uri"), pool_size=10
-    )
+    @classmethod
+    def get_engine(cls) -> Engine:
+        """
+        获取当前进程的数据库引擎，由应用 lifespan 创建与关闭，见 engine_registry
+        """
+        return vs_engine_registry.get_engine(SupportedVSType.RELYT)
 
     def do_init(self):
         self.init_vector_store()
@@ -36,14 +40,14 @@ class VsRelytService(VsService):
         """
         self.store =  PGVector(
             embedding_function=ModelFactory.get_embeddings(embed_model=self.embed_model),
-            connection=VsRelytService.engine,
+            connection=self.get_engine(),
             collection_name=Settings.kn_settings.VS_CONFIG.get(SupportedVSType.RELYT).get("collection_name"),
             connection_string=Settings.kn_settings.VS_CONFIG.get(SupportedVSType.RELYT).get("connection_uri"),
             distance_strategy=DistanceStrategy.COSINE, # 可选值: DistanceStrategy.COSINE, DistanceStrategy.EUCLIDEAN
         )
         
     @override
-    def save_vector_store(self, docs: list[Document]) -> list[str]:
+    def save_vector_store(self, docs: list[Document], id_prefix: str | None = None) -> list[str]:
         """
         保存向量库:FAISS保存到磁盘，milvus,PGVector,ES保存到数据库。
         """
@@ -53,10 +57,19 @@ class VsRelytService(VsService):
 
         splitter_docs = self.split_document(docs)
         
-        doc_ids = self.store.add_documents(splitter_docs)
+        doc_ids = self.add_to_vector_store(splitter_docs, id_prefix=id_prefix)
         logger.info(f"Saved {len(splitter_docs)} documents to PGVector store.")
         return doc_ids
 
+    @override
+    def add_to_vector_store(self, docs: list[Document], id_prefix: str | None = None) -> list[str]:
+        """
+        langchain_community 的 PGVector 按 custom_id 插入新记录而不是覆盖，写入前先删除上次写入的同 id 文本块
+        """
+        if id_prefix is not None and docs:
+            self.store.delete(ids=make_chunk_ids(id_prefix, len(docs)))
+        return super().add_to_vector_store(docs, id_prefix=id_prefix)
+
     @override
     def get_vector_store(self):
         """
@@ -72,4 +85,15 @@ class VsRelytService(VsService):
         retriever = self.store.as_retriever(search_kwargs={"k": Settings.kn_settings.VECTOR_SEARCH_TOP_K})
         logger.info("Retrieved PGVector store retriever.")
         return retriever
+
+    @classmethod
+    async def aping(cls) -> None:
+        """
+        检查向量库连接，同步引擎在线程中执行
+        """
+        def _ping():
+            with cls.get_engine().connect() as conn:
+                conn.execute(text("SELECT 1"))
+
+        await asyncio.to_thread(_ping)
          
\ No newline at end of file
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 import os
+import threading
 import typing as t
 from io import StringIO
 from pathlib import Path
 from functools import cached_property
 
-from memoization import cached, CachingAlgorithmFlag
+from loguru import logger
 from pydantic import BaseModel, Field, ConfigDict, computed_field
 from pydantic_settings import BaseSettings, PydanticBaseSettingsSource, YamlConfigSettingsSource, SettingsConfigDict
 
@@ -16,7 +17,7 @@ from ruamel.yaml.comments import CommentedBase, TaggedScalar
 
 __all__ = ["YamlTemplate", "MyBaseModel", "BaseFileSettings", "Field",
            "SubModelComment", "SettingsConfigDict",
-           "computed_field", "cached_property", "settings_property"]
+           "computed_field", "cached_property", "settings_property", "settings_watcher"]
 
 
 def import_yaml() -> ruamel.yaml.YAML:
@@ -228,30 +229,145 @@ class BaseFileSettings(BaseSettings):
             return data
 
 
-def _lazy_load_key(settings: BaseSettings):
-    keys = [settings.__class__]
+def _files_stamp(settings: BaseSettings) -> tuple:
+    """配置文件的状态（修改时间、大小），文件不存在或为空时为 None"""
+    keys = []
     for n in ["env_file", "json_file", "yaml_file", "toml_file"]:
         key = None
         if file := settings.model_config.get(n):
-            if os.path.isfile(file) and os.path.getsize(file) > 0:
-                key = int(os.path.getmtime(file))
+            try:
+                stat = os.stat(file)
+            except OSError:
+                stat = None
+            if stat is not None and stat.st_size > 0:
+                key = (stat.st_mtime_ns, stat.st_size)
         keys.append(key)
     return tuple(keys)
 
 
 _T = t.TypeVar("_T", bound=BaseFileSettings)
 
-@cached(max_size=1, algorithm=CachingAlgorithmFlag.LRU, thread_safe=True, custom_key_maker=_lazy_load_key)
-def _cached_settings(settings: _T) -> _T:
+SettingsCallback = t.Callable[[t.Any, t.Any], None]
+
+
+class SettingsHolder(t.Generic[_T]):
     """
-    the sesstings is cached, and refreshed when configuration files changed
+    the current snapshot of one settings class.
+    reading `current` is a plain attribute load; reload builds a new instance and publishes it by assignment,
+    so readers never see a half-initialized settings object.
     """
-    if settings.auto_reload:
-        settings.__init__()
-    return settings
 
+    def __init__(self, settings: _T):
+        self.current: _T = settings
+        self._stamp = _files_stamp(settings)
+        self._callbacks: list[SettingsCallback] = []
+
+    def add_callback(self, callback: SettingsCallback) -> None:
+        """callback(old, new) is called in the watcher thread after a new snapshot is published"""
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback: SettingsCallback) -> None:
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def reload_if_changed(self) -> bool:
+        old = self.current
+        if not old.auto_reload:
+            return False
+        stamp = _files_stamp(old)
+        if stamp == self._stamp:
+            return False
+        try:
+            new = type(old)()
+        except Exception as e:
+            # keep the old snapshot when the file is invalid (e.g. saved halfway), retry on next change
+            logger.warning(f"failed to reload {type(old).__name__}, keep the current settings: {e}")
+            self._stamp = stamp
+            return False
+        new.auto_reload = old.auto_reload
+        self._stamp = stamp
+        self.current = new
+        logger.info(f"{type(old).__name__} reloaded.")
+        for callback in list(self._callbacks):
+            try:
+                callback(old, new)
+            except Exception as e:
+                logger.warning(f"settings change callback {callback!r} failed: {e}")
+        return True
+
+
+class SettingsWatcher:
+    """
+    a polling thread that checks the configuration files every `interval` seconds and reloads changed settings.
+    the interval can be set by the SETTINGS_WATCH_INTERVAL environment variable, 0 disables the thread.
+    """
 
-def settings_property(settings: _T):
-    def wrapper(self) -> _T:
-        return _cached_settings(settings)
-    return property(wrapper)
+    def __init__(self, interval: float | None = None):
+        self.interval = interval if interval is not None else float(os.environ.get("SETTINGS_WATCH_INTERVAL", 2.0))
+        self._holders: list[SettingsHolder] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def register(self, holder: SettingsHolder) -> None:
+        with self._lock:
+            self._holders.append(holder)
+        self.start()
+
+    def check_now(self) -> list[str]:
+        """check all settings files once, return the names of reloaded settings classes"""
+        with self._lock:
+            holders = list(self._holders)
+        return [type(holder.current).__name__ for holder in holders if holder.reload_if_changed()]
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check_now()
+            except Exception as e:
+                logger.warning(f"settings watcher failed: {e}")
+
+    def start(self) -> None:
+        with self._lock:
+            if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="settings-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self.interval + 1)
+
+    def _after_fork(self) -> None:
+        # threads don't survive fork, restart the watcher in the child process
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        was_running = self._thread is not None
+        self._thread = None
+        if was_running:
+            self.start()
+
+
+settings_watcher = SettingsWatcher()
+os.register_at_fork(after_in_child=settings_watcher._after_fork)
+
+
+class SettingsProperty(t.Generic[_T]):
+    """class attribute returning the current settings snapshot"""
+
+    def __init__(self, settings: _T):
+        self.holder = SettingsHolder(settings)
+        settings_watcher.register(self.holder)
+
+    def __get__(self, obj, objtype=None) -> _T:
+        if obj is None:
+            return self  # type: ignore[return-value]
+        return self.holder.current
+
+
+def settings_property(settings: _T) -> _T:
+    return SettingsProperty(settings)  # type: ignore[return-value]
@@ -5,10 +5,8 @@ import sys
 import typing as t
 from pathlib import Path
 
-import nltk
-
 from pydantic import field_validator
-from .pydantic_settings import BaseFileSettings, SettingsConfigDict, settings_property, MyBaseModel, cached_property
+from .pydantic_settings import BaseFileSettings, SettingsConfigDict, settings_property, settings_watcher, MyBaseModel, cached_property
 
 from agent_server import __version__
 
@@ -37,8 +35,33 @@ class BasicSettings(BaseFileSettings):
     HTTPX_DEFAULT_TIMEOUT: float = 300
     """httpx 请求默认超时时间（秒）。如果加载模型或对话较慢，出现超时错误，可以适当加大该值。"""
 
+    CHAT_TRANSCRIPT_ENABLED: bool = True
+    """是否记录对话记录，每轮对话写入一条 JSON 记录到 chat-transcript.jsonl"""
+
+    CHAT_TRANSCRIPT_SAMPLE_RATE: float = 1.0
+    """对话记录采样率，取值 0-1；出错的对话始终记录"""
+
+    CHAT_TRANSCRIPT_MAX_CHARS: int = 2000
+    """对话记录中问题与回答各自保留的最大字符数，超出部分截断"""
+
+    CHAT_TRANSCRIPT_ROTATION: str = "100 MB"
+    """对话记录文件滚动大小"""
+
+    CHAT_TOKEN_TRACE: bool = False
+    """是否以 DEBUG 级别逐 token 记录流式输出，仅用于排查问题，需同时开启 log_verbose"""
+
+    TRACE_EXPORTER: str = "none"
+    """分阶段追踪导出方式：none 不导出（仍会在对话记录中写入耗时分解）、jsonl 写入 chat-trace.jsonl、otlp 发送到 OTLP 采集器"""
+
+    TRACE_OTLP_ENDPOINT: str = "http://127.0.0.1:4318"
+    """OTLP/HTTP 采集器地址，TRACE_EXPORTER 为 otlp 时生效"""
+
     # redis 配置
     REDIS_URL: str = "redis://localhost:6379/0" # 密码redis://:123456@localhost:6379/0
+    # Redis 连接池最大连接数，每个进程独立
+    REDIS_MAX_CONNECTIONS: int = 50
+    # Redis 连接池连接数用尽时等待空闲连接的秒数，超时抛出 ConnectionError
+    REDIS_POOL_TIMEOUT: int = 5
     # Redis 前缀
     REDIS_PREFIX: str = "researchagent-lang:"
     # Redis 前缀 - 会话消息存储
@@ -120,18 +143,57 @@ class BasicSettings(BaseFileSettings):
     OPEN_CROSS_DOMAIN: bool = True
     """API 是否开启跨域"""
 
+    METRICS_ENABLED: bool = True
+    """是否记录请求耗时等指标并在 /metrics 以 Prometheus 文本格式导出"""
+
+    HEALTH_CHECK_TIMEOUT: float = 2.0
+    """/ready 与 /health/deep 中每个依赖检查的超时时间（秒）"""
+
+    HEALTH_CHECK_CACHE_TTL: float = 5.0
+    """依赖检查结果缓存时间（秒），缓存期内的探测直接返回上次结果，不对依赖产生额外负载"""
+
+    HEALTH_EMBEDDING_CRITICAL: bool = False
+    """嵌入模型不可用时是否判定为未就绪；为 False 时只标记为 degraded，检索之外的对话仍可用"""
+
+    MODEL_HEALTH_CHECK_INTERVAL: float = 60.0
+    """后台探测模型端点的间隔（秒），请求路径只读取探测结果，不调用模型"""
+
+    MODEL_HEALTH_CHECK_MAX_BACKOFF: float = 600.0
+    """模型端点连续探测失败时，探测间隔指数退避的上限（秒）"""
+
     DEFAULT_BIND_HOST: str = "0.0.0.0" if sys.platform != "win32" else "127.0.0.1"
     """
     各服务器默认绑定host。如改为"0.0.0.0"需要修改下方所有XX_SERVER的host
     Windows 下 WEBUI 自动弹出浏览器时，如果地址为 "0.0.0.0" 是无法访问的，需要手动修改地址栏
     """
 
-    API_SERVER: dict[str, t.Any] = {"host": DEFAULT_BIND_HOST, "port": 18081, "public_host": "127.0.0.1", "public_port": 18081}
-    """API 服务器地址。其中 public_host 用于生成云服务公网访问链接（如知识库文档链接）"""
+    API_SERVER: dict[str, t.Any] = {
+        "host": DEFAULT_BIND_HOST,
+        "port": 18081,
+        "public_host": "127.0.0.1",
+        "public_port": 18081,
+        "workers": 1,
+        "loop": "auto",
+        "http": "auto",
+        "role": "all",
+    }
+    """
+    API 服务器地址。其中 public_host 用于生成云服务公网访问链接（如知识库文档链接）
+    workers: worker 进程数，每个进程各自创建数据库、Redis 与向量库连接池
+    loop/http: uvicorn 事件循环与 HTTP 协议实现，auto 在安装了 uvloop/httptools 时使用它们
+    role: 服务角色，all 挂载全部接口，chat 只挂载对话接口，ingest 只挂载知识库入库与上传接口；
+          两种角色分别部署时可以独立扩容，由网关按路径转发
+    """
 
     WEBUI_SERVER: dict[str, t.Any] = {"host": DEFAULT_BIND_HOST, "port": 18082}
     """WEBUI 服务器地址"""
 
+    SSE_COALESCE_MS: int = 20
+    """流式对话合并输出的时间窗口（毫秒），窗口内的多个 token 合并为一个 SSE 帧发送，0 表示每个 token 单独发送"""
+
+    SSE_COALESCE_BYTES: int = 64
+    """流式对话合并输出的字节数上限，窗口内累计内容达到该值时立即发送"""
+
     def make_dirs(self):
         '''创建所有数据目录'''
         for p in [
@@ -152,8 +214,8 @@ class PlatformConfig(MyBaseModel):
     platform_name: str = "deepseek"
     """平台名称"""
 
-    platform_type: t.Literal["deepseek", "openai", "gemini", "ollama", "openrouter", "dashscope", "oneapi"] = "deepseek"
-    """平台类型"""
+    platform_type: t.Literal["deepseek", "openai", "gemini", "ollama", "openrouter", "dashscope", "oneapi", "local"] = "deepseek"
+    """平台类型，local 表示在本进程中加载模型（目前支持 BGE-M3 嵌入模型，见 LOCAL_EMBEDDING_CONFIG）"""
 
     api_base_url: str = "https://api.deepseek.com/v1"
     """openai api url"""
@@ -286,6 +348,34 @@ class ModelSettings(BaseFileSettings):
     `model` 如果留空则自动使用 DEFAULT_LLM_MODEL
     """
 
+    LOCAL_EMBEDDING_CONFIG: dict[str, t.Any] = {
+            # 模型名到本地目录或 HuggingFace 模型 ID 的映射，未配置的模型直接使用模型名
+            "model_paths": {"bge-m3": "BAAI/bge-m3"},
+            "device": "cpu",
+            "use_fp16": False,
+            "max_length": 512,
+            # 一次推理的最大文本数，同时是动态批处理的批次上限
+            "batch_size": 32,
+            # 动态批处理从第一个请求到达起的最长等待时间（毫秒）
+            "max_wait_ms": 10,
+            # 推理线程数，CPU 上通常为 1，由模型内部的算子并行使用多核
+            "inference_threads": 1,
+        }
+    """
+    本地嵌入模型（platform_type=local）配置，模型在每个进程中加载一次，并发请求动态合并为批次推理
+    """
+
+    EMBEDDING_QUERY_BATCH_CONFIG: dict[str, t.Any] = {
+            "enabled": True,
+            # 一次合并的最大查询数
+            "max_batch_size": 16,
+            # 从第一个查询到达起的最长等待时间（毫秒），即单个查询最多增加的延迟
+            "max_wait_ms": 5,
+        }
+    """
+    远程嵌入模型（OpenAI 兼容接口）的查询合并配置：并发对话的 aembed_query 合并为一次 embed_documents 调用
+    """
+
     MODEL_PLATFORMS: list[PlatformConfig] = [
             PlatformConfig(
                 platform_name="DeepSeek",
@@ -383,6 +473,23 @@ class ModelSettings(BaseFileSettings):
                 speech2text_models=[],
                 text2speech_models=[],
             ),
+            PlatformConfig(
+                platform_name="Local",
+                platform_type="local",
+                api_base_url="",
+                api_key="",
+                api_concurrencies=5,
+                auto_detect_model=False,
+                llm_models=[],
+                # 安装 FlagEmbedding（pip install .[local]）后加入 "bge-m3" 即可在本进程中加载；
+                # 同名模型以最后配置的平台为准，默认不启用，避免默认嵌入模型依赖未安装的 FlagEmbedding
+                embed_models=[],
+                text2image_models=[],
+                image2text_models=[],
+                rerank_models=[],
+                speech2text_models=[],
+                text2speech_models=[],
+            ),
         ]
     """模型平台配置"""
 
@@ -714,6 +821,42 @@ class KNSettings(BaseFileSettings):
     OVERLAP_SIZE: int = 150
     """知识库中相邻文本重合长度(不适用MarkdownHeaderTextSplitter)"""
 
+    SPLIT_WORKERS: int = 0
+    """文档分割进程数，0 表示使用 CPU 核数，1 表示关闭多进程分割"""
+
+    SPLIT_PARALLEL_MIN_DOCS: int = 32
+    """文档数量达到该值时才使用多进程分割，文档较少时进程间传输开销大于并行收益"""
+
+    INGEST_BATCH_SIZE: int = 128
+    """文档入库时每批处理的文档数（PDF 页数 / CSV 行数），决定入库时的内存占用上限"""
+
+    INGEST_MODE: t.Literal["inline", "queue"] = "inline"
+    """
+    文档入库方式：inline 在上传接口所在进程中入库；queue 上传接口只写入 Redis 队列，
+    由独立的入库进程消费（python -m agent_server.app.rag.ingest.ingest_worker），入库进程需能访问上传文件所在目录
+    """
+
+    INGEST_WORKER_CONCURRENCY: int = 2
+    """每个入库进程同时处理的文件数"""
+
+    INGEST_MAX_ATTEMPTS: int = 3
+    """入库任务最多尝试次数，超过后标记为失败"""
+
+    INGEST_JOB_TTL: int = 7 * 24 * 3600
+    """入库任务状态的保留时间（秒）"""
+
+    PDF_PARALLEL_MIN_PAGES: int = 64
+    """PDF 页数达到该值时才使用多进程提取文本，页数较少时子进程重复打开文件的开销大于并行收益"""
+
+    PDF_PAGES_PER_TASK: int = 16
+    """多进程提取 PDF 文本时每个任务处理的页数"""
+
+    ENABLE_REDUNDANT_FILTER: bool = False
+    """入库时是否过滤近似重复的文本块，过滤复用写入向量库的嵌入向量"""
+
+    REDUNDANT_SIMILARITY_THRESHOLD: float = 0.95
+    """文本块近似重复的余弦相似度阈值，达到该值的文本块只保留最先出现的一个"""
+
     VECTOR_SEARCH_TOP_K: int = 3 # TODO: 与 tool 配置项重复
     """知识库匹配向量数量"""
     
@@ -854,6 +997,30 @@ class DBSettings(BaseFileSettings):
     ECHO: bool = False
     """是否打印SQL语句"""
 
+    VS_POOL_SIZE: int = 5
+    """向量库（pg/relyt）连接池大小，每个进程独立"""
+
+    VS_MAX_OVERFLOW: int = 5
+    """向量库连接池最大溢出数"""
+
+    CHAT_MESSAGE_FLUSH_ROWS: int = 100
+    """聊天记录批量写入：缓冲区达到该条数时立即写入"""
+
+    CHAT_MESSAGE_FLUSH_INTERVAL_MS: int = 500
+    """聊天记录批量写入：两次写入的最大间隔（毫秒）"""
+
+    CHAT_MESSAGE_BUFFER_MAX: int = 10000
+    """聊天记录批量写入：缓冲区最大条数，数据库长时间不可用时超出部分丢弃最早的记录"""
+
+    CHAT_MESSAGE_MAX_ATTEMPTS: int = 5
+    """聊天记录批量写入：连接中断、超时等暂时性错误时每条记录的最大写入次数，超过后丢弃"""
+
+    SLOW_QUERY_MS: int = 200
+    """慢查询阈值（毫秒），超过该耗时的语句按指纹聚合统计"""
+
+    SLOW_QUERY_TOP_N: int = 50
+    """慢查询统计最多保留的语句指纹数，超出时淘汰累计耗时最少的指纹"""
+
 
 class SettingsContainer:
     basic_settings: BasicSettings = settings_property(BasicSettings())
@@ -881,9 +1048,40 @@ class SettingsContainer:
         self.kn_settings.auto_reload = flag
         self.db_settings.auto_reload = flag
 
+    def on_change(self, name: str, callback) -> None:
+        """
+        注册配置变更回调，配置文件修改并重新加载后在监视线程中调用 callback(old, new)
+        用于让依赖配置的缓存失效，如 Settings.on_change("model_settings", lambda old, new: ...)
+        """
+        type(self).__dict__[name].holder.add_callback(callback)
+
+    def remove_on_change(self, name: str, callback) -> None:
+        type(self).__dict__[name].holder.remove_callback(callback)
+
+    def reload_now(self) -> list[str]:
+        """立即检查配置文件并重新加载有变化的配置，返回重新加载的配置类名"""
+        return settings_watcher.check_now()
+
 
 Settings = SettingsContainer()
-nltk.data.path.append(str(Settings.basic_settings.NLTK_DATA_PATH))
+
+
+def _register_nltk_data_path(path: str) -> None:
+    """
+    登记 nltk 数据目录。nltk 导入耗时较长且只在文档解析时使用，
+    未导入时写入 NLTK_DATA 环境变量，由 nltk 首次导入时读取
+    """
+    nltk = sys.modules.get("nltk")
+    if nltk is not None:
+        if path not in nltk.data.path:
+            nltk.data.path.append(path)
+        return
+    paths = [p for p in os.environ.get("NLTK_DATA", "").split(os.pathsep) if p]
+    if path not in paths:
+        os.environ["NLTK_DATA"] = os.pathsep.join(paths + [path])
+
+
+_register_nltk_data_path(str(Settings.basic_settings.NLTK_DATA_PATH))
 
 
 if __name__ == "__main__":
@@ -24,6 +24,10 @@ class ForbiddenException(HTTPException):
     def __init__(self, detail: str = "Access forbidden"):
         super().__init__(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
 
+class BadRequestException(HTTPException):
+    def __init__(self, detail: str = "Bad request"):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
 # ------------------ 全局兜底: 捕获所有未被处理的异常 ------------------
 
 async def global_exception_handler(request: Request, exc: Exception) -> JSONResponse:
@@ -0,0 +1,438 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+"""
+进程内指标与 Prometheus 文本格式导出
+
+- Counter/Gauge/Histogram 在进程内聚合，记录时只做一次加锁和字典更新，不产生 I/O
+- 连接池、缓存命中率等已有统计通过 collector 在抓取 /metrics 时读取，请求路径上没有额外开销
+- 多 worker 部署时每个进程各自导出，由 Prometheus 按实例聚合
+"""
+
+# 默认耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = tuple[str, ...]
+# collector 返回的指标：(名称, 类型, 说明, [(标签字典, 值) 或 (名称后缀, 标签字典, 值)])
+CollectedMetric = tuple[str, str, str, list[tuple]]
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict[str, Any]) -> LabelValues:
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels_dict(self, values: LabelValues) -> dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self._labels_dict(k))} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    @contextmanager
+    def track_inprogress(self, **labels) -> Iterator[None]:
+        """块执行期间值加一，用于统计进行中的请求数"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self._labels_dict(k))} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """分桶直方图，分桶计数在导出时累加为 Prometheus 的累计分桶"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各分桶计数..., +Inf 分桶计数, 总和]
+        self._values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._label_values(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """记录块的执行耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._label_values(labels))
+        return int(sum(state[:-1])) if state else 0
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, state in items:
+            labels = self._labels_dict(key)
+            lines.extend(render_histogram_samples(self.name, labels, self.buckets, state[:-1], state[-1]))
+        return lines
+
+
+def render_histogram_samples(
+    name: str,
+    labels: dict[str, Any],
+    buckets: tuple[float, ...],
+    counts: list[float],
+    total: float,
+) -> list[str]:
+    """把非累计的分桶计数（最后一个为 +Inf 分桶）渲染为 Prometheus 直方图样本"""
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(buckets + (math.inf,), counts):
+        cumulative += bucket_count
+        lines.append(f"{name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {_format_value(cumulative)}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+    lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+    return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: dict[str, Callable[[], list[CollectedMetric]]] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # 模块重复导入时复用已注册的指标
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"指标 {metric.name} 已注册为不同的类型或标签")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, name: str, collector: Callable[[], list[CollectedMetric]]) -> None:
+        """注册在导出时调用的采集函数，同名采集函数会被替换"""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def unregister_collector(self, name: str) -> None:
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector_name, collector in collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                lines.append(f"# collector {collector_name} failed: {e!r}".replace("\n", " "))
+                continue
+            for name, type_name, documentation, samples in collected:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for sample in samples:
+                    if len(sample) == 3:
+                        suffix, labels, value = sample
+                        lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+                    else:
+                        labels, value = sample
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+# ==================== 应用指标 ====================
+
+HTTP_REQUEST_DURATION = metrics_registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求耗时（流式响应为发送完最后一个片段的时间）",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_PROGRESS = metrics_registry.gauge(
+    "http_requests_in_progress",
+    "正在处理的 HTTP 请求数",
+    ("method",),
+)
+CHAT_TIME_TO_FIRST_TOKEN = metrics_registry.histogram(
+    "chat_time_to_first_token_seconds",
+    "对话首个输出片段的耗时",
+    ("platform", "model"),
+)
+CHAT_TOKENS_PER_SECOND = metrics_registry.histogram(
+    "chat_tokens_per_second",
+    "对话输出速度（首个片段之后每秒输出的片段数，流式输出时一个片段约为一个 token）",
+    ("platform", "model"),
+    buckets=(1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500),
+)
+CHAT_TURNS = metrics_registry.counter(
+    "chat_turns_total",
+    "对话轮数",
+    ("platform", "model", "status"),
+)
+LLM_IN_FLIGHT = metrics_registry.gauge(
+    "llm_in_flight_requests",
+    "各模型平台正在进行中的模型调用数",
+    ("platform",),
+)
+RETRIEVAL_DURATION = metrics_registry.histogram(
+    "rag_retrieval_duration_seconds",
+    "知识库检索耗时",
+    ("retriever",),
+)
+EMBEDDING_DURATION = metrics_registry.histogram(
+    "embedding_duration_seconds",
+    "嵌入模型调用耗时",
+    ("model", "operation"),
+)
+EMBEDDING_TEXTS = metrics_registry.counter(
+    "embedding_texts_total",
+    "嵌入的文本数",
+    ("model", "operation"),
+)
+MICRO_BATCH_SIZE = metrics_registry.histogram(
+    "micro_batch_size",
+    "动态批处理每个批次合并的输入数",
+    ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+MICRO_BATCH_WAIT = metrics_registry.histogram(
+    "micro_batch_wait_seconds",
+    "动态批处理中每个输入等待凑批的时间，即批处理增加的延迟",
+    ("batcher",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+
+# ==================== 缓存命中率 ====================
+
+_caches: dict[str, Any] = {}
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses"])
+
+
+class CacheStats:
+    """
+    字典等自行实现的缓存的命中统计，提供与 functools.lru_cache 相同的 cache_info() 接口
+    """
+
+    def __init__(self):
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def hit(self) -> None:
+        with self._lock:
+            self._hits += 1
+
+    def miss(self) -> None:
+        with self._lock:
+            self._misses += 1
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self._hits, self._misses)
+
+
+def register_cache(name: str, cached_func: Any) -> None:
+    """
+    注册缓存，导出时读取其 cache_info() 中的 hits/misses
+    支持 functools.lru_cache 与 memoization.cached 装饰的函数，以及 CacheStats
+    """
+    _caches[name] = cached_func
+
+
+def _collect_caches() -> list[CollectedMetric]:
+    hits, misses, ratios = [], [], []
+    for name, cached_func in list(_caches.items()):
+        info = cached_func.cache_info()
+        labels = {"cache": name}
+        hits.append((labels, info.hits))
+        misses.append((labels, info.misses))
+        total = info.hits + info.misses
+        ratios.append((labels, info.hits / total if total else 0))
+    return [
+        ("cache_hits_total", "counter", "缓存命中次数", hits),
+        ("cache_misses_total", "counter", "缓存未命中次数", misses),
+        ("cache_hit_ratio", "gauge", "缓存命中率", ratios),
+    ]
+
+
+metrics_registry.register_collector("caches", _collect_caches)
+
+
+# ==================== ASGI 中间件 ====================
+
+class MetricsMiddleware:
+    """
+    记录每个路由的请求耗时
+
+    使用纯 ASGI 中间件而不是 BaseHTTPMiddleware：后者会把流式响应经过额外的内存队列转发。
+    route 标签使用路由模板（如 /api/conversation/page），未匹配的路径统一记为 unmatched，避免标签数量无限增长。
+    """
+
+    def __init__(self, app: ASGIApp, exclude_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        # 进行中的请求在路由匹配前无法得知路由模板，只按方法统计
+        with HTTP_REQUESTS_IN_PROGRESS.track_inprogress(method=method):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                route_path = getattr(route, "path", None) or "unmatched"
+                HTTP_REQUEST_DURATION.observe(
+                    time.perf_counter() - start,
+                    method=method,
+                    route=route_path,
+                    status=str(status_code),
+                )
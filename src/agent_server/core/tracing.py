@@ -0,0 +1,424 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from agent_server.config.settings import Settings
+from agent_server.utils.log_util import build_logger, build_transcript_logger
+
+
+logger = build_logger("tracing")
+
+
+"""
+轻量级分阶段追踪
+
+- Trace 为一次请求（或一次入库）的追踪，Span 为其中的一个阶段，通过 ContextVar 传递当前 Trace 与 Span
+- span() 上下文管理器记录代码块的耗时；TracingCallbackHandler 把 LangChain 的链、模型、检索器运行记录为 Span
+- 带 stage 属性的 Span 按阶段汇总为耗时分解（breakdown），写入对话记录与聊天记录的 meta_data；
+  阶段耗时包含其中嵌套的阶段，如 vector_search 包含查询向量化的 embedding 耗时
+- Trace 结束时交给导出器：jsonl 写入本地文件，otlp 以 OTLP/HTTP JSON 批量发送到本地采集器，均在后台线程中完成
+"""
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """追踪中的一个阶段"""
+
+    __slots__ = ("name", "trace", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error", "_start_perf", "_end_perf")
+
+    def __init__(self, name: str, trace: "Trace", parent_id: Optional[str] = None, attributes: Optional[dict] = None):
+        self.name = name
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+        self.end_ns: Optional[int] = None
+        self._end_perf: Optional[float] = None
+        self.attributes: dict[str, Any] = attributes or {}
+        self.error: Optional[str] = None
+
+    @property
+    def stage(self) -> Optional[str]:
+        return self.attributes.get("stage")
+
+    @property
+    def duration_ms(self) -> float:
+        end = self._end_perf if self._end_perf is not None else time.perf_counter()
+        return (end - self._start_perf) * 1000
+
+    def elapsed_ms(self) -> float:
+        """从 Span 开始到现在的耗时"""
+        return (time.perf_counter() - self._start_perf) * 1000
+
+    def end(self, error: BaseException | None = None) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self._end_perf = time.perf_counter()
+        if error is not None:
+            self.error = repr(error)
+        self.trace._span_ended(self)
+
+    def to_record(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """一次请求的追踪，根 Span 结束时导出"""
+
+    def __init__(self, name: str, attributes: Optional[dict] = None):
+        self.trace_id = _new_id(128)
+        self._lock = threading.Lock()
+        self.spans: list[Span] = []
+        self._tokens: tuple = ()
+        self.root = self.start_span(name, parent=None, attributes=attributes)
+
+    def start_span(self, name: str, parent: Optional[Span] = None, attributes: Optional[dict] = None) -> Span:
+        span = Span(name, self, parent.span_id if parent else None, attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def _span_ended(self, span: Span) -> None:
+        if span is self.root:
+            # 根 Span 结束时结束所有未结束的子 Span（如客户端断开时中断的模型调用）
+            for child in list(self.spans):
+                if child.end_ns is None:
+                    child.end()
+            tracer.export(self)
+
+    def breakdown(self) -> dict[str, float]:
+        """按 stage 汇总耗时（毫秒），同一阶段多次执行时累加"""
+        stages: dict[str, float] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stage = span.stage
+            if stage:
+                stages[stage] = round(stages.get(stage, 0) + span.duration_ms, 1)
+            first_token_ms = span.attributes.get("first_token_ms")
+            if first_token_ms is not None and stage == "llm":
+                stages.setdefault("llm_first_token", first_token_ms)
+        return stages
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class JsonlSpanExporter:
+    """每个 Span 一行 JSON，写入 LOG_PATH 下的 jsonl 文件"""
+
+    def __init__(self, log_file: str = "chat-trace"):
+        self._logger = build_transcript_logger(log_file)
+
+    def export(self, trace: Trace) -> None:
+        for span in trace.spans:
+            self._logger.info(json.dumps(span.to_record(), ensure_ascii=False, default=str))
+
+    def shutdown(self) -> None:
+        pass
+
+
+class OtlpHttpSpanExporter:
+    """以 OTLP/HTTP JSON 格式批量发送到采集器（如本地 otel-collector 的 4318 端口）"""
+
+    def __init__(self, endpoint: str, service_name: str = "research-agent", batch_size: int = 256, interval: float = 2.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.interval = interval
+        # 采集器不可用时队列满即丢弃，不影响请求
+        self._queue: queue.Queue[Trace | None] = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, name="otlp-span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> dict[str, Any]:
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        return {"key": key, "value": typed}
+
+    def _to_otlp(self, traces: list[Trace]) -> dict[str, Any]:
+        spans = []
+        for trace in traces:
+            for span in trace.spans:
+                otlp_span = {
+                    "traceId": trace.trace_id,
+                    "spanId": span.span_id,
+                    "name": span.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                    "attributes": [self._attribute(k, v) for k, v in span.attributes.items() if v is not None],
+                    "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                }
+                if span.parent_id:
+                    otlp_span["parentSpanId"] = span.parent_id
+                spans.append(otlp_span)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    self._attribute("service.name", self.service_name),
+                    self._attribute("process.pid", os.getpid()),
+                ]},
+                "scopeSpans": [{"scope": {"name": "agent_server.tracing"}, "spans": spans}],
+            }]
+        }
+
+    def _run(self) -> None:
+        import httpx
+
+        with httpx.Client(timeout=5) as client:
+            stopped = False
+            while not stopped:
+                batch: list[Trace] = []
+                deadline = time.monotonic() + self.interval
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopped = True
+                        break
+                    batch.append(item)
+                if not batch:
+                    continue
+                try:
+                    client.post(self.url, json=self._to_otlp(batch)).raise_for_status()
+                except Exception as e:
+                    logger.warning(f"追踪数据发送失败，丢弃 {len(batch)} 条追踪: {e}")
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class Tracer:
+    """追踪入口，导出器按 TRACE_EXPORTER 配置在首次导出时创建"""
+
+    def __init__(self):
+        self._exporter: Any = None
+        self._exporter_type: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _get_exporter(self) -> Any:
+        exporter_type = Settings.basic_settings.TRACE_EXPORTER
+        if exporter_type != self._exporter_type:
+            with self._lock:
+                if exporter_type != self._exporter_type:
+                    if self._exporter is not None:
+                        self._exporter.shutdown()
+                    if exporter_type == "jsonl":
+                        self._exporter = JsonlSpanExporter()
+                    elif exporter_type == "otlp":
+                        self._exporter = OtlpHttpSpanExporter(Settings.basic_settings.TRACE_OTLP_ENDPOINT)
+                    else:
+                        self._exporter = None
+                    self._exporter_type = exporter_type
+        return self._exporter
+
+    def export(self, trace: Trace) -> None:
+        try:
+            exporter = self._get_exporter()
+            if exporter is not None:
+                exporter.export(trace)
+        except Exception as e:
+            logger.warning(f"追踪数据导出失败: {e}")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._exporter is not None:
+                self._exporter.shutdown()
+            self._exporter = None
+            self._exporter_type = None
+
+
+tracer = Tracer()
+
+
+def start_trace(name: str, **attributes) -> Trace:
+    """开始一次追踪并设为当前追踪，调用方负责在结束时调用 end_trace()"""
+    trace = Trace(name, attributes)
+    trace._tokens = (_current_trace.set(trace), _current_span.set(trace.root))
+    return trace
+
+
+def end_trace(trace: Trace, error: BaseException | None = None) -> None:
+    """结束追踪（导出），并恢复开始追踪前的当前追踪，重复调用时不做任何操作"""
+    trace.root.end(error=error)
+    if not trace._tokens:
+        return
+    trace_token, span_token = trace._tokens
+    trace._tokens = ()
+    try:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+    except ValueError:
+        # 异步生成器在其它上下文中被关闭时无法按 token 恢复
+        _current_span.set(None)
+        _current_trace.set(None)
+
+
+def get_current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, stage: Optional[str] = None, standalone: bool = True, **attributes) -> Iterator[Optional[Span]]:
+    """
+    记录代码块耗时
+
+    Args:
+        name: Span 名称
+        stage: 阶段名，用于耗时分解
+        standalone: 没有当前追踪时是否以该 Span 为根开始一次新的追踪；为 False 时不记录
+    """
+    trace = _current_trace.get()
+    if stage is not None:
+        attributes["stage"] = stage
+    if trace is None:
+        if not standalone:
+            yield None
+            return
+        trace = Trace(name, attributes)
+        current = trace.root
+        trace_token = _current_trace.set(trace)
+    else:
+        current = trace.start_span(name, parent=_current_span.get() or trace.root, attributes=attributes)
+        trace_token = None
+    span_token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    finally:
+        current.end()
+        _current_span.reset(span_token)
+        if trace_token is not None:
+            _current_trace.reset(trace_token)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    把 LangChain 运行记录为 Span，按运行类型标记阶段：
+    history_load（读取历史）、query_rewrite（历史感知检索中的问题改写）、vector_search（检索）、
+    prompt_build（提示词模板）、llm（回答生成，记录首 token 耗时）
+    """
+
+    run_inline = True
+
+    # 历史感知检索器的运行名称，其中的模型调用为问题改写
+    REWRITE_CHAIN_NAME = "chat_retriever_chain"
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self._spans: dict[UUID, Span] = {}
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str) -> Span:
+        parent = self._spans.get(parent_run_id) if parent_run_id else None
+        in_rewrite = name == self.REWRITE_CHAIN_NAME or bool(parent and parent.attributes.get("in_rewrite"))
+        stage = None
+        if kind == "retriever":
+            stage = "vector_search"
+        elif kind == "llm":
+            stage = "query_rewrite" if in_rewrite else "llm"
+        elif name == "load_history":
+            stage = "history_load"
+        elif name.endswith("PromptTemplate"):
+            stage = "prompt_build"
+        attributes = {"kind": kind, "stage": stage}
+        if in_rewrite:
+            attributes["in_rewrite"] = True
+        span = self.trace.start_span(name, parent=parent or self.trace.root, attributes=attributes)
+        self._spans[run_id] = span
+        return span
+
+    def _end(self, run_id: UUID, error: BaseException | None = None) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.end(error=error)
+
+    @staticmethod
+    def _name(serialized: Optional[dict], kwargs: dict, default: str) -> str:
+        name = kwargs.get("name")
+        if name:
+            return name
+        if serialized:
+            return serialized.get("name") or (serialized.get("id") or [default])[-1]
+        return default
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, self._name(serialized, kwargs, "chain"), "chain")
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, self._name(serialized, kwargs, "llm"), "llm")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, self._name(serialized, kwargs, "chat_model"), "llm")
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        span = self._spans.get(run_id)
+        if span is not None and "first_token_ms" not in span.attributes:
+            span.attributes["first_token_ms"] = round(span.elapsed_ms(), 1)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, self._name(serialized, kwargs, "retriever"), "retriever")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        span = self._spans.get(run_id)
+        if span is not None:
+            span.attributes["documents"] = len(documents)
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
@@ -5,7 +5,7 @@ from sqlalchemy.orm.session import Session
 from typing import Any, Generator, Optional, AsyncGenerator
 import json
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import Session, DeclarativeBase, sessionmaker
 from sqlalchemy.ext.declarative import DeclarativeMeta, declarative_base
 from sqlalchemy.ext.asyncio import (
@@ -18,6 +18,7 @@ from sqlalchemy.ext.asyncio import (
 from ..utils.log_util import build_logger
 from ..config.settings import Settings
 from .models.base import BaseEntity
+from .pool_monitor import pool_monitor, instrumented_pool_class, InstrumentedAsyncAdaptedQueuePool
 
 
 logger = build_logger("database")
@@ -59,7 +60,9 @@ def setup_sync_session_factory():
         pool_recycle=Settings.db_settings.POOL_RECYCLE,
         echo=Settings.db_settings.ECHO,
         pool_pre_ping=True,
+        poolclass=instrumented_pool_class(Settings.db_settings.SQLALCHEMY_DATABASE_URI),
     )
+    pool_monitor.register("sync", _sync_engine)
     
     _SyncSessionFactory = sessionmaker(
         bind=_sync_engine,
@@ -88,8 +91,10 @@ async def setup_async_session_factory():
         pool_recycle=Settings.db_settings.POOL_RECYCLE,
         echo=Settings.db_settings.ECHO,
         pool_pre_ping=True,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
         json_serializer=lambda obj: json.dumps(obj, ensure_ascii=False),
     )
+    pool_monitor.register("async", _async_engine)
     
     # SessionFactory 是一个“会话的工厂”，配置一次，随处使用
     _AsyncSessionFactory = async_sessionmaker(
@@ -108,6 +113,7 @@ async def close_database_connection():
 def close_sync_session_factory():
     global _sync_engine, _SyncSessionFactory
     if _sync_engine:
+        pool_monitor.unregister("sync")
         _sync_engine.dispose()
         _sync_engine = None
         _SyncSessionFactory = None
@@ -118,6 +124,7 @@ async def close_async_session_factory():
     """在应用关闭时，关闭全局的数据库引擎连接池。"""
     global _async_engine, _AsyncSessionFactory
     if _async_engine:
+        pool_monitor.unregister("async")
         await _async_engine.dispose()
         _async_engine = None
         _AsyncSessionFactory = None
@@ -165,7 +172,7 @@ async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
 # --- 4. 辅助工具：创建数据库表 ---
 async def create_db_and_tables():
     """
-    一个开发工具，用于在应用启动前创建所有定义的数据库表。
+    一个开发工具，用于在应用启动前创建所有定义的数据库表，并给已有的表补上新增的列（见 init_db.SCHEMA_UPGRADES）。
     注意：在生产环境中你可能需要更专业的迁移工具如 Alembic。
     """
     if not _async_engine:
@@ -177,6 +184,8 @@ async def create_db_and_tables():
         # Base.metadata 是所有继承了 Base 的模型类的元数据集合
         # 让 SQLAlchemy 根据所有继承了 Base 的模型类去创建表
         await conn.run_sync(BaseEntity.metadata.create_all)
+        from agent_server.db.init_db import upgrade_schema
+        await conn.run_sync(upgrade_schema)
     logger.info("数据库表已成功同步/创建。")
     
 async def check_database_health() -> bool:
@@ -0,0 +1,63 @@
+import asyncio
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from agent_server.utils.log_util import build_logger
+
+
+"""
+数据库初始化与结构升级
+
+create_all 只创建不存在的表，不会给已有的表加列、加索引。已有部署升级到新版本时执行：
+
+    PYTHONPATH=.:agent_server python -m agent_server.db.init_db    （在 src 目录下）
+
+创建缺失的表，并执行下面的结构升级；每项升级先检查列是否已存在，可以重复执行。
+也可以手动执行 SCHEMA_UPGRADES 中的 SQL。
+"""
+
+logger = build_logger("database")
+
+# (表名, 列名, 该列不存在时执行的 SQL)
+SCHEMA_UPGRADES: list[tuple[str, str, list[str]]] = [
+    (
+        "knowledge_file",
+        "file_hash",
+        [
+            "ALTER TABLE knowledge_file ADD COLUMN file_hash VARCHAR(64) NOT NULL DEFAULT ''",
+            "CREATE INDEX ix_knowledge_file_file_hash ON knowledge_file (file_hash)",
+        ],
+    ),
+]
+
+
+def upgrade_schema(conn: Connection) -> list[str]:
+    """执行尚未执行的结构升级，返回执行了的升级；表不存在时跳过（由 create_all 创建）"""
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    applied = []
+    for table, column, statements in SCHEMA_UPGRADES:
+        if table not in tables:
+            continue
+        if column in {c["name"] for c in inspector.get_columns(table)}:
+            continue
+        for statement in statements:
+            conn.execute(text(statement))
+        applied.append(f"{table}.{column}")
+        logger.info(f"数据库结构已升级: {table}.{column}")
+    return applied
+
+
+async def init_db() -> None:
+    from agent_server.db.base import setup_database_connection, close_database_connection, create_db_and_tables
+
+    await setup_database_connection()
+    try:
+        await create_db_and_tables()
+    finally:
+        await close_database_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(init_db())
@@ -13,6 +13,7 @@ class KnowledgeFile(BaseEntity, DateTimeMixin):
     __tablename__ = "knowledge_file"
     file_name: Mapped[str] = mapped_column(String(255), comment="文件名")
     file_ext: Mapped[str] = mapped_column(String(10), comment="文件扩展名")
+    file_hash: Mapped[str] = mapped_column(String(64), default="", index=True, comment="文件内容SHA-256")
     kb_id: Mapped[int] = mapped_column(BigInteger, index=True, comment="所属知识库ID")
     kb_name: Mapped[str] = mapped_column(String(50), comment="所属知识库名称")
     document_loader_name: Mapped[str] = mapped_column(String(50), comment="文档加载器名称")
@@ -24,7 +25,7 @@ class KnowledgeFile(BaseEntity, DateTimeMixin):
     docs_count: Mapped[int] = mapped_column(Integer, default=0, comment="切分文档数量")
 
     def __repr__(self):
-        return f"<KnowledgeFile(id='{self.id}', file_name='{self.file_name}', file_ext='{self.file_ext}', kb_id='{self.kb_id}', kb_name='{self.kb_name}', \
+        return f"<KnowledgeFile(id='{self.id}', file_name='{self.file_name}', file_ext='{self.file_ext}', file_hash='{self.file_hash}', kb_id='{self.kb_id}', kb_name='{self.kb_name}', \
             document_loader_name='{self.document_loader_name}', text_splitter_name='{self.text_splitter_name}', file_version='{self.file_version}', \
             created_time='{self.created_time}', updated_time='{self.updated_time}')>"
 
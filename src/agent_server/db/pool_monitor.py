@@ -0,0 +1,347 @@
+import hashlib
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from ..core.metrics import metrics_registry, CollectedMetric
+from ..utils.log_util import build_logger
+from ..config.settings import Settings
+
+
+logger = build_logger("database")
+
+
+"""
+连接池与慢查询监控
+
+- 连接获取耗时：db/base.py 创建引擎时使用 InstrumentedQueuePool / InstrumentedAsyncAdaptedQueuePool，
+  在 _do_get 中计时，包含等待空闲连接和新建连接的时间，超时次数单独统计
+- 连接池饱和度：查询时直接读取连接池的 checkedout/overflow/size
+- 慢查询：监听 before/after_cursor_execute，超过 SLOW_QUERY_MS 的语句按指纹（去掉字面量和参数后的语句）聚合
+所有统计使用锁保护，可在多线程（同步引擎、线程池）中使用
+"""
+
+# 耗时直方图分桶上界（毫秒）
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """线程安全的耗时直方图"""
+
+    def __init__(self, buckets_ms: tuple = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(self.buckets_ms) + 1)
+            self.count = 0
+            self.sum_ms = 0.0
+            self.max_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        index = bisect_left(self.buckets_ms, ms)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def _quantile(self, counts: list, count: int, q: float) -> Optional[float]:
+        """按分桶上界估算分位数"""
+        if count == 0:
+            return None
+        rank = q * count
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return float(self.buckets_ms[i]) if i < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            count, sum_ms, max_ms = self.count, self.sum_ms, self.max_ms
+        labels = [f"le_{b}ms" for b in self.buckets_ms] + ["inf"]
+        return {
+            "count": count,
+            "avg_ms": round(sum_ms / count, 3) if count else 0,
+            "max_ms": round(max_ms, 3),
+            "p50_ms": self._quantile(counts, count, 0.5),
+            "p95_ms": self._quantile(counts, count, 0.95),
+            "p99_ms": self._quantile(counts, count, 0.99),
+            "buckets": dict(zip(labels, counts)),
+        }
+
+
+class PoolStats:
+    """单个连接池的统计"""
+
+    def __init__(self):
+        self.checkout_latency = LatencyHistogram()
+        self._lock = threading.Lock()
+        self.checkout_timeouts = 0
+        self.peak_checkedout = 0
+
+    def record_checkout(self, seconds: float, checkedout: int) -> None:
+        self.checkout_latency.observe(seconds)
+        with self._lock:
+            if checkedout > self.peak_checkedout:
+                self.peak_checkedout = checkedout
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def reset(self) -> None:
+        self.checkout_latency.reset()
+        with self._lock:
+            self.checkout_timeouts = 0
+            self.peak_checkedout = 0
+
+
+class _InstrumentedPoolMixin:
+    """在连接池获取连接时计时"""
+
+    pool_stats: PoolStats
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            self.pool_stats.record_timeout()
+            raise
+        self.pool_stats.record_checkout(time.perf_counter() - start, self.checkedout())
+        return record
+
+    def recreate(self):
+        # 连接失效重建连接池时保留统计
+        pool = super().recreate()
+        pool.pool_stats = self.pool_stats
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """带连接获取耗时统计的同步连接池"""
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """带连接获取耗时统计的异步连接池"""
+
+
+def instrumented_pool_class(url) -> type[QueuePool]:
+    """按数据库驱动选择带统计的连接池：异步驱动（如 asyncpg）即使用 create_engine 创建，也只能使用异步连接池"""
+    dialect = make_url(url).get_dialect()
+    return InstrumentedAsyncAdaptedQueuePool if getattr(dialect, "is_async", False) else InstrumentedQueuePool
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"%\(\w+\)s|\$\d+|:\w+|\?|%s")
+_VALUE_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint_statement(statement: str) -> str:
+    """语句指纹：去掉字面量和参数、合并 IN/VALUES 列表及空白，同一类查询得到相同指纹"""
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _PARAMETER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _VALUE_LIST.sub("(?+)", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return normalized
+
+
+class SlowQueryStats:
+    """按语句指纹聚合的慢查询统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.query_latency = LatencyHistogram()
+        self._slow: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.query_latency.observe(seconds)
+        ms = seconds * 1000
+        if ms < Settings.db_settings.SLOW_QUERY_MS:
+            return
+
+        normalized = fingerprint_statement(statement)
+        key = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+        with self._lock:
+            entry = self._slow.get(key)
+            is_new = entry is None
+            if is_new:
+                self._evict_if_full()
+                entry = self._slow[key] = {
+                    "fingerprint": key,
+                    "statement": normalized[:500],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            entry["last_seen"] = time.time()
+        # 同一指纹只在首次出现时记录日志，避免慢查询集中出现时刷屏
+        if is_new:
+            logger.warning(f"慢查询 [{key}] {ms:.1f}ms: {normalized[:500]}")
+
+    def _evict_if_full(self) -> None:
+        limit = Settings.db_settings.SLOW_QUERY_TOP_N
+        if len(self._slow) >= limit:
+            # 淘汰累计耗时最少的指纹
+            victim = min(self._slow, key=lambda k: self._slow[k]["total_ms"])
+            del self._slow[victim]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            slow = sorted(
+                ({**entry, "total_ms": round(entry["total_ms"], 3), "max_ms": round(entry["max_ms"], 3)}
+                 for entry in self._slow.values()),
+                key=lambda entry: entry["total_ms"],
+                reverse=True,
+            )
+        return {"latency": self.query_latency.snapshot(), "slow_queries": slow}
+
+    def reset(self) -> None:
+        self.query_latency.reset()
+        with self._lock:
+            self._slow.clear()
+
+
+class PoolMonitor:
+    """
+    数据库引擎监控：连接池统计与慢查询
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines: Dict[str, Engine] = {}
+        self.queries = SlowQueryStats()
+
+    def register(self, name: str, engine: Any) -> None:
+        """注册引擎（同步 Engine 或 AsyncEngine），监听语句执行事件"""
+        sync_engine = getattr(engine, "sync_engine", engine)
+        with self._lock:
+            self._engines[name] = sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            sync_engine = self._engines.pop(name, None)
+        if sync_engine is not None:
+            event.remove(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+            event.remove(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # 开始时间记在本条语句的执行上下文上；语句出错时不会触发 after_cursor_execute，
+        # 记在连接的 info 上会随连接一直残留
+        if context is not None:
+            context._query_start_time = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_query_start_time", None)
+        if start is not None:
+            self.queries.record(statement, time.perf_counter() - start)
+
+    @staticmethod
+    def _pool_snapshot(pool: Any) -> Dict[str, Any]:
+        snapshot: Dict[str, Any] = {"pool_class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            size = pool.size()
+            max_overflow = pool._max_overflow
+            checkedout = pool.checkedout()
+            capacity = size + max(max_overflow, 0)
+            snapshot.update({
+                "size": size,
+                "max_overflow": max_overflow,
+                "checkedout": checkedout,
+                "checkedin": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "saturation": round(checkedout / capacity, 4) if capacity > 0 else None,
+            })
+        stats: Optional[PoolStats] = getattr(pool, "pool_stats", None)
+        if stats is not None:
+            snapshot.update({
+                "peak_checkedout": stats.peak_checkedout,
+                "checkout_timeouts": stats.checkout_timeouts,
+                "checkout_latency": stats.checkout_latency.snapshot(),
+            })
+        return snapshot
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            engines = dict(self._engines)
+        return {
+            "pools": {name: self._pool_snapshot(engine.pool) for name, engine in engines.items()},
+            "queries": self.queries.snapshot(),
+        }
+
+    def collect_metrics(self) -> List[CollectedMetric]:
+        """导出 Prometheus 指标，抓取 /metrics 时调用"""
+        with self._lock:
+            engines = dict(self._engines)
+        gauges: Dict[str, List[tuple]] = {"checkedout": [], "size": [], "overflow": [], "saturation": []}
+        timeouts, checkout_samples = [], []
+        for name, engine in engines.items():
+            pool = engine.pool
+            labels = {"engine": name}
+            snapshot = self._pool_snapshot(pool)
+            for key, samples in gauges.items():
+                if snapshot.get(key) is not None:
+                    samples.append((labels, snapshot[key]))
+            stats: Optional[PoolStats] = getattr(pool, "pool_stats", None)
+            if stats is None:
+                continue
+            timeouts.append((labels, stats.checkout_timeouts))
+            histogram = stats.checkout_latency
+            with histogram._lock:
+                counts, sum_ms = list(histogram._counts), histogram.sum_ms
+            cumulative = 0
+            for bound, count in zip(histogram.buckets_ms + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else str(bound / 1000)
+                checkout_samples.append(("_bucket", {**labels, "le": le}, cumulative))
+            checkout_samples.append(("_sum", labels, sum_ms / 1000))
+            checkout_samples.append(("_count", labels, cumulative))
+        return [
+            ("db_pool_checkedout", "gauge", "连接池已借出的连接数", gauges["checkedout"]),
+            ("db_pool_size", "gauge", "连接池大小", gauges["size"]),
+            ("db_pool_overflow", "gauge", "连接池溢出连接数（为负数时表示尚未创建满）", gauges["overflow"]),
+            ("db_pool_saturation", "gauge", "连接池饱和度：已借出连接数 / (pool_size + max_overflow)", gauges["saturation"]),
+            ("db_pool_checkout_timeouts_total", "counter", "获取连接超时次数", timeouts),
+            ("db_pool_checkout_seconds", "histogram", "获取连接耗时", checkout_samples),
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            engines = list(self._engines.values())
+        for engine in engines:
+            stats = getattr(engine.pool, "pool_stats", None)
+            if stats is not None:
+                stats.reset()
+        self.queries.reset()
+
+
+pool_monitor = PoolMonitor()
+metrics_registry.register_collector("db_pool", pool_monitor.collect_metrics)
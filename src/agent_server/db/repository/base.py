@@ -1,8 +1,14 @@
-from typing import Any, Generic, Type, TypeVar, List
+import base64
+import json
+import time
+from datetime import datetime
+from itertools import batched
+from typing import Any, Generic, Iterable, Type, TypeVar, List
 from unittest import result
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, asc, desc
+from sqlalchemy import select, insert, update, delete, asc, desc, func, literal, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 
 from fastapi import Depends
@@ -11,7 +17,7 @@ from pydantic import BaseModel
 
 from ...db.models.base import BaseEntity
 from ...schemas.base import BaseSchema
-from ...core.exceptions import AlreadyExistsException
+from ...core.exceptions import AlreadyExistsException, BadRequestException
 from ..session import async_with_session, async_session_scope
 from ...utils.id_util import id_generator
 
@@ -20,6 +26,37 @@ ModelType = TypeVar('ModelType', bound=BaseEntity)
 CreateSchemaType = TypeVar('CreateSchemaType', bound=BaseSchema)
 UpdateSchemaType = TypeVar('UpdateSchemaType', bound=BaseSchema)
 
+# 表行数估算值缓存：{表名: (过期时间, 行数)}
+_count_cache: dict[str, tuple[float, int]] = {}
+COUNT_CACHE_TTL = 60
+
+# 批量操作时每条语句处理的行数，避免单条语句参数过多
+BULK_BATCH_SIZE = 1000
+
+
+def encode_cursor(value: Any, id: Any) -> str:
+    """把排序字段值和主键编码为不透明的游标"""
+    if isinstance(value, datetime):
+        payload = {"t": "dt", "v": value.isoformat(), "id": id}
+    else:
+        payload = {"v": value, "id": id}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Any, Any]:
+    """解析游标，返回 (排序字段值, 主键)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = payload["v"]
+        if payload.get("t") == "dt":
+            value = datetime.fromisoformat(value)
+        return value, payload["id"]
+    except Exception:
+        raise BadRequestException(detail="Invalid pagination cursor.")
+
+
 class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """
     一个包含通用 CRUD 操作的、可复用的仓库基类。
@@ -79,6 +116,77 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             order_by=order_by
         )
     
+    async def get_page(
+        self,
+        *,
+        cursor: str | None = None,
+        limit: int = 10,
+        order_field: str = "updated_time",
+        descending: bool = True,
+    ) -> tuple[List[ModelType], str | None]:
+        """
+        游标（keyset）分页：按 (order_field, id) 排序，用上一页最后一行的值作为条件定位下一页，
+        查询耗时与页码无关，不会像 OFFSET 一样随页数加深而变慢
+
+        Args:
+            cursor: 上一页返回的游标，为空时查询第一页
+            limit: 每页条数
+            order_field: 排序字段，需要有索引
+            descending: 是否倒序
+
+        Returns:
+            (当前页数据, 下一页游标)，没有更多数据时游标为 None
+        """
+        limit = 10 if limit < 1 or limit > 100 else limit
+        column = getattr(self.model, order_field)
+        id_column = self.model.id
+
+        statement = select(self.model)
+        if cursor:
+            value, last_id = decode_cursor(cursor)
+            keyset = tuple_(column, id_column)
+            # 参数按列类型绑定，避免雪花 ID 被推断为 INTEGER
+            boundary = tuple_(literal(value, column.type), literal(last_id, id_column.type))
+            statement = statement.where(keyset < boundary if descending else keyset > boundary)
+        if descending:
+            statement = statement.order_by(desc(column), desc(id_column))
+        else:
+            statement = statement.order_by(asc(column), asc(id_column))
+        # 多取一条判断是否还有下一页
+        statement = statement.limit(limit + 1)
+
+        async with async_session_scope() as session:
+            result = await session.scalars(statement)
+            items = list(result.all())
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor(getattr(last, order_field), last.id)
+        return items, next_cursor
+
+    async def estimate_count(self, ttl: float = COUNT_CACHE_TTL) -> int:
+        """
+        表总行数估算值：读取 pg_class.reltuples（由 ANALYZE/autovacuum 维护），结果缓存 ttl 秒，
+        避免大表上 COUNT(*) 全表扫描；表从未被分析过时回退为 COUNT(*)
+        """
+        table_name = self.model.__tablename__
+        cached = _count_cache.get(table_name)
+        now = time.monotonic()
+        if cached and cached[0] > now:
+            return cached[1]
+
+        async with async_session_scope() as session:
+            estimate = await session.scalar(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)"),
+                {"table_name": table_name},
+            )
+            if estimate is None or estimate < 0:
+                estimate = await session.scalar(select(func.count()).select_from(self.model))
+        _count_cache[table_name] = (now + ttl, int(estimate))
+        return int(estimate)
+
     async def create(self, *, obj_in: CreateSchemaType) -> ModelType:
         async with async_session_scope() as session:
             obj_in_data = obj_in.model_dump()
@@ -89,11 +197,12 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
             session.add(db_obj)
             try:
-                await session.commit()
+                # 只 flush 不提交，由 async_session_scope/uow 统一提交，工作单元中可以与其它操作共用一个事务
+                await session.flush()
                 await session.refresh(db_obj)
                 return db_obj
             except IntegrityError:
-                await session.rollback()
+                # 回滚由 async_session_scope/uow 负责
                 raise AlreadyExistsException(
                     detail=f"{self.model.__name__} with these unique properties already exists."
                 )
@@ -112,13 +221,116 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                     setattr(db_obj, field, update_data[field])
             
             session.add(db_obj)
-            await session.commit()
+            await session.flush()
             await session.refresh(db_obj)
             return db_obj
 
     async def delete(self, *, id: Any) -> None:
         async with async_session_scope() as session:
-            obj = await self.get(id)
+            # 在同一个会话中查询并删除
+            obj = await session.get(self.model, id)
             if obj:
                 await session.delete(obj)
-                await session.commit()
\ No newline at end of file
+                await session.flush()
+
+    def _to_rows(self, objs_in: Iterable[BaseModel | dict[str, Any]], assign_ids: bool = True) -> List[dict[str, Any]]:
+        """把 schema/字典转换为插入用的行，批量分配缺失的雪花 ID"""
+        rows = [obj.model_dump() if isinstance(obj, BaseModel) else dict(obj) for obj in objs_in]
+        if assign_ids:
+            missing = [row for row in rows if not row.get("id")]
+            for row, new_id in zip(missing, id_generator.next_ids(len(missing))):
+                row["id"] = new_id
+        return rows
+
+    async def bulk_create(
+        self,
+        *,
+        objs_in: Iterable[CreateSchemaType | dict[str, Any]],
+        batch_size: int = BULK_BATCH_SIZE,
+    ) -> List[int]:
+        """
+        批量插入：同一个事务内按批次执行 executemany INSERT，返回插入行的 ID
+        每行的字段需要一致（同一个 schema 的 model_dump 结果满足该要求）
+        """
+        rows = self._to_rows(objs_in)
+        if not rows:
+            return []
+        async with async_session_scope() as session:
+            for chunk in batched(rows, batch_size):
+                await session.execute(insert(self.model), list(chunk))
+        return [row["id"] for row in rows]
+
+    async def bulk_upsert(
+        self,
+        *,
+        objs_in: Iterable[CreateSchemaType | dict[str, Any]],
+        index_elements: List[str] | None = None,
+        update_fields: List[str] | None = None,
+        batch_size: int = BULK_BATCH_SIZE,
+    ) -> int:
+        """
+        批量插入或更新：INSERT ... ON CONFLICT (index_elements) DO UPDATE/DO NOTHING
+
+        Args:
+            objs_in: 待写入数据
+            index_elements: 冲突判断的唯一索引字段，默认主键 id
+            update_fields: 冲突时更新的字段，默认除冲突字段外的全部字段；传入空列表表示冲突时不做任何操作
+            batch_size: 每条语句处理的行数
+        """
+        rows = self._to_rows(objs_in)
+        if not rows:
+            return 0
+        index_elements = index_elements or ["id"]
+        if update_fields is None:
+            update_fields = [key for key in rows[0] if key not in index_elements]
+
+        statement = pg_insert(self.model)
+        if update_fields:
+            set_ = {field: statement.excluded[field] for field in update_fields}
+            if hasattr(self.model, "updated_time") and "updated_time" not in set_:
+                set_["updated_time"] = func.now()
+            statement = statement.on_conflict_do_update(index_elements=index_elements, set_=set_)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+
+        async with async_session_scope() as session:
+            for chunk in batched(rows, batch_size):
+                await session.execute(statement, list(chunk))
+        return len(rows)
+
+    async def bulk_update(
+        self,
+        *,
+        objs_in: Iterable[UpdateSchemaType | dict[str, Any]],
+        batch_size: int = BULK_BATCH_SIZE,
+    ) -> int:
+        """
+        按主键批量更新：每行必须包含 id，只更新行中出现的字段（schema 只取显式设置的字段）
+        """
+        rows = [
+            obj.model_dump(exclude_unset=True) if isinstance(obj, BaseModel) else dict(obj)
+            for obj in objs_in
+        ]
+        if not rows:
+            return 0
+        if any(not row.get("id") for row in rows):
+            raise BadRequestException(detail=f"{self.model.__name__} bulk update requires id in every row.")
+        async with async_session_scope() as session:
+            for chunk in batched(rows, batch_size):
+                # ORM 按主键批量更新，字段不同的行由 SQLAlchemy 自动分组为多条 executemany
+                await session.execute(update(self.model), list(chunk))
+        return len(rows)
+
+    async def bulk_delete(self, *, ids: Iterable[Any], batch_size: int = BULK_BATCH_SIZE) -> int:
+        """
+        按主键批量删除：DELETE ... WHERE id IN (...)，返回删除的行数
+        """
+        ids = list(ids)
+        if not ids:
+            return 0
+        deleted = 0
+        async with async_session_scope() as session:
+            for chunk in batched(ids, batch_size):
+                result = await session.execute(delete(self.model).where(self.model.id.in_(chunk)))
+                deleted += result.rowcount
+        return deleted
\ No newline at end of file
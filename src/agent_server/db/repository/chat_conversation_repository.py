@@ -4,9 +4,20 @@ from ...db.models.chat_conversation_model import ChatConversation
 from ...schemas.chat.chat_conversation_schema import ChatConversationCreate, ChatConversationUpdate
 
 class ChatConversationRepository(BaseRepository[ChatConversation, ChatConversationCreate, ChatConversationUpdate]):
-    # 这里是空的！因为所有基础方法都已自动获得。
-    # 我们只需要在这里添加ChatConversation专属的查询，比如按名称查找。
-    pass
+    # 所有基础方法都已自动获得。
+    # 这里只添加ChatConversation专属的操作。
+
+    async def create_if_absent(self, *, objs_in: list[ChatConversationCreate]) -> None:
+        """
+        会话不存在时创建：一条 INSERT ... ON CONFLICT (id) DO NOTHING，替代先查询再插入的两次往返
+        """
+        rows = {}
+        for obj_in in objs_in:
+            row = obj_in.model_dump()
+            # name 列长度为 50，使用用户问题作为会话名称时需要截断
+            row["name"] = (row.get("name") or "")[:50]
+            rows.setdefault(row["id"], row)
+        await self.bulk_upsert(objs_in=rows.values(), update_fields=[])
 
 chat_conversation_repository = ChatConversationRepository(ChatConversation)
 
@@ -0,0 +1,10 @@
+from .base import BaseRepository
+from ...db.models.chat_message_model import ChatMessage
+from ...schemas.chat.chat_message_schema import ChatMessageCreate, ChatMessageUpdate
+
+
+class ChatMessageRepository(BaseRepository[ChatMessage, ChatMessageCreate, ChatMessageUpdate]):
+    # 批量写入使用 BaseRepository.bulk_create
+    pass
+
+chat_message_repository = ChatMessageRepository(ChatMessage)
@@ -0,0 +1,23 @@
+from sqlalchemy import select
+
+from .base import BaseRepository
+from ..session import async_session_scope
+from ...db.models.knowlege_file_model import KnowledgeFile
+from ...schemas.knowledge.knowledge_file_schema import KnowledgeFileCreate, KnowledgeFileUpdate
+
+
+class KnowledgeFileRepository(BaseRepository[KnowledgeFile, KnowledgeFileCreate, KnowledgeFileUpdate]):
+
+    async def get_by_hash(self, *, kb_name: str, file_hash: str) -> KnowledgeFile | None:
+        """
+        按文件内容哈希查找知识库中已入库的文件
+        """
+        async with async_session_scope() as session:
+            statement = (
+                select(self.model)
+                .where(self.model.kb_name == kb_name, self.model.file_hash == file_hash)
+                .limit(1)
+            )
+            return await session.scalar(statement)
+
+knowledge_file_repository = KnowledgeFileRepository(KnowledgeFile)
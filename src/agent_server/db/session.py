@@ -1,8 +1,10 @@
 from typing import AsyncGenerator, Optional, Any, Callable, TypeVar, Union, Dict, Generator
 from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
 from functools import wraps
 import time
 import asyncio
+import threading
 from dataclasses import dataclass
 
 from sqlalchemy.orm import Session, sessionmaker
@@ -12,6 +14,7 @@ from sqlalchemy.exc import SQLAlchemyError, DisconnectionError
 
 from ..utils.log_util import build_logger
 from ..config.settings import Settings
+from .pool_monitor import pool_monitor
 
 
 logger = build_logger("session_manager")
@@ -33,53 +36,67 @@ class SessionConfig:
 
 
 class SessionMonitor:
-    """Session监控类"""
+    """Session监控类，同步Session可能在多个线程中使用，计数使用锁保护"""
     
     def __init__(self):
-        self.session_count = 0
-        self.active_sessions = 0
-        self.total_transactions = 0
-        self.failed_transactions = 0
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """重置计数"""
+        with self._lock:
+            self.session_count = 0
+            self.active_sessions = 0
+            self.total_transactions = 0
+            self.failed_transactions = 0
         
     def session_created(self):
         """记录session创建"""
-        self.session_count += 1
-        self.active_sessions += 1
-        logger.debug(f"Session created. Active sessions: {self.active_sessions}")
+        with self._lock:
+            self.session_count += 1
+            self.active_sessions += 1
         
     def session_closed(self):
         """记录session关闭"""
-        self.active_sessions -= 1
-        logger.debug(f"Session closed. Active sessions: {self.active_sessions}")
+        with self._lock:
+            self.active_sessions -= 1
         
     def transaction_started(self):
         """记录事务开始"""
-        self.total_transactions += 1
-        logger.debug(f"Transaction started. Total: {self.total_transactions}")
+        with self._lock:
+            self.total_transactions += 1
         
     def transaction_failed(self):
         """记录事务失败"""
-        self.failed_transactions += 1
-        logger.warning(f"Transaction failed. Failed: {self.failed_transactions}")
+        with self._lock:
+            self.failed_transactions += 1
+            failed = self.failed_transactions
+        logger.warning(f"Transaction failed. Failed: {failed}")
         
     def get_stats(self) -> Dict[str, Any]:
-        """获取统计信息"""
-        return {
-            "session_count": self.session_count,
-            "active_sessions": self.active_sessions,
-            "total_transactions": self.total_transactions,
-            "failed_transactions": self.failed_transactions,
-            "success_rate": (
-                (self.total_transactions - self.failed_transactions) / self.total_transactions * 100
-                if self.total_transactions > 0 else 0
-            )
-        }
+        """获取统计信息，包含连接池与慢查询统计"""
+        with self._lock:
+            stats = {
+                "session_count": self.session_count,
+                "active_sessions": self.active_sessions,
+                "total_transactions": self.total_transactions,
+                "failed_transactions": self.failed_transactions,
+                "success_rate": (
+                    (self.total_transactions - self.failed_transactions) / self.total_transactions * 100
+                    if self.total_transactions > 0 else 0
+                )
+            }
+        stats.update(pool_monitor.snapshot())
+        return stats
 
 
 # 全局配置和监控实例
 session_config = SessionConfig()
 session_monitor = SessionMonitor()
 
+# 当前工作单元（uow）中的异步Session，由 uow() 设置
+_ambient_session: ContextVar[Optional[AsyncSession]] = ContextVar("ambient_async_session", default=None)
+
 
 # ==================== 异步Session上下文管理器 ====================
 
@@ -104,6 +121,12 @@ async def async_session_scope(
             session.add(user)
             # 自动提交或回滚
     """
+    # 处于工作单元中时复用其Session，提交/回滚/关闭由工作单元负责
+    ambient_session = _ambient_session.get()
+    if ambient_session is not None:
+        yield ambient_session
+        return
+
     # 使用传入参数或全局配置
     _auto_commit = auto_commit if auto_commit is not None else session_config.auto_commit
     _auto_rollback = auto_rollback if auto_rollback is not None else session_config.auto_rollback
@@ -165,6 +188,40 @@ async def async_session_scope(
             logger.debug(f"异步Session执行时间: {execution_time:.3f}秒")
 
 
+# ==================== 工作单元（Unit of Work） ====================
+
+@asynccontextmanager
+async def uow(auto_commit: Optional[bool] = None) -> AsyncGenerator[AsyncSession, None]:
+    """
+    工作单元：块内所有 async_session_scope()（包括仓库方法）复用同一个Session，
+    整个块只占用一个连接、只有一个事务，正常结束时统一提交，异常时统一回滚
+
+    嵌套使用时复用外层工作单元。同一个Session不能被并发使用，块内不要 asyncio.gather 多个数据库操作。
+
+    Usage:
+        async with uow():
+            conversation = await chat_conversation_repository.get(id=conversation_id)
+            if conversation is None:
+                await chat_conversation_repository.create(obj_in=data)
+    """
+    ambient_session = _ambient_session.get()
+    if ambient_session is not None:
+        yield ambient_session
+        return
+
+    async with async_session_scope(auto_commit=auto_commit) as session:
+        token = _ambient_session.set(session)
+        try:
+            yield session
+        finally:
+            _ambient_session.reset(token)
+
+
+def get_current_session() -> Optional[AsyncSession]:
+    """获取当前工作单元中的Session，不在工作单元中时返回 None"""
+    return _ambient_session.get()
+
+
 # ==================== 同步Session上下文管理器 ====================
 
 @contextmanager
@@ -433,9 +490,9 @@ def get_session_stats() -> Dict[str, Any]:
 
 
 def reset_session_stats():
-    """重置Session统计信息"""
-    global session_monitor
-    session_monitor = SessionMonitor()
+    """重置Session统计信息（原地重置，已导入的 session_monitor 引用仍然有效）"""
+    session_monitor.reset()
+    pool_monitor.reset()
     logger.info("Session统计信息已重置")
 
 
@@ -1,11 +1,11 @@
 
+import asyncio
 import json
 import sys
 import os
 import argparse
 import logging
 import logging.config
-from turtle import up
 
 from dotenv import load_dotenv
 
@@ -13,13 +13,12 @@ from dotenv import load_dotenv
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
-print("Current sys.path = ", sys.path)
 
 import uvicorn
 from fastapi import Body, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from starlette.responses import RedirectResponse
+from starlette.responses import RedirectResponse, Response
 
 from contextlib import asynccontextmanager
 
@@ -29,7 +28,15 @@ from agent_server.api.v1.prompt_routes import router as prompt_router
 from agent_server.api.v1.rag_routes import router as rag_router
 from agent_server.api.v1.upload_routes import router as upload_router
 from agent_server.api.v1.chat_conversation_routes import router as chat_conversation_router
+from agent_server.api.v1.monitor_routes import router as monitor_router
+from agent_server.api.v1.health_routes import router as health_router
+from agent_server.app.health.health_service import health_service
+from agent_server.app.llm.model_health import model_health
+from agent_server.app.rag.vector_store.engine_registry import vs_engine_registry
+from agent_server.app.rag.ingest.ingest_queue import ingest_queue
 from agent_server.core.exceptions import global_exception_handler
+from agent_server.core.tracing import tracer
+from agent_server.core.metrics import MetricsMiddleware, metrics_registry, register_cache, CONTENT_TYPE_LATEST
 from agent_server.config.settings import Settings
 from agent_server.utils.log_util import (
     build_logger,
@@ -42,29 +49,78 @@ from agent_server.db.base import (
     close_database_connection,
     create_db_and_tables,
 )
+from agent_server.app.chat.chat_message_writer import chat_message_writer
+from agent_server.utils.redis_util import close_redis_pool
+from agent_server.utils.llm_util import get_default_embedding, registry_cache_stats
+from agent_server.app.rag.text_splitter.parallel_text_splitter import splitter_cache_stats
+from agent_server.utils.id_util import id_generator, MULTI_PROCESS_ENV
 
 logger = build_logger("main")
 
+# 服务角色，run_api 通过环境变量传递给 uvicorn 启动的 worker 进程
+API_ROLE_ENV = "RESEARCHAGENT_API_ROLE"
+API_ROLES = ("all", "chat", "ingest")
+
+# 各角色挂载的业务路由：(路由, 标签)；健康检查、运行监控与指标接口所有角色都挂载
+ROLE_ROUTERS = {
+    "chat": [
+        (chat_router, "Chat对话"),
+        (prompt_router, "Prompt提示词"),
+        (chat_conversation_router, "Chat会话消息"),
+    ],
+    "ingest": [
+        (rag_router, "RAG检索增强生成"),
+        (upload_router, "Upload文件上传"),
+    ],
+}
+
+
+def get_api_role(role: str | None = None) -> str:
+    """获取服务角色：参数 > 环境变量 > API_SERVER.role"""
+    role = role or os.environ.get(API_ROLE_ENV) or Settings.basic_settings.API_SERVER.get("role", "all")
+    if role not in API_ROLES:
+        raise ValueError(f"Unsupported api role: {role}, expected one of {API_ROLES}")
+    return role
+
 # 使用 lifespan 管理应用生命周期事件
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 应用启动时执行
+    # 应用启动时执行，多 worker 时每个 worker 进程各自执行：连接池都在这里（fork 之后）创建
+    role = app.state.role
     # 配置自动加载
     Settings.set_auto_reload(True)
     await setup_database_connection()
+    # 向量库引擎在每个 worker 进程中各自创建
+    await vs_engine_registry.startup([Settings.kn_settings.DEFAULT_VS_TYPE])
+    # 为本 worker 进程分配雪花ID节点（可能访问 Redis），不留到第一个请求
+    await asyncio.to_thread(lambda: id_generator.node_id)
     # [可选] 在开发时创建表
     # env = os.getenv("ENVIRONMENT", "dev")
     # if env == "dev":
         # Settings.create_all_templates()
         # await create_db_and_tables()
+    if role in ("all", "chat"):
+        chat_message_writer.start()
+    # 后台探测默认嵌入模型，请求路径只读取探测结果
+    model_health.register_embed_model(get_default_embedding())
+    model_health.start()
 
-    logger.info("🚀 应用启动，数据库已连接。")
+    logger.info(f"🚀 应用启动，数据库已连接。role={role}, pid={os.getpid()}")
     yield
     # 应用关闭时执行
+    # 先写入缓冲区中剩余的聊天记录，再关闭数据库连接
+    await chat_message_writer.stop()
+    await model_health.stop()
+    await vs_engine_registry.close()
     await close_database_connection()
+    close_redis_pool()
+    await ingest_queue.close()
+    await health_service.close()
+    tracer.shutdown()
     logger.info("应用关闭，数据库连接已释放。")
 
-def create_app(run_mode: str = "") -> FastAPI:
+def create_app(run_mode: str = "", role: str | None = None) -> FastAPI:
+    role = get_api_role(role)
     logger.info(f"🔧 Starting API with basic settings: {json.dumps(Settings.basic_settings.model_dump(), ensure_ascii=False, indent=2)}")
     logger.info(f"🔧 Starting API with model settings: {json.dumps(Settings.model_settings.model_dump(), ensure_ascii=False, indent=2)}")
     # logger.info(f"🔧 Starting API with platforms configurations: {json.dumps(get_config_platforms(), ensure_ascii=False, indent=2)}")
@@ -81,6 +137,7 @@ def create_app(run_mode: str = "") -> FastAPI:
         version=Settings.basic_settings.version,
         lifespan=lifespan,
     )
+    app.state.role = role
     
     # 添加 CORS 支持
     # MakeFastAPIOffline(app)
@@ -96,12 +153,21 @@ def create_app(run_mode: str = "") -> FastAPI:
         )
 
     
-    # 注册路由 
-    app.include_router(chat_router, prefix="/api", tags=["Chat对话"])
-    app.include_router(prompt_router, prefix="/api", tags=["Prompt提示词"])
-    app.include_router(rag_router, prefix="/api", tags=["RAG检索增强生成"])
-    app.include_router(upload_router, prefix="/api", tags=["Upload文件上传"])
-    app.include_router(chat_conversation_router, prefix="/api", tags=["Chat会话消息"])
+    # 请求耗时指标，放在最外层以包含其它中间件的耗时
+    if Settings.basic_settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+        register_cache("build_logger", build_logger)
+        register_cache("model_registry", registry_cache_stats)
+        register_cache("tiktoken_splitter", splitter_cache_stats)
+
+    # 注册路由，按服务角色挂载业务路由
+    for router_role, routers in ROLE_ROUTERS.items():
+        if role in ("all", router_role):
+            for router, tag in routers:
+                app.include_router(router, prefix="/api", tags=[tag])
+    app.include_router(monitor_router, prefix="/api", tags=["Monitor运行监控"])
+    # 负载均衡探测接口不加 /api 前缀
+    app.include_router(health_router, tags=["Health健康检查"])
 
     # 媒体文件
     # app.mount("/media", StaticFiles(directory=Settings.basic_settings.MEDIA_PATH), name="media")
@@ -110,20 +176,26 @@ def create_app(run_mode: str = "") -> FastAPI:
     # img_dir = str(Settings.basic_settings.IMG_DIR)
     # app.mount("/img", StaticFiles(directory=img_dir), name="img")
 
+    # 存活探测，不检查依赖；依赖检查见 /ready 与 /health/deep
     @app.get("/health")
     def health():
         return {"status": "running"}
 
+    @app.get("/metrics", summary="Prometheus 指标", include_in_schema=False)
+    def metrics():
+        return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE_LATEST)
+
     @app.get("/", summary="swagger 文档", include_in_schema=False)
     async def document():
         return RedirectResponse(url="/docs")
 
     # 其它接口
-    app.post(
-        "/other/completion",
-        tags=["Other"],
-        summary="要求llm模型补全(通过LLMChain)",
-    )(chat_async)
+    if role in ("all", "chat"):
+        app.post(
+            "/other/completion",
+            tags=["Other"],
+            summary="要求llm模型补全(通过LLMChain)",
+        )(chat_async)
 
     # 注册全局异常处理器
     # 这会捕获所有类型为 Exception 的异常
@@ -131,7 +203,18 @@ def create_app(run_mode: str = "") -> FastAPI:
 
     return app
 
-app = create_app()
+
+_app: FastAPI | None = None
+
+
+def __getattr__(name: str):
+    # 模块级 app 在首次访问时创建（如 uvicorn agent_server.main:app），导入本模块不会创建应用
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def run_api(**kwargs):
@@ -143,19 +226,34 @@ def run_api(**kwargs):
     )
     logging.config.dictConfig(logging_conf)  # type: ignore
     
-    host= kwargs.get("host", Settings.basic_settings.API_SERVER.get("host", "localhost"))
-    port= kwargs.get("port", Settings.basic_settings.API_SERVER.get("port", 18081))
+    api_server = Settings.basic_settings.API_SERVER
+    host= kwargs.get("host", api_server.get("host", "localhost"))
+    port= kwargs.get("port", api_server.get("port", 18081))
+    workers = kwargs.get("workers") or api_server.get("workers", 1)
+    # worker 进程由 uvicorn 以 spawn 方式启动并重新导入应用，角色通过环境变量传递
+    os.environ[API_ROLE_ENV] = get_api_role(kwargs.get("role"))
+    if workers > 1:
+        # 多个 worker 进程不能按进程号分配雪花ID节点，无法租用时启动失败
+        os.environ[MULTI_PROCESS_ENV] = "1"
 
+    ssl_kwargs = {}
     if kwargs.get("ssl_keyfile") and kwargs.get("ssl_certfile"):
-        uvicorn.run(
-            app,
-            host=host,
-            port=port,
-            ssl_keyfile=kwargs.get("ssl_keyfile"),
-            ssl_certfile=kwargs.get("ssl_certfile"),
-        )
-    else:
-        uvicorn.run(app, host=host, port=port)
+        ssl_kwargs = {
+            "ssl_keyfile": kwargs.get("ssl_keyfile"),
+            "ssl_certfile": kwargs.get("ssl_certfile"),
+        }
+
+    # 使用应用工厂：每个 worker 在自己的进程中创建应用，连接池在 lifespan 中创建，不会在进程间共享
+    uvicorn.run(
+        "agent_server.main:create_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        loop=api_server.get("loop", "auto"),
+        http=api_server.get("http", "auto"),
+        **ssl_kwargs,
+    )
 
 
 if __name__ == "__main__":
@@ -166,6 +264,8 @@ if __name__ == "__main__":
     )
     parser.add_argument("--host", type=str, default=Settings.basic_settings.API_SERVER.get("host", "localhost"))
     parser.add_argument("--port", type=int, default=Settings.basic_settings.API_SERVER.get("port", 18081))
+    parser.add_argument("--workers", type=int, default=Settings.basic_settings.API_SERVER.get("workers", 1))
+    parser.add_argument("--role", type=str, choices=API_ROLES, default=None, help="服务角色，默认使用 API_SERVER.role")
     parser.add_argument("--ssl_keyfile", type=str)
     parser.add_argument("--ssl_certfile", type=str)
     # 初始化消息
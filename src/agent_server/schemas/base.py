@@ -1,4 +1,6 @@
-from pydantic import BaseModel, ConfigDict
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel, ConfigDict, Field
 
 # 基类，我们所有的 pydantic 模型都需要继承它
 class BaseSchema(BaseModel):
@@ -8,3 +10,13 @@ class BaseSchema(BaseModel):
     
     # class Config:
     #     from_attributes = True  # 告诉 Pydantic 模型可以从 ORM 对象属性中读取数据
+
+
+T = TypeVar("T")
+
+class CursorPage(BaseModel, Generic[T]):
+    """游标分页结果"""
+    items: list[T] = Field(default_factory=list, description="当前页数据")
+    next_cursor: str | None = Field(None, description="下一页游标，没有更多数据时为空")
+    has_more: bool = Field(False, description="是否还有下一页")
+    total: int | None = Field(None, description="总条数估算值，未请求时为空")
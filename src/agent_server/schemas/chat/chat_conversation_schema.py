@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel, Field, field_validator
 
@@ -14,3 +15,8 @@ class ChatConversationCreate(ChatConversationBase):
 
 class ChatConversationUpdate(ChatConversationBase):
     id: int = Field(description="会话ID")
+
+class ChatConversationRead(ChatConversationBase):
+    id: int = Field(description="会话ID")
+    created_time: datetime | None = Field(None, description="创建时间")
+    updated_time: datetime | None = Field(None, description="更新时间")
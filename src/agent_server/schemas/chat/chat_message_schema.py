@@ -0,0 +1,21 @@
+from typing import Any
+from pydantic import Field
+
+from agent_server.schemas.base import BaseSchema
+
+
+class ChatMessageBase(BaseSchema):
+    id: int | None = Field(None, description="消息ID")
+    conversation_id: int = Field(description="会话ID")
+    chat_type: str = Field("", description="聊天类型")
+    question: str = Field("", description="用户问题")
+    answer: str = Field("", description="模型回答")
+    meta_data: dict[str, Any] = Field(default_factory=dict, description="检索来源、耗时等元数据")
+
+class ChatMessageCreate(ChatMessageBase):
+    pass
+
+class ChatMessageUpdate(BaseSchema):
+    id: int = Field(description="消息ID")
+    feedback_score: int | None = Field(None, description="用户评分")
+    feedback_reason: str | None = Field(None, description="用户评分理由")
@@ -0,0 +1,22 @@
+from pydantic import Field
+
+from agent_server.schemas.base import BaseSchema
+
+
+class KnowledgeFileBase(BaseSchema):
+    id: int | None = Field(None, description="文件ID")
+    file_name: str = Field(..., description="文件名")
+    file_ext: str = Field("", description="文件扩展名")
+    file_hash: str = Field("", description="文件内容SHA-256")
+    kb_id: int = Field(0, description="所属知识库ID")
+    kb_name: str = Field(..., description="所属知识库名称")
+    document_loader_name: str = Field("", description="文档加载器名称")
+    text_splitter_name: str = Field("", description="文本分割器名称")
+    file_size: int = Field(0, description="文件大小")
+    docs_count: int = Field(0, description="切分文档数量")
+
+class KnowledgeFileCreate(KnowledgeFileBase):
+    pass
+
+class KnowledgeFileUpdate(KnowledgeFileBase):
+    id: int = Field(description="文件ID")
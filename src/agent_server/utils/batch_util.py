@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+import weakref
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from agent_server.core.metrics import MICRO_BATCH_SIZE, MICRO_BATCH_WAIT
+from agent_server.utils.log_util import build_logger
+
+
+"""
+动态批处理（micro-batching）
+
+多个协程各自提交少量输入，批处理器把同一时间窗口内的输入合并成一次调用，再把结果按顺序分发回各个协程：
+- 攒够 max_batch_size 个输入立即执行；否则从第一个输入到达起最多等待 max_wait_ms 毫秒
+- 批处理函数抛出异常时，该批次中的所有调用方都收到这个异常
+- 调用方被取消不影响同批次的其它调用方
+- 批次大小与每个输入等待凑批的时间记录在 micro_batch_size / micro_batch_wait_seconds 指标中
+- 每个事件循环各自凑批：多个线程各自运行事件循环时共用一个批处理器，不同事件循环的输入不会合并
+"""
+
+logger = build_logger()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BatchFunc = Callable[[list[T]], Awaitable[list[R]]]
+
+
+class _LoopState:
+    """
+    一个事件循环上等待凑批的输入与执行中的批次，只在该事件循环的线程中访问
+    不引用事件循环本身，否则以事件循环为键的弱引用字典永远不会释放
+    """
+
+    def __init__(self):
+        self.pending: list[tuple] = []
+        self.timer: asyncio.TimerHandle | None = None
+        self.tasks: set[asyncio.Task] = set()
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    把并发的单个输入合并为批次调用 func，func 必须按输入顺序返回等长的结果列表
+
+    可作为进程内单例使用：状态按事件循环分别保存，事件循环被回收后对应的状态随之释放
+    """
+
+    def __init__(self, func: BatchFunc, max_batch_size: int = 32, max_wait_ms: float = 10.0, name: str = "batch"):
+        self.func = func
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self._states: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState] = weakref.WeakKeyDictionary()
+        self._states_lock = threading.Lock()
+
+    def _get_state(self, loop: asyncio.AbstractEventLoop) -> _LoopState:
+        state = self._states.get(loop)
+        if state is None:
+            with self._states_lock:
+                state = self._states.get(loop)
+                if state is None:
+                    state = self._states[loop] = _LoopState()
+        return state
+
+    async def submit(self, item: T) -> R:
+        return (await self.submit_many([item]))[0]
+
+    async def submit_many(self, items: list[T]) -> list[R]:
+        """提交多个输入，可能与同一事件循环中其它协程的输入合并，也可能被拆到多个批次"""
+        if not items:
+            return []
+        loop = asyncio.get_running_loop()
+        state = self._get_state(loop)
+
+        now = time.perf_counter()
+        futures = []
+        for item in items:
+            future = loop.create_future()
+            state.pending.append((item, future, now))
+            futures.append(future)
+            if len(state.pending) >= self.max_batch_size:
+                self._flush(state)
+        if state.pending and state.timer is None:
+            state.timer = loop.call_later(self.max_wait, self._flush, state)
+        # 输入被拆到多个批次时，每个批次的异常都要取回，避免 "exception was never retrieved"
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def _flush(self, state: _LoopState) -> None:
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        if not state.pending:
+            return
+        batch, state.pending = state.pending, []
+        now = time.perf_counter()
+        MICRO_BATCH_SIZE.observe(len(batch), batcher=self.name)
+        for _, _, enqueued_at in batch:
+            MICRO_BATCH_WAIT.observe(now - enqueued_at, batcher=self.name)
+        # 在 submit_many 或该事件循环的定时回调中调用，当前运行的就是状态所属的事件循环
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        state.tasks.add(task)
+        task.add_done_callback(state.tasks.discard)
+
+    async def _run(self, batch: list[tuple[T, asyncio.Future, float]]) -> None:
+        try:
+            results = await self.func([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"{self.name}: 批处理返回 {len(results)} 个结果，输入 {len(batch)} 个")
+        except Exception as e:
+            logger.warning(f"{self.name}: 批处理失败, size={len(batch)}, error={e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            # 调用方已取消时跳过
+            if not future.done():
+                future.set_result(result)
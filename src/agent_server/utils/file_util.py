@@ -0,0 +1,56 @@
+import hashlib
+import os
+import uuid
+from pathlib import Path
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+
+# 上传文件每次读取的块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _write_chunk(buffer, sha256, chunk: bytes) -> None:
+    # hashlib 处理大块数据时会释放 GIL，与写文件一起放到线程池中执行
+    sha256.update(chunk)
+    buffer.write(chunk)
+
+
+async def save_upload_file(file: UploadFile, target_dir: str | Path) -> tuple[Path, str, int]:
+    """
+    分块流式保存上传文件，同时计算 SHA-256，文件以内容哈希命名（保留扩展名）
+
+    先写入唯一的临时文件，完成后原子重命名为 <sha256><ext>，
+    同名文件并发上传不会互相覆盖，相同内容的文件只保存一份。
+
+    Returns:
+        (保存路径, SHA-256, 文件大小)
+    """
+    target_dir = Path(target_dir)
+    suffix = Path(file.filename or "").suffix.lower()
+    part_path = target_dir / f".{uuid.uuid4().hex}.part"
+
+    sha256 = hashlib.sha256()
+    size = 0
+    buffer = None
+    try:
+        # 文件系统操作都在线程池中执行，不阻塞事件循环
+        await run_in_threadpool(target_dir.mkdir, parents=True, exist_ok=True)
+        buffer = await run_in_threadpool(open, part_path, "wb")
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await run_in_threadpool(_write_chunk, buffer, sha256, chunk)
+            size += len(chunk)
+        await run_in_threadpool(buffer.close)
+        file_hash = sha256.hexdigest()
+        file_path = target_dir / f"{file_hash}{suffix}"
+        await run_in_threadpool(os.replace, part_path, file_path)
+    except BaseException:
+        if buffer is not None:
+            buffer.close()
+        part_path.unlink(missing_ok=True)
+        raise
+    finally:
+        await file.close()
+
+    return file_path, file_hash, size
@@ -1,7 +1,14 @@
-from typing import Any
+import atexit
+import os
+import socket
+import threading
+import time
+import uuid
+import weakref
+from typing import Callable
 
+from agent_server.utils.log_util import build_logger
 
-import time
 
 """
 生成唯一ID
@@ -12,50 +19,328 @@ import time
 5位工作机器ID
 12位序列号
 
-Params:
-    datacenter_id (int): 数据中心ID
-    worker_id (int): 工作节点ID
-    
+数据中心ID与工作机器ID合起来共 10 位（0~1023），多进程部署时每个进程必须使用不同的值，
+未显式指定时在进程首次生成ID时按以下顺序分配（fork 出的子进程会重新分配）：
+1. 环境变量 RESEARCHAGENT_SNOWFLAKE_WORKER_ID（0~1023），由部署方保证每个进程不同
+2. 在 Redis 中租用一个空闲的 ID（SET NX EX），后台线程定期续期，进程退出时释放
+3. Redis 不可用时使用进程号对 1024 取模并记录警告。不同进程的进程号取模后仍可能相同，
+   多台机器之间更容易冲突，只适用于单进程部署。多进程部署（环境变量 RESEARCHAGENT_SNOWFLAKE_MULTI_PROCESS=1，
+   run_api 在 workers > 1 时自动设置）不使用该方式，直接报错
+
 Raises:
-    ValueError: 时钟回拨，无法生成ID
+    ValueError: 时钟回拨超过 MAX_CLOCK_BACKWARD_MS，无法生成ID
+    RuntimeError: 多进程部署时既没有配置 RESEARCHAGENT_SNOWFLAKE_WORKER_ID，也无法在 Redis 中租用节点ID
+"""
+
+logger = build_logger()
+
+EPOCH = 1288834974657
+SEQUENCE_BITS = 12
+WORKER_ID_BITS = 5
+DATACENTER_ID_BITS = 5
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+MAX_NODE_ID = (1 << (WORKER_ID_BITS + DATACENTER_ID_BITS)) - 1
+
+# 时钟回拨不超过该值（毫秒）时等待时钟追上，超过时报错
+MAX_CLOCK_BACKWARD_MS = 10
 
-Returns:
-    int: 生成的唯一ID
+WORKER_ID_ENV = "RESEARCHAGENT_SNOWFLAKE_WORKER_ID"
+# 多进程部署标记，设置后不允许退回到按进程号分配
+MULTI_PROCESS_ENV = "RESEARCHAGENT_SNOWFLAKE_MULTI_PROCESS"
+
+# Redis 租约有效期（秒），每 1/3 有效期续期一次
+LEASE_TTL = 60
+LEASE_CONNECT_TIMEOUT = 1.0
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
 """
+
+
+def _current_millis() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def _default_lease_client():
+    import redis
+
+    from agent_server.config.settings import Settings
+
+    # 使用独立的连接并设置较短的超时，Redis 不可用时尽快退回到按进程号分配
+    return redis.Redis.from_url(
+        Settings.basic_settings.REDIS_URL,
+        socket_connect_timeout=LEASE_CONNECT_TIMEOUT,
+        socket_timeout=LEASE_CONNECT_TIMEOUT,
+    )
+
+
+def _default_lease_prefix() -> str:
+    from agent_server.config.settings import Settings
+
+    return f"{Settings.basic_settings.REDIS_PREFIX}snowflake:worker:"
+
+
+class WorkerIdLease:
+    """
+    在 Redis 中租用工作机器ID：SET NX EX 抢占一个空闲的 ID，后台线程定期续期
+
+    续期时发现租约已丢失（过期后被其它进程占用）会调用 on_lost，由生成器重新分配
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable | None = None,
+        prefix: str | None = None,
+        ttl: int = LEASE_TTL,
+    ):
+        self._client_factory = client_factory or _default_lease_client
+        self._prefix = prefix
+        self.ttl = ttl
+        self.on_lost: Callable[[], None] | None = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.node_id: int | None = None
+        self._owner: str | None = None
+        self._client = None
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def prefix(self) -> str:
+        if self._prefix is None:
+            self._prefix = _default_lease_prefix()
+        return self._prefix
+
+    def key(self, node_id: int) -> str:
+        return f"{self.prefix}{node_id}"
+
+    def acquire(self) -> int | None:
+        """租用一个空闲的 ID，全部被占用时返回 None，Redis 不可用时抛出异常"""
+        if self._client is None:
+            self._client = self._client_factory()
+        owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # 从进程号对应的位置开始找，减少多个进程同时启动时的争抢
+        start = os.getpid() & MAX_NODE_ID
+        for offset in range(MAX_NODE_ID + 1):
+            node_id = (start + offset) & MAX_NODE_ID
+            if self._client.set(self.key(node_id), owner, nx=True, ex=self.ttl):
+                self.node_id, self._owner = node_id, owner
+                self._start_renewal()
+                return node_id
+        return None
+
+    def renew(self) -> bool:
+        """续期，租约已不属于本进程时返回 False"""
+        if self.node_id is None:
+            return False
+        return bool(self._client.eval(_RENEW_SCRIPT, 1, self.key(self.node_id), self._owner, self.ttl))
+
+    def release(self) -> None:
+        """停止续期并释放租约"""
+        self._stop_event.set()
+        if self.node_id is None:
+            return
+        try:
+            self._client.eval(_RELEASE_SCRIPT, 1, self.key(self.node_id), self._owner)
+        except Exception as e:
+            logger.warning(f"释放雪花ID租约失败: node_id={self.node_id}, error={e}")
+        self.node_id = None
+
+    def _start_renewal(self) -> None:
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._renew_loop, name="snowflake-lease", daemon=True)
+        self._thread.start()
+
+    def _renew_loop(self) -> None:
+        while not self._stop_event.wait(self.ttl / 3):
+            try:
+                if self.renew():
+                    continue
+            except Exception as e:
+                # Redis 暂时不可用时继续使用当前 ID，其它进程此时同样无法抢占
+                logger.warning(f"雪花ID租约续期失败: node_id={self.node_id}, error={e}")
+                continue
+            logger.error(f"雪花ID租约已丢失，将重新分配: node_id={self.node_id}")
+            self.node_id = None
+            if self.on_lost is not None:
+                self.on_lost()
+            return
+
+    def after_fork(self) -> None:
+        # 子进程不继承续期线程与连接，也不能释放父进程的租约
+        self._reset()
+
+
 class SnowflakeGenerator:
-    def __init__(self, datacenter_id, worker_id):
-        self.datacenter_id = datacenter_id
-        self.worker_id = worker_id
+    """
+    线程安全的雪花ID生成器
+
+    Params:
+        datacenter_id (int): 数据中心ID，与 worker_id 同时指定时不再自动分配
+        worker_id (int): 工作节点ID
+        lease (WorkerIdLease): 自动分配时使用的 Redis 租约
+    """
+
+    def __init__(
+        self,
+        datacenter_id: int | None = None,
+        worker_id: int | None = None,
+        lease: WorkerIdLease | None = None,
+    ):
+        self._fixed = datacenter_id is not None and worker_id is not None
+        self._node_id: int | None = None
+        self.node_source = ""
+        if self._fixed:
+            if not (0 <= datacenter_id < (1 << DATACENTER_ID_BITS) and 0 <= worker_id < (1 << WORKER_ID_BITS)):
+                raise ValueError(f"无效的数据中心ID或工作节点ID: {datacenter_id}, {worker_id}")
+            self._node_id = (datacenter_id << WORKER_ID_BITS) | worker_id
+            self.node_source = "fixed"
+        self._lease = lease or WorkerIdLease()
+        self._lease.on_lost = self._on_lease_lost
+        self._lock = threading.Lock()
         self.sequence = 0
         self.last_timestamp = -1
 
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: (generator := ref()) is not None and generator._after_fork())
+
+    @property
+    def node_id(self) -> int:
+        """10 位节点ID（数据中心ID + 工作节点ID），未分配时先分配"""
+        with self._lock:
+            return self._ensure_node_id()
+
+    @property
+    def datacenter_id(self) -> int:
+        return self.node_id >> WORKER_ID_BITS
+
+    @property
+    def worker_id(self) -> int:
+        return self.node_id & ((1 << WORKER_ID_BITS) - 1)
+
     def next_id(self) -> int:
-        timestamp = int(time.time() * 1000)
+        with self._lock:
+            node_id = self._ensure_node_id()
+            timestamp, sequence, _ = self._allocate(1)
+        return ((timestamp - EPOCH) << 22) | (node_id << SEQUENCE_BITS) | sequence
 
-        if timestamp < self.last_timestamp:
-            raise ValueError("时钟回拨，无法生成ID")
+    def next_ids(self, count: int) -> list[int]:
+        """
+        批量生成 ID：同一毫秒内连续分配序列号，结果与逐个调用 next_id 一致
+        """
+        ranges: list[tuple[int, int]] = []
+        with self._lock:
+            node_id = self._ensure_node_id()
+            remaining = count
+            while remaining > 0:
+                timestamp, sequence, take = self._allocate(remaining)
+                base = ((timestamp - EPOCH) << 22) | (node_id << SEQUENCE_BITS) | sequence
+                ranges.append((base, take))
+                remaining -= take
+
+        ids: list[int] = []
+        for base, take in ranges:
+            ids.extend(range(base, base + take))
+        return ids
 
+    def _allocate(self, count: int) -> tuple[int, int, int]:
+        """在锁内分配当前毫秒的一段连续序列号，返回时间戳、起始序列号与分配数量"""
+        timestamp = self._current_timestamp()
         if timestamp == self.last_timestamp:
-            self.sequence = (self.sequence + 1) & 4095
-            if self.sequence == 0:
+            sequence = self.sequence + 1
+            if sequence > MAX_SEQUENCE:
                 timestamp = self.wait_next_millis(self.last_timestamp)
+                sequence = 0
         else:
-            self.sequence = 0
+            sequence = 0
 
+        take = min(count, MAX_SEQUENCE + 1 - sequence)
+        self.sequence = sequence + take - 1
         self.last_timestamp = timestamp
+        return timestamp, sequence, take
 
-        return ((timestamp - 1288834974657) << 22) | \
-               (self.datacenter_id << 17) | \
-               (self.worker_id << 12) | \
-               self.sequence
+    def _current_timestamp(self) -> int:
+        timestamp = _current_millis()
+        if timestamp < self.last_timestamp:
+            backward = self.last_timestamp - timestamp
+            if backward > MAX_CLOCK_BACKWARD_MS:
+                raise ValueError(f"时钟回拨 {backward}ms，无法生成ID")
+            # 小幅回拨（如 NTP 校时）时等待时钟追上上次的时间戳
+            timestamp = self._sleep_until(self.last_timestamp)
+        return timestamp
 
-    def wait_next_millis(self, last_timestamp):
-        timestamp = int(time.time() * 1000)
-        while timestamp <= last_timestamp:
-            timestamp = int(time.time() * 1000)
+    def wait_next_millis(self, last_timestamp: int) -> int:
+        """当前毫秒的序列号用完时休眠到下一毫秒，不空转占用 CPU"""
+        return self._sleep_until(last_timestamp + 1)
+
+    @staticmethod
+    def _sleep_until(target: int) -> int:
+        timestamp = _current_millis()
+        while timestamp < target:
+            time.sleep((target - timestamp) / 1000)
+            timestamp = _current_millis()
         return timestamp
 
-id_generator = SnowflakeGenerator(1, 1)
+    # ==================== 节点ID分配 ====================
+    def _ensure_node_id(self) -> int:
+        if self._node_id is None:
+            self._node_id, self.node_source = self._assign_node_id()
+            logger.info(f"雪花ID节点已分配: node_id={self._node_id}, source={self.node_source}, pid={os.getpid()}")
+        return self._node_id
+
+    def _assign_node_id(self) -> tuple[int, str]:
+        value = os.getenv(WORKER_ID_ENV)
+        if value:
+            node_id = int(value)
+            if not 0 <= node_id <= MAX_NODE_ID:
+                raise ValueError(f"{WORKER_ID_ENV} 必须在 0~{MAX_NODE_ID} 之间: {value}")
+            return node_id, "env"
+
+        try:
+            node_id = self._lease.acquire()
+        except Exception as e:
+            reason = f"无法通过 Redis 租用雪花ID节点: {e}"
+        else:
+            if node_id is not None:
+                atexit.register(self._lease.release)
+                return node_id, "redis"
+            reason = "Redis 中的雪花ID节点已全部被占用"
+
+        if os.getenv(MULTI_PROCESS_ENV) == "1":
+            raise RuntimeError(f"{reason}；多进程部署时按进程号分配的节点ID可能重复，"
+                               f"请为每个进程设置不同的 {WORKER_ID_ENV} 或保证 Redis 可用")
+        node_id = os.getpid() & MAX_NODE_ID
+        logger.warning(f"{reason}，使用进程号分配 node_id={node_id}；"
+                       f"该方式只适用于单进程部署，多个进程的进程号取模后可能相同而生成重复ID")
+        return node_id, "pid"
+
+    def _on_lease_lost(self) -> None:
+        # 下次生成ID时重新分配，新租到的 ID 与其它进程不冲突
+        with self._lock:
+            if self.node_source == "redis":
+                self._node_id = None
+
+    def _after_fork(self) -> None:
+        # fork 时可能有其它线程持有锁，子进程使用新锁；父进程的节点ID不能在子进程中继续使用
+        self._lock = threading.Lock()
+        self._lease.after_fork()
+        if not self._fixed:
+            self._node_id = None
+            self.node_source = ""
+
+
+id_generator = SnowflakeGenerator()
 
 
 if __name__ == "__main__":
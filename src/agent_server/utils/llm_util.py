@@ -2,6 +2,7 @@
 import typing as t
 #from typing import Literal, Any
 
+from types import MappingProxyType
 from urllib.parse import urlparse
 
 from langchain.tools import BaseTool
@@ -10,33 +11,156 @@ from langchain_community.embeddings import DashScopeEmbeddings
 
 from config.settings import Settings,PlatformConfig
 from utils.log_util import build_logger
+from agent_server.core.metrics import CacheStats
 
 
 logger = build_logger("llm-util")
 
+MODEL_TYPES = (
+    "llm",
+    "embed",
+    "rerank",
+    "text2image",
+    "image2image",
+    "image2text",
+    "speech2text",
+    "text2speech",
+)
+
+
+class ModelRegistry:
+    """
+    由 ModelSettings 快照构建的不可变模型索引，按模型名称、模型类型、平台类型预先建立索引，查询为字典查找
+    ModelSettings 重新加载后重建，不在每次查询时遍历平台配置
+    """
+
+    def __init__(self, model_settings: t.Any):
+        self.model_settings = model_settings
+        platform_configs: dict[str, PlatformConfig] = {}
+        platforms: dict[str, dict[str, t.Any]] = {}
+        for platform in model_settings.MODEL_PLATFORMS:
+            platform_configs.setdefault(platform.platform_type, platform)
+            platforms[platform.platform_type] = platform.model_dump()
+
+        # (model_type, platform_type) -> {model_name: model_info}，None 表示不限
+        index: dict[tuple[str | None, str | None], dict[str, t.Mapping[str, t.Any]]] = {}
+        # model_name -> 所有同名模型（按平台配置顺序）
+        by_name: dict[str, list[t.Mapping[str, t.Any]]] = {}
+        for m in platforms.values():
+            self._detect_platform_models(m)
+            for m_type in MODEL_TYPES:
+                models = m.get(f"{m_type}_models", [])
+                if models == "auto":
+                    logger.warning("you should not set `auto` without auto_detect_model=True")
+                    continue
+                elif not models:
+                    continue
+                for m_name in models:
+                    info = MappingProxyType({
+                        "platform_name": m.get("platform_name"),
+                        "platform_type": m.get("platform_type"),
+                        "model_type": m_type,
+                        "model_name": m_name,
+                        "api_base_url": m.get("api_base_url", ""),
+                        "api_key": m.get("api_key", ""),
+                        "api_proxy": m.get("api_proxy"),
+                    })
+                    by_name.setdefault(m_name, []).append(info)
+                    for key in ((None, None), (m_type, None), (None, info["platform_type"]), (m_type, info["platform_type"])):
+                        index.setdefault(key, {})[m_name] = info
+
+        self.platforms: t.Mapping[str, t.Mapping[str, t.Any]] = MappingProxyType(
+            {k: MappingProxyType(v) for k, v in platforms.items()})
+        self.platform_configs: t.Mapping[str, PlatformConfig] = MappingProxyType(platform_configs)
+        self.by_name: t.Mapping[str, tuple[t.Mapping[str, t.Any], ...]] = MappingProxyType(
+            {k: tuple(v) for k, v in by_name.items()})
+        self._index = {k: MappingProxyType(v) for k, v in index.items()}
+        self._empty: t.Mapping[str, t.Mapping[str, t.Any]] = MappingProxyType({})
+        self.default_llm = self._resolve_default("llm", model_settings.DEFAULT_LLM_MODEL)
+        self.default_embedding = self._resolve_default("embed", model_settings.DEFAULT_EMBEDDING_MODEL)
+
+    @staticmethod
+    def _detect_platform_models(m: dict[str, t.Any]) -> None:
+        if not m.get("auto_detect_model"):
+            return
+        # TODO：通过api请求，自动检测模型
+        platform_url = get_base_url(m.get("api_base_url"))
+        platform_models = detect_models(platform_url)
+        if not platform_models:
+            logger.warning(f"no models detected for platform {m.get('platform_type')}, using default models")
+        else:
+            logger.info(f"detected models for platform {m.get('platform_type')}: {platform_models}")
+            for m_type in MODEL_TYPES:
+                if m.get(f"{m_type}_models") != "auto":
+                    continue
+                m[f"{m_type}_models"] = platform_models.get(f"{m_type}_models", [])
+
+    def _resolve_default(self, model_type: str, default_model: str) -> str | None:
+        """默认模型不可用时使用该类型的第一个模型，只在构建时记录一次警告"""
+        available = list(self.models(model_type=model_type))
+        if not available:
+            return None
+        if default_model in available:
+            return default_model
+        logger.warning(f"default {model_type} model {default_model} is not found in available {model_type} models, "
+                       f"using {available[0]} instead")
+        return available[0]
+
+    def models(
+        self,
+        model_type: str | None = None,
+        platform_type: str | None = None,
+    ) -> t.Mapping[str, t.Mapping[str, t.Any]]:
+        return self._index.get((model_type, platform_type), self._empty)
+
+    def get(self, model_name: str, platform_type: str | None = None) -> t.Mapping[str, t.Any] | None:
+        if platform_type is None:
+            infos = self.by_name.get(model_name)
+            # 与按平台顺序覆盖的语义一致：同名模型取最后配置的平台
+            return infos[-1] if infos else None
+        return self.models(platform_type=platform_type).get(model_name)
+
+
+_registry: ModelRegistry | None = None
+# 模型索引的复用情况，未命中即配置重新加载后重建
+registry_cache_stats = CacheStats()
+
+
+def get_model_registry() -> ModelRegistry:
+    """获取当前 ModelSettings 快照对应的模型索引，配置重新加载后首次访问时重建"""
+    global _registry
+    registry = _registry
+    model_settings = Settings.model_settings
+    if registry is None or registry.model_settings is not model_settings:
+        registry_cache_stats.miss()
+        registry = _registry = ModelRegistry(model_settings)
+    else:
+        registry_cache_stats.hit()
+    return registry
+
+
+def _rebuild_model_registry(old, new) -> None:
+    # 在配置监视线程中提前重建，请求路径上不需要等待构建
+    global _registry
+    _registry = ModelRegistry(new)
+
+
+Settings.on_change("model_settings", _rebuild_model_registry)
+
+
 """获取默认聊天模型配置"""
 def get_default_llm():
-    available_llms = list(get_config_models(model_type="llm").keys())
-    if not available_llms:
+    default_llm = get_model_registry().default_llm
+    if default_llm is None:
         raise ValueError("No available llm models found in configuration.")
-    if Settings.model_settings.DEFAULT_LLM_MODEL in available_llms:
-        return Settings.model_settings.DEFAULT_LLM_MODEL
-    else:
-        logger.warning(f"default llm model {Settings.model_settings.DEFAULT_LLM_MODEL} is not found in available llms, "
-                       f"using {available_llms[0]} instead")
-        return available_llms[0]
+    return default_llm
 
 """获取默认嵌入模型配置"""
 def get_default_embedding():
-    available_embeddings = list(get_config_models(model_type="embed").keys())
-    if not available_embeddings:
+    default_embedding = get_model_registry().default_embedding
+    if default_embedding is None:
         raise ValueError("No available embedding models found in configuration.")
-    if Settings.model_settings.DEFAULT_EMBEDDING_MODEL in available_embeddings:
-        return Settings.model_settings.DEFAULT_EMBEDDING_MODEL
-    else:
-        logger.warning(f"default embedding model {Settings.model_settings.DEFAULT_EMBEDDING_MODEL} is not found in "
-                       f"available embeddings, using {available_embeddings[0]} instead")
-        return available_embeddings[0]
+    return default_embedding
 
    
 
@@ -48,15 +172,15 @@ def get_model_info(
 ) -> t.Any:
     """
     获取配置的模型信息，主要是 api_base_url, api_key
-    如果指定 multiple=True, 则返回所有重名模型；否则仅返回第一个
+    如果指定 multiple=True, 则返回所有重名模型；否则仅返回一个
+    返回值为只读映射
     """
-    result = get_config_models(model_name=model_name, platform_type=platform_type)
-    if result:
-        if multiple:
-            return list(result.values())
-        else:
-            return list(result.values())[0]
-    return None
+    registry = get_model_registry()
+    if multiple:
+        infos = [info for info in registry.by_name.get(model_name, ())
+                 if platform_type is None or info["platform_type"] == platform_type]
+        return infos or None
+    return registry.get(model_name, platform_type)
 
 """获取模型配置"""
 def get_config_models(
@@ -65,9 +189,9 @@ def get_config_models(
             "llm", "embed", "rerank", "text2image", "image2image", "image2text", "speech2text", "text2speech"
         ]] = None,
         platform_type: str = None,
-) -> dict[str, dict[str, t.Any]]:
+) -> t.Mapping[str, t.Mapping[str, t.Any]]:
     """
-    获取配置的模型列表，返回值为:
+    获取配置的模型列表，返回值为只读映射:
     {model_name: {
         "platform_name": xx,
         "platform_type": xx,
@@ -78,70 +202,22 @@ def get_config_models(
         "api_proxy": xx,
     }}
     """
-    result = {}
-    if model_type is None:
-        model_types = [
-            "llm_models",
-            "embed_models",
-            "rerank_models",
-            "text2image_models",
-            "image2image_models",
-            "image2text_models",
-            "speech2text_models",
-            "text2speech_models",
-        ]
-    else:
-        model_types = [f"{model_type}_models"]
-
-    for m in list(get_config_platforms().values()):
-        if platform_type is not None and platform_type != m.get("platform_type"):
-            continue
-
-        if m.get("auto_detect_model"):
-            # TODO：通过api请求，自动检测模型
-            platform_url = get_base_url(m.get("api_base_url"))
-            platform_models = detect_models(platform_url)
-            if not platform_models:
-                logger.warning(f"no models detected for platform {m.get('platform_type')}, using default models")
-            else:
-                logger.info(f"detected models for platform {m.get('platform_type')}: {platform_models}")
-                for m_type in model_types:
-                    if m.get(m_type) != "auto":
-                        continue
-                    m[m_type] = platform_models.get(m_type, [])
-
-        for m_type in model_types:
-            models = m.get(m_type, [])
-            if models == "auto":
-                logger.warning("you should not set `auto` without auto_detect_model=True")
-                continue
-            elif not models:
-                continue
-            for m_name in models:
-                if model_name is None or model_name == m_name:
-                    result[m_name] = {
-                        "platform_name": m.get("platform_name"),
-                        "platform_type": m.get("platform_type"),
-                        "model_type": m_type.split("_")[0],
-                        "model_name": m_name,
-                        "api_base_url": m.get("api_base_url", ""),
-                        "api_key": m.get("api_key", ""),
-                        "api_proxy": m.get("api_proxy"),
-                    }
-    return result
+    models = get_model_registry().models(model_type=model_type, platform_type=platform_type)
+    if model_name is None:
+        return models
+    info = models.get(model_name)
+    return MappingProxyType({model_name: info} if info is not None else {})
 
 
 """
 获取配置的模型平台，会将 pydantic model 转换为字典。
 """
-def get_config_platforms() -> dict[str, dict[str, t.Any]]:
-    platforms = [m.model_dump() for m in Settings.model_settings.MODEL_PLATFORMS]
-    return {m["platform_type"]: m for m in platforms}
+def get_config_platforms() -> t.Mapping[str, t.Mapping[str, t.Any]]:
+    return get_model_registry().platforms
 
 """获取指定平台的配置"""
 def get_platform_config(platform_type: str) -> PlatformConfig | None:
-    platform_config = [x for x in Settings.model_settings.MODEL_PLATFORMS if x.platform_type == platform_type]
-    return platform_config[0] if platform_config else None
+    return get_model_registry().platform_configs.get(platform_type)
     
 """获取模型请求的基础 URL"""
 def get_base_url(url: t.Optional[str]) -> str:
@@ -11,6 +11,9 @@ from config.settings import Settings
 
 
 def _filter_logs(record: dict) -> bool:
+    # 对话记录只写入独立的对话记录文件
+    if record["extra"].get("transcript"):
+        return False
     # hide debug logs if Settings.basic_settings.log_verbose=False 
     if record["level"].no <= 10 and not Settings.basic_settings.log_verbose:
         return False
@@ -43,11 +46,39 @@ def build_logger(log_file: str = "chat"):
             log_file = f"{log_file}.log"
         if not os.path.isabs(log_file):
             log_file = str((Settings.basic_settings.LOG_PATH / log_file).resolve())
-        logger.add(log_file, colorize=False, filter=_filter_logs)
+        # enqueue=True：日志由后台线程写入文件，请求处理线程不阻塞在磁盘 I/O 上
+        logger.add(log_file, colorize=False, filter=_filter_logs, enqueue=True)
 
     return logger
 
 
+@cached(max_size=10, algorithm=CachingAlgorithmFlag.LRU)
+def build_transcript_logger(log_file: str = "chat-transcript"):
+    """
+    build a logger for structured chat transcripts, one JSON line per record, for example:
+
+    transcript_logger = build_transcript_logger()
+    transcript_logger.info(json_line)
+
+    records only go to the transcript file and are written by a background thread
+    """
+    if not log_file.endswith(".jsonl"):
+        log_file = f"{log_file}.jsonl"
+    if not os.path.isabs(log_file):
+        log_file = str((Settings.basic_settings.LOG_PATH / log_file).resolve())
+
+    loguru.logger.add(
+        log_file,
+        format="{message}",
+        colorize=False,
+        filter=lambda record: record["extra"].get("transcript") == log_file,
+        enqueue=True,
+        rotation=Settings.basic_settings.CHAT_TRANSCRIPT_ROTATION,
+        encoding="utf-8",
+    )
+    return loguru.logger.bind(transcript=log_file)
+
+
 logger = logging.getLogger(__name__)
 
 
@@ -0,0 +1,73 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+"""
+进程内共享的进程池
+
+文档分割、PDF 解析等 CPU 密集型任务统一提交到同一个进程池，避免每次调用都重新创建子进程。
+进程池使用 spawn 方式启动子进程：API 进程中存在事件循环线程和数据库连接池，fork 会把这些状态复制到子进程中。
+"""
+
+_executor: ProcessPoolExecutor | None = None
+_executor_workers: int = 0
+_lock = threading.Lock()
+
+
+def get_cpu_count() -> int:
+    """获取当前进程可用的 CPU 核数（考虑 CPU 亲和性/容器限制）"""
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def get_process_pool(max_workers: int = 0) -> ProcessPoolExecutor:
+    """
+    获取共享进程池，首次调用时创建
+
+    Args:
+        max_workers: 进程数，0 表示使用 CPU 核数；进程池创建后不再随该参数变化
+    """
+    global _executor, _executor_workers
+    if _executor is not None:
+        return _executor
+
+    with _lock:
+        if _executor is None:
+            _executor_workers = max_workers if max_workers > 0 else get_cpu_count()
+            _executor = ProcessPoolExecutor(
+                max_workers=_executor_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _executor
+
+
+def get_process_pool_workers() -> int:
+    """获取共享进程池的进程数，未创建时返回 0"""
+    return _executor_workers if _executor is not None else 0
+
+
+def shutdown_process_pool(wait: bool = True) -> None:
+    """关闭共享进程池"""
+    global _executor, _executor_workers
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait, cancel_futures=True)
+            _executor = None
+            _executor_workers = 0
+
+
+def _reset_after_fork() -> None:
+    # fork 出的子进程（如 uvicorn 多 worker）不能复用父进程的进程池
+    global _executor, _executor_workers, _lock
+    _executor = None
+    _executor_workers = 0
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(shutdown_process_pool, wait=False)
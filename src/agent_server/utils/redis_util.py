@@ -0,0 +1,58 @@
+import os
+import threading
+
+import redis
+
+from agent_server.config.settings import Settings
+
+
+"""
+进程内共享的 Redis 连接池
+
+聊天历史等同步 Redis 访问统一使用同一个连接池，避免每轮对话都创建新的连接池与 TCP 连接。
+连接池在首次使用时创建（即 worker 进程 fork 之后），fork 出的子进程丢弃父进程的连接池。
+连接数达到 REDIS_MAX_CONNECTIONS 时，新的请求最多等待 REDIS_POOL_TIMEOUT 秒获取空闲连接，而不是立即失败。
+"""
+
+_pool: redis.BlockingConnectionPool | None = None
+_lock = threading.Lock()
+
+
+def get_redis_pool() -> redis.BlockingConnectionPool:
+    """获取共享的 Redis 连接池，首次调用时按 REDIS_URL 创建"""
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _lock:
+        if _pool is None:
+            _pool = redis.BlockingConnectionPool.from_url(
+                Settings.basic_settings.REDIS_URL,
+                max_connections=Settings.basic_settings.REDIS_MAX_CONNECTIONS,
+                timeout=Settings.basic_settings.REDIS_POOL_TIMEOUT,
+            )
+    return _pool
+
+
+def get_redis_client() -> redis.Redis:
+    """获取使用共享连接池的 Redis 客户端，客户端本身很轻量，可按需创建"""
+    return redis.Redis(connection_pool=get_redis_pool())
+
+
+def close_redis_pool() -> None:
+    """关闭共享连接池"""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.disconnect()
+            _pool = None
+
+
+def _reset_after_fork() -> None:
+    # 子进程不能复用父进程的连接，丢弃连接池后在首次使用时重新创建
+    global _pool, _lock
+    _pool = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+
+
+"""
+服务冷启动分析
+
+在子进程中导入应用模块（默认 agent_server.main），记录导入耗时、峰值内存（RSS）与已加载的模块，
+可选地使用 python -X importtime 输出按累计耗时排序的导入树，用于定位拖慢启动的模块。
+
+    python -m agent_server.utils.startup_profile --min-ms 20 --depth 4
+"""
+
+# 只在使用时才应导入的重量级模块，出现在启动阶段说明有模块在导入时加载了它们
+DEFERRED_MODULES: tuple[str, ...] = (
+    "torch",
+    "FlagEmbedding",
+    "pandas",
+    "nltk",
+    "langchain_experimental",
+    "tiktoken",
+    "turtle",
+)
+
+# 子进程输出结果时使用的前缀，避免与应用导入时打印的内容混淆
+_RESULT_MARKER = "__startup_profile__:"
+
+# 使用 __import__ 而不是 importlib.import_module：后者走纯 Python 的导入路径，-X importtime 不会记录被导入的模块本身
+_CHILD_CODE = """
+import json, resource, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(sys.argv[2] + json.dumps({"import_seconds": elapsed, "max_rss": rss, "modules": sorted(sys.modules)}), flush=True)
+"""
+
+
+@dataclass
+class ImportNode:
+    """导入树节点，耗时单位为微秒"""
+    name: str
+    self_us: int
+    cumulative_us: int
+    children: list["ImportNode"] = field(default_factory=list)
+
+
+@dataclass
+class StartupProfile:
+    module: str
+    wall_seconds: float  # 含解释器启动的子进程总耗时
+    import_seconds: float  # 导入应用模块的耗时
+    max_rss_mb: float
+    modules: list[str]
+    imports: list[ImportNode] = field(default_factory=list)
+
+    @property
+    def loaded_deferred_modules(self) -> list[str]:
+        """启动阶段被加载的重量级模块"""
+        loaded = set(self.modules)
+        return [name for name in DEFERRED_MODULES if name in loaded]
+
+
+def parse_importtime(output: str) -> list[ImportNode]:
+    """
+    解析 python -X importtime 的输出，返回顶层模块组成的导入树
+
+    每行格式为 "import time: <self> | <cumulative> | <缩进><模块名>"，子模块先于父模块输出，缩进每级两个空格
+    """
+    pending: dict[int, list[ImportNode]] = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|", 2)
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # 表头
+        raw_name = parts[2][1:]
+        level = (len(raw_name) - len(raw_name.lstrip(" "))) // 2
+        node = ImportNode(
+            name=raw_name.strip(),
+            self_us=int(parts[0]),
+            cumulative_us=int(parts[1]),
+            children=pending.pop(level + 1, []),
+        )
+        pending.setdefault(level, []).append(node)
+    return pending.get(0, [])
+
+
+def render_tree(nodes: list[ImportNode], min_ms: float = 1.0, max_depth: int | None = None) -> str:
+    """按累计耗时从高到低输出导入树，忽略累计耗时低于 min_ms 的模块"""
+    lines = [f"{'cumulative(ms)':>14} {'self(ms)':>9}  module"]
+
+    def _walk(items: list[ImportNode], depth: int) -> None:
+        for node in sorted(items, key=lambda n: n.cumulative_us, reverse=True):
+            if node.cumulative_us / 1000 < min_ms:
+                continue
+            lines.append(f"{node.cumulative_us / 1000:>14.1f} {node.self_us / 1000:>9.1f}  {'  ' * depth}{node.name}")
+            if max_depth is None or depth + 1 < max_depth:
+                _walk(node.children, depth + 1)
+
+    _walk(nodes, 0)
+    return "\n".join(lines)
+
+
+def measure_cold_start(
+    module: str = "agent_server.main",
+    importtime: bool = False,
+    env: dict[str, str] | None = None,
+    cwd: str | None = None,
+    timeout: float = 300,
+) -> StartupProfile:
+    """
+    在新的解释器进程中导入 module 并测量冷启动开销
+
+    Args:
+        module: 要导入的模块
+        importtime: 是否同时采集导入树，开启后导入耗时会略有增加
+        env: 子进程环境变量，默认继承当前进程
+        cwd: 子进程工作目录
+        timeout: 子进程超时时间（秒）
+    """
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", _CHILD_CODE, module, _RESULT_MARKER]
+
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env, cwd=cwd, timeout=timeout)
+    wall_seconds = time.perf_counter() - start
+
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(_RESULT_MARKER):
+            result = json.loads(line[len(_RESULT_MARKER):])
+    if proc.returncode != 0 or result is None:
+        # -X importtime 的输出与异常堆栈都在 stderr 中，只保留末尾的堆栈
+        stderr = "\n".join(line for line in proc.stderr.splitlines() if not line.startswith("import time:"))
+        raise RuntimeError(f"导入 {module} 失败（退出码 {proc.returncode}）:\n{stderr[-4000:]}")
+
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    rss_bytes = result["max_rss"] if sys.platform == "darwin" else result["max_rss"] * 1024
+    return StartupProfile(
+        module=module,
+        wall_seconds=wall_seconds,
+        import_seconds=result["import_seconds"],
+        max_rss_mb=rss_bytes / 1024 / 1024,
+        modules=result["modules"],
+        imports=parse_importtime(proc.stderr) if importtime else [],
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="分析服务冷启动的导入耗时与内存占用")
+    parser.add_argument("--module", default="agent_server.main", help="要导入的模块")
+    parser.add_argument("--min-ms", type=float, default=10.0, help="导入树中忽略累计耗时低于该值的模块")
+    parser.add_argument("--depth", type=int, default=4, help="导入树的最大展示层数")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出汇总结果，不输出导入树")
+    args = parser.parse_args(argv)
+
+    profile = measure_cold_start(args.module, importtime=not args.json, env=dict(os.environ))
+    summary = {
+        "module": profile.module,
+        "wall_seconds": round(profile.wall_seconds, 3),
+        "import_seconds": round(profile.import_seconds, 3),
+        "max_rss_mb": round(profile.max_rss_mb, 1),
+        "loaded_modules": len(profile.modules),
+        "loaded_deferred_modules": profile.loaded_deferred_modules,
+    }
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False))
+        return 0
+
+    print(render_tree(profile.imports, min_ms=args.min_ms, max_depth=args.depth))
+    print()
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
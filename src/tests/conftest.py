@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 把 src 加入 sys.path，测试中使用 agent_server.xxx 导入被测模块
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
@@ -0,0 +1,132 @@
+"""
+聊天记录批量写入单元测试
+
+测试缓冲、按条数/时间写入、暂时性错误重试、不可重试错误与重试上限，以及关闭时写入
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from agent_server.app.chat import chat_message_writer as writer_module
+from agent_server.app.chat.chat_message_writer import ChatMessageWriter
+from agent_server.config.settings import Settings
+
+
+@asynccontextmanager
+async def _fake_uow(*args, **kwargs):
+    yield None
+
+
+@pytest.fixture
+def repositories():
+    """替换会话与聊天记录仓库，记录每次批量写入的内容"""
+    with patch.object(writer_module, "chat_conversation_repository") as conversation_repo, \
+            patch.object(writer_module, "chat_message_repository") as message_repo, \
+            patch.object(writer_module, "uow", _fake_uow):
+        conversation_repo.create_if_absent = AsyncMock(return_value=None)
+        message_repo.bulk_create = AsyncMock(side_effect=lambda objs_in: list(range(len(objs_in))))
+        yield conversation_repo, message_repo
+
+
+def _db_down() -> OperationalError:
+    return OperationalError("INSERT INTO chat_message", {}, ConnectionRefusedError("db down"))
+
+
+def _submit(writer: ChatMessageWriter, n: int, conversation_id: int = 1):
+    for i in range(n):
+        writer.submit(conversation_id=conversation_id, question=f"q{i}", answer=f"a{i}")
+
+
+class TestChatMessageWriter:
+    """测试ChatMessageWriter类"""
+
+    @pytest.mark.asyncio
+    async def test_flush_on_rows(self, repositories):
+        """测试缓冲区达到条数上限时立即写入一批"""
+        _, message_repo = repositories
+        writer = ChatMessageWriter()
+        with patch.object(Settings.db_settings, "CHAT_MESSAGE_FLUSH_ROWS", 5), \
+                patch.object(Settings.db_settings, "CHAT_MESSAGE_FLUSH_INTERVAL_MS", 60000):
+            _submit(writer, 5)
+            await asyncio.sleep(0.05)
+            assert message_repo.bulk_create.await_count == 1
+            assert len(message_repo.bulk_create.await_args.kwargs["objs_in"]) == 5
+            await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_flush_on_interval(self, repositories):
+        """测试未达到条数上限时按时间间隔写入"""
+        conversation_repo, message_repo = repositories
+        writer = ChatMessageWriter()
+        with patch.object(Settings.db_settings, "CHAT_MESSAGE_FLUSH_ROWS", 100), \
+                patch.object(Settings.db_settings, "CHAT_MESSAGE_FLUSH_INTERVAL_MS", 20):
+            _submit(writer, 3)
+            await asyncio.sleep(0.1)
+            assert message_repo.bulk_create.await_count == 1
+            # 同一会话在一批中只提交一次 upsert
+            assert conversation_repo.create_if_absent.await_count == 1
+            await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_retry_after_failure(self, repositories):
+        """测试暂时性错误时记录保留在缓冲区中"""
+        _, message_repo = repositories
+        message_repo.bulk_create.side_effect = _db_down()
+        writer = ChatMessageWriter()
+        _submit(writer, 2)
+        assert await writer.flush() == 0
+        message_repo.bulk_create.side_effect = lambda objs_in: list(range(len(objs_in)))
+        assert await writer.flush() == 2
+        await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_non_transient_error_dropped(self, repositories):
+        """测试不可重试的错误直接丢弃本批记录，不影响之后提交的记录"""
+        _, message_repo = repositories
+        message_repo.bulk_create.side_effect = IntegrityError("INSERT INTO chat_message", {}, ValueError("bad row"))
+        writer = ChatMessageWriter()
+        _submit(writer, 2)
+        assert await writer.flush() == 0
+        assert await writer.flush() == 0
+        assert message_repo.bulk_create.await_count == 1
+
+        message_repo.bulk_create.side_effect = lambda objs_in: list(range(len(objs_in)))
+        _submit(writer, 1)
+        assert await writer.flush() == 1
+        await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_retry_limit(self, repositories):
+        """测试每条记录超过最大写入次数后丢弃，后提交的记录仍可继续重试"""
+        _, message_repo = repositories
+        message_repo.bulk_create.side_effect = _db_down()
+        writer = ChatMessageWriter()
+        with patch.object(Settings.db_settings, "CHAT_MESSAGE_MAX_ATTEMPTS", 3):
+            _submit(writer, 2, conversation_id=1)
+            assert await writer.flush() == 0
+            assert await writer.flush() == 0
+            _submit(writer, 1, conversation_id=2)
+            # 第三次失败后会话 1 的记录被丢弃，会话 2 的记录只失败了一次
+            assert await writer.flush() == 0
+            assert await writer.flush() == 0
+            assert message_repo.bulk_create.await_count == 4
+            assert [len(call.kwargs["objs_in"]) for call in message_repo.bulk_create.await_args_list] == [2, 2, 3, 1]
+
+            message_repo.bulk_create.side_effect = lambda objs_in: list(range(len(objs_in)))
+            assert await writer.flush() == 1
+        await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_remaining(self, repositories):
+        """测试关闭时写入剩余记录"""
+        _, message_repo = repositories
+        writer = ChatMessageWriter()
+        with patch.object(Settings.db_settings, "CHAT_MESSAGE_FLUSH_INTERVAL_MS", 60000):
+            _submit(writer, 3)
+            await writer.stop()
+        assert sum(len(call.kwargs["objs_in"]) for call in message_repo.bulk_create.await_args_list) == 3
+        assert not writer.running
@@ -0,0 +1,34 @@
+"""
+Chat 路由单元测试
+
+测试非流式请求返回完整回答
+"""
+
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agent_server.api.v1 import chat_routes
+
+
+def test_non_streaming_returns_full_answer():
+    """非流式请求拼接全部片段，并消费完生成器"""
+    consumed = []
+
+    async def fake_chat_async(data):
+        for chunk in ["你好", "，", "世界"]:
+            yield chunk
+        consumed.append(data.conversation_id)
+
+    app = FastAPI()
+    app.include_router(chat_routes.router)
+    with patch.object(chat_routes, "chat_async", fake_chat_async):
+        response = TestClient(app).post(
+            "/chat/completions",
+            json={"input": "问题", "streaming": False, "conversation_id": "42"},
+        )
+
+    assert response.status_code == 200
+    assert response.json() == {"content": "你好，世界", "conversation_id": "42"}
+    assert consumed == ["42"]
@@ -0,0 +1,120 @@
+"""
+对话记录单元测试
+
+测试采样、出错对话始终记录，以及问题与回答的截断
+"""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from langchain_core.documents import Document
+
+from agent_server.app.chat import chat_transcript
+from agent_server.app.chat.chat_transcript import ChatTranscript
+from agent_server.config.settings import Settings
+
+
+@pytest.fixture
+def records():
+    """替换对话记录日志，收集写入的记录"""
+    written = []
+    transcript_logger = SimpleNamespace(info=lambda line: written.append(json.loads(line)))
+    with patch.object(chat_transcript, "build_transcript_logger", lambda: transcript_logger):
+        yield written
+
+
+def make_transcript(random_value: float = 0.0, sample_rate: float = 1.0, max_chars: int = 2000,
+                    enabled: bool = True, input: str = "问题") -> ChatTranscript:
+    basic_settings = Settings.basic_settings
+    with patch.object(basic_settings, "CHAT_TRANSCRIPT_ENABLED", enabled), \
+            patch.object(basic_settings, "CHAT_TRANSCRIPT_SAMPLE_RATE", sample_rate), \
+            patch.object(basic_settings, "CHAT_TRANSCRIPT_MAX_CHARS", max_chars), \
+            patch.object(basic_settings, "CHAT_TOKEN_TRACE", False), \
+            patch.object(chat_transcript, "random", SimpleNamespace(random=lambda: random_value)):
+        return ChatTranscript("c-1", input, model_provider="openai", model_name="gpt-test")
+
+
+class TestSampling:
+    def test_sampled_turn_written_once(self, records):
+        transcript = make_transcript()
+        for chunk in ["你好", "，", "世界"]:
+            transcript.add_chunk(chunk)
+        transcript.set_sources([Document(page_content="x", metadata={"source": "a.pdf", "page": 2})])
+        transcript.finish()
+
+        assert len(records) == 1
+        record = records[0]
+        assert record["conversation_id"] == "c-1"
+        assert record["input"] == "问题"
+        assert record["answer"] == "你好，世界"
+        assert record["chunks"] == 3
+        assert record["answer_chars"] == 5
+        assert record["status"] == "ok"
+        assert record["sources"] == [{"source": "a.pdf", "page": 2, "start_index": None}]
+
+    def test_unsampled_turn_skipped(self, records):
+        transcript = make_transcript(random_value=0.5, sample_rate=0.1)
+        assert not transcript.sampled
+        transcript.add_chunk("回答")
+        transcript.finish()
+        assert records == []
+        # 未采样的对话不保留回答内容，只统计长度
+        assert transcript.answer == ""
+        assert transcript.answer_chars == 2
+
+    def test_sample_rate_boundary(self):
+        assert make_transcript(random_value=0.09, sample_rate=0.1).sampled
+        assert not make_transcript(random_value=0.1, sample_rate=0.1).sampled
+        assert not make_transcript(random_value=0.0, sample_rate=0.0).sampled
+
+    def test_error_always_written(self, records):
+        transcript = make_transcript(random_value=0.5, sample_rate=0.1)
+        transcript.add_chunk("部分回答")
+        transcript.finish(error=RuntimeError("model down"))
+        assert len(records) == 1
+        assert records[0]["status"] == "error"
+        assert records[0]["error"] == "RuntimeError('model down')"
+        assert records[0]["answer_chars"] == 4
+
+    def test_disabled(self, records):
+        transcript = make_transcript(enabled=False)
+        transcript.add_chunk("回答")
+        transcript.finish(error=RuntimeError("model down"))
+        assert records == []
+
+
+class TestTruncation:
+    def test_input_and_answer_truncated(self, records):
+        transcript = make_transcript(max_chars=5, input="a" * 8)
+        for _ in range(4):
+            transcript.add_chunk("bcd")
+        transcript.finish()
+
+        record = records[0]
+        assert record["input"] == "aaaaa...(truncated 3 chars)"
+        assert record["answer"] == "bcdbc...(truncated 7 chars)"
+        assert record["answer_chars"] == 12
+
+    def test_answer_kept_only_up_to_limit(self):
+        transcript = make_transcript(max_chars=5)
+        for _ in range(100):
+            transcript.add_chunk("bcd")
+        # 超过上限后的片段不再保留在内存中
+        assert transcript.answer == "bcdbcd"
+        assert transcript.chunk_count == 100
+
+    def test_no_limit(self, records):
+        transcript = make_transcript(max_chars=0, input="a" * 3000)
+        transcript.set_answer("b" * 3000)
+        transcript.finish()
+        assert records[0]["input"] == "a" * 3000
+        assert records[0]["answer"] == "b" * 3000
+
+    def test_short_text_unchanged(self, records):
+        transcript = make_transcript(max_chars=5, input="abc")
+        transcript.set_answer("abcde")
+        transcript.finish()
+        assert records[0]["input"] == "abc"
+        assert records[0]["answer"] == "abcde"
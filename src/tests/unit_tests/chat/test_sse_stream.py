@@ -0,0 +1,104 @@
+"""
+SSE 流式输出单元测试
+
+测试 token 合并窗口和 SSE 帧编码
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from agent_server.app.chat.sse_stream import coalesce_chunks, encode_sse, sse_stream
+
+
+async def _produce(chunks, delay: float = 0.0):
+    for chunk in chunks:
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk
+
+
+async def _collect(aiter):
+    return [item async for item in aiter]
+
+
+class TestEncodeSse:
+    """测试SSE帧编码"""
+
+    def test_frame_format(self):
+        """测试帧格式及中文不转义"""
+        frame = encode_sse({"content": "你好", "conversation_id": "1"})
+        assert frame.startswith(b"data: ")
+        assert frame.endswith(b"\n\n")
+        assert json.loads(frame[len(b"data: "):].decode("utf-8")) == {"content": "你好", "conversation_id": "1"}
+
+    def test_event_name(self):
+        """测试带事件名的帧"""
+        frame = encode_sse({"content": "x"}, event="message")
+        assert frame.startswith(b"event: message\ndata: ")
+
+
+class TestCoalesceChunks:
+    """测试token合并"""
+
+    @pytest.mark.asyncio
+    async def test_burst_is_merged(self):
+        """测试同一窗口内到达的token被合并，内容和顺序不变"""
+        tokens = [f"t{i} " for i in range(10)]
+        merged = await _collect(coalesce_chunks(_produce(tokens), window_ms=50, max_bytes=1024))
+        assert "".join(merged) == "".join(tokens)
+        assert len(merged) < len(tokens)
+
+    @pytest.mark.asyncio
+    async def test_max_bytes_flush(self):
+        """测试累计字节数达到上限时立即发送"""
+        tokens = ["abcd"] * 8
+        merged = await _collect(coalesce_chunks(_produce(tokens), window_ms=1000, max_bytes=8))
+        assert "".join(merged) == "".join(tokens)
+        assert all(len(item.encode("utf-8")) <= 8 for item in merged)
+
+    @pytest.mark.asyncio
+    async def test_slow_tokens_not_delayed(self):
+        """测试token间隔大于窗口时逐个发送"""
+        tokens = ["a", "b", "c"]
+        merged = await _collect(coalesce_chunks(_produce(tokens, delay=0.03), window_ms=5, max_bytes=64))
+        assert merged == tokens
+
+    @pytest.mark.asyncio
+    async def test_disabled_window(self):
+        """测试窗口为0时不合并"""
+        tokens = ["a", "b", "c"]
+        merged = await _collect(coalesce_chunks(_produce(tokens), window_ms=0))
+        assert merged == tokens
+
+    @pytest.mark.asyncio
+    async def test_error_after_flush(self):
+        """测试生产端异常在已合并内容发送后抛出"""
+        async def _failing():
+            yield "a"
+            yield "b"
+            raise ValueError("boom")
+
+        received = []
+        with pytest.raises(ValueError):
+            async for item in coalesce_chunks(_failing(), window_ms=50, max_bytes=1024):
+                received.append(item)
+        assert "".join(received) == "ab"
+
+
+class TestSseStream:
+    """测试SSE输出"""
+
+    @pytest.mark.asyncio
+    async def test_frames(self):
+        """测试输出帧可被前端按 data: 行解析"""
+        frames = await _collect(sse_stream(_produce(["你", "好"]), "42", window_ms=20, max_bytes=64))
+        body = b"".join(frames).decode("utf-8")
+        contents = [
+            json.loads(line[len("data:"):])
+            for line in body.split("\n")
+            if line.startswith("data:")
+        ]
+        assert "".join(item["content"] for item in contents) == "你好"
+        assert all(item["conversation_id"] == "42" for item in contents)
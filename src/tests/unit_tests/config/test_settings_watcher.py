@@ -0,0 +1,107 @@
+"""
+配置监视单元测试
+
+测试配置文件修改后发布新的配置快照并调用变更回调
+"""
+
+import os
+
+import pytest
+
+from agent_server.config.pydantic_settings import (
+    BaseFileSettings,
+    SettingsConfigDict,
+    SettingsHolder,
+    SettingsWatcher,
+    settings_property,
+)
+
+
+@pytest.fixture
+def settings_cls(tmp_path):
+    """使用临时 yaml 文件的配置类"""
+    yaml_file = tmp_path / "demo_settings.yaml"
+    yaml_file.write_text("VALUE: 1\n", encoding="utf-8")
+
+    class DemoSettings(BaseFileSettings):
+        model_config = SettingsConfigDict(yaml_file=yaml_file)
+        VALUE: int = 0
+
+    return DemoSettings, yaml_file
+
+
+def touch(path, content: str):
+    """写入内容并推进修改时间，避免文件系统时间精度导致检测不到变化"""
+    stat = os.stat(path)
+    path.write_text(content, encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestSettingsHolder:
+    """测试配置快照"""
+
+    def test_reload_publishes_new_snapshot(self, settings_cls):
+        """测试配置文件修改后发布新的快照，旧快照不被修改"""
+        cls, yaml_file = settings_cls
+        holder = SettingsHolder(cls())
+        old = holder.current
+        changes = []
+        holder.add_callback(lambda o, n: changes.append((o.VALUE, n.VALUE)))
+
+        assert holder.reload_if_changed() is False
+        touch(yaml_file, "VALUE: 2\n")
+        assert holder.reload_if_changed() is True
+
+        assert holder.current is not old
+        assert old.VALUE == 1
+        assert holder.current.VALUE == 2
+        assert changes == [(1, 2)]
+        assert holder.reload_if_changed() is False
+
+    def test_invalid_file_keeps_snapshot(self, settings_cls):
+        """测试配置文件无效时保留当前快照"""
+        cls, yaml_file = settings_cls
+        holder = SettingsHolder(cls())
+        touch(yaml_file, "VALUE: not-a-number\n")
+
+        assert holder.reload_if_changed() is False
+        assert holder.current.VALUE == 1
+
+    def test_auto_reload_disabled(self, settings_cls):
+        """测试关闭自动加载时不重新加载"""
+        cls, yaml_file = settings_cls
+        holder = SettingsHolder(cls())
+        holder.current.auto_reload = False
+        touch(yaml_file, "VALUE: 3\n")
+
+        assert holder.reload_if_changed() is False
+        assert holder.current.VALUE == 1
+
+
+class TestSettingsWatcher:
+    """测试配置监视线程"""
+
+    def test_property_reads_current_snapshot(self, settings_cls):
+        """测试配置属性读取当前快照，监视线程检测到修改后自动重新加载"""
+        cls, yaml_file = settings_cls
+        watcher = SettingsWatcher(interval=0)
+
+        class Container:
+            demo = settings_property(cls())
+
+        holder = Container.__dict__["demo"].holder
+        watcher.register(holder)
+        container = Container()
+        assert container.demo is container.demo
+
+        touch(yaml_file, "VALUE: 5\n")
+        assert watcher.check_now() == ["DemoSettings"]
+        assert container.demo.VALUE == 5
+
+    def test_thread_start_stop(self):
+        """测试监视线程启动与停止"""
+        watcher = SettingsWatcher(interval=0.01)
+        watcher.start()
+        assert watcher._thread.is_alive()
+        watcher.stop()
+        assert watcher._thread is None
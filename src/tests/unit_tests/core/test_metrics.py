@@ -0,0 +1,130 @@
+"""
+指标单元测试
+
+测试 Counter/Gauge/Histogram 的 Prometheus 文本导出、缓存命中率与请求耗时中间件
+"""
+
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agent_server.core.metrics import (
+    CacheStats,
+    MetricsMiddleware,
+    MetricsRegistry,
+    HTTP_REQUEST_DURATION,
+    metrics_registry,
+    register_cache,
+)
+from agent_server.utils import llm_util
+
+
+class TestMetricsRegistry:
+    """测试指标注册与导出"""
+
+    def test_counter_and_gauge(self):
+        """测试计数器与瞬时值导出"""
+        registry = MetricsRegistry()
+        counter = registry.counter("test_requests_total", "请求数", ("route",))
+        gauge = registry.gauge("test_in_flight", "进行中", ("platform",))
+        counter.inc(route="/a")
+        counter.inc(2, route="/a")
+        with gauge.track_inprogress(platform="deepseek"):
+            assert gauge.get(platform="deepseek") == 1
+        assert gauge.get(platform="deepseek") == 0
+
+        text = registry.render()
+        assert "# TYPE test_requests_total counter" in text
+        assert 'test_requests_total{route="/a"} 3' in text
+        assert 'test_in_flight{platform="deepseek"} 0' in text
+
+    def test_histogram_cumulative_buckets(self):
+        """测试直方图导出为累计分桶"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("test_latency_seconds", "耗时", ("op",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value, op="q")
+
+        text = registry.render()
+        assert 'test_latency_seconds_bucket{op="q",le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{op="q",le="1"} 3' in text
+        assert 'test_latency_seconds_bucket{op="q",le="+Inf"} 4' in text
+        assert 'test_latency_seconds_count{op="q"} 4' in text
+        assert 'test_latency_seconds_sum{op="q"} 6.05' in text
+
+    def test_label_mismatch(self):
+        """测试标签与定义不一致时报错"""
+        registry = MetricsRegistry()
+        counter = registry.counter("test_total", "计数", ("a",))
+        with pytest.raises(ValueError):
+            counter.inc(b="x")
+
+    def test_register_returns_existing(self):
+        """测试重复注册同名指标时复用已有指标"""
+        registry = MetricsRegistry()
+        first = registry.counter("test_total", "计数")
+        assert registry.counter("test_total", "计数") is first
+        with pytest.raises(ValueError):
+            registry.gauge("test_total", "计数")
+
+    def test_collector(self):
+        """测试采集函数的导出与异常隔离"""
+        registry = MetricsRegistry()
+        registry.register_collector("ok", lambda: [("test_pool_size", "gauge", "大小", [({"engine": "async"}, 10)])])
+        registry.register_collector("broken", lambda: 1 / 0)
+
+        text = registry.render()
+        assert 'test_pool_size{engine="async"} 10' in text
+        assert "collector broken failed" in text
+
+
+class TestCacheMetrics:
+    """测试缓存命中率导出"""
+
+    def test_cache_stats(self):
+        """测试自行实现的缓存的命中统计导出"""
+        stats = CacheStats()
+        stats.miss()
+        for _ in range(3):
+            stats.hit()
+        register_cache("test_cache", stats)
+
+        text = metrics_registry.render()
+        assert 'cache_hits_total{cache="test_cache"} 3' in text
+        assert 'cache_misses_total{cache="test_cache"} 1' in text
+        assert 'cache_hit_ratio{cache="test_cache"} 0.75' in text
+
+    def test_model_registry_stats(self):
+        """测试模型索引复用计为命中，配置快照变化后重建计为未命中"""
+        llm_util.get_model_registry()
+        hits, misses = llm_util.registry_cache_stats.cache_info()
+        llm_util.get_model_registry()
+        assert llm_util.registry_cache_stats.cache_info() == (hits + 1, misses)
+
+        with patch.object(llm_util, "_registry", None):
+            llm_util.get_model_registry()
+        assert llm_util.registry_cache_stats.cache_info() == (hits + 1, misses + 1)
+
+
+class TestMetricsMiddleware:
+    """测试请求耗时中间件"""
+
+    def test_route_template_label(self):
+        """测试按路由模板记录耗时，未匹配的路径记为 unmatched"""
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        def get_item(item_id: int):
+            return {"id": item_id}
+
+        before = HTTP_REQUEST_DURATION.count(method="GET", route="/items/{item_id}", status="200")
+        client = TestClient(app)
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/missing")
+
+        assert HTTP_REQUEST_DURATION.count(method="GET", route="/items/{item_id}", status="200") == before + 2
+        assert HTTP_REQUEST_DURATION.count(method="GET", route="unmatched", status="404") >= 1
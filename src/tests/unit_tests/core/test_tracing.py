@@ -0,0 +1,121 @@
+"""
+分阶段追踪单元测试
+
+测试 span 嵌套、耗时分解、LangChain 回调与 jsonl 导出
+"""
+
+import json
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+
+from agent_server.core import tracing
+from agent_server.core.tracing import (
+    TracingCallbackHandler,
+    end_trace,
+    get_current_trace,
+    span,
+    start_trace,
+)
+
+
+@pytest.fixture
+def exported():
+    """收集导出的追踪"""
+    traces = []
+    with patch.object(tracing.tracer, "export", side_effect=traces.append):
+        yield traces
+
+
+class TestSpan:
+    """测试 span 上下文管理器"""
+
+    def test_nested_spans(self, exported):
+        """测试当前追踪中的 span 嵌套关系与耗时分解"""
+        trace = start_trace("request")
+        with span("outer", stage="vector_search") as outer:
+            with span("inner", stage="embedding") as inner:
+                pass
+        with span("outer", stage="vector_search"):
+            pass
+        end_trace(trace)
+
+        assert inner.parent_id == outer.span_id
+        assert outer.parent_id == trace.root.span_id
+        assert set(trace.breakdown()) == {"vector_search", "embedding"}
+        assert exported == [trace]
+        assert get_current_trace() is None
+
+    def test_standalone(self, exported):
+        """测试没有当前追踪时的独立追踪与 standalone=False"""
+        with span("ingest") as root:
+            with span("split", stage="split") as child:
+                pass
+        with span("embedding", standalone=False) as skipped:
+            pass
+
+        assert skipped is None
+        assert len(exported) == 1
+        assert exported[0].root is root
+        assert child.parent_id == root.span_id
+
+    def test_error_recorded(self, exported):
+        """测试异常记录到 span"""
+        trace = start_trace("request")
+        with pytest.raises(RuntimeError):
+            with span("history_write") as failed:
+                raise RuntimeError("redis down")
+        end_trace(trace)
+        end_trace(trace)
+
+        assert "redis down" in failed.error
+        assert len(exported) == 1
+
+
+class TestTracingCallbackHandler:
+    """测试 LangChain 回调转换为 span"""
+
+    def test_stages(self, exported):
+        """测试问题改写、检索、回答生成阶段与首 token 耗时"""
+        trace = start_trace("chat")
+        handler = TracingCallbackHandler(trace)
+        chain_id, rewrite_id, retriever_id, llm_id = uuid4(), uuid4(), uuid4(), uuid4()
+
+        handler.on_chain_start({}, {}, run_id=chain_id, name="chat_retriever_chain")
+        handler.on_chat_model_start({"name": "ChatDeepSeek"}, [], run_id=rewrite_id, parent_run_id=chain_id)
+        handler.on_llm_end(None, run_id=rewrite_id)
+        handler.on_retriever_start({}, "query", run_id=retriever_id, parent_run_id=chain_id, name="VectorStoreRetriever")
+        handler.on_retriever_end([1, 2], run_id=retriever_id)
+        handler.on_chain_end({}, run_id=chain_id)
+        handler.on_chat_model_start({"name": "ChatDeepSeek"}, [], run_id=llm_id)
+        handler.on_llm_new_token("你", run_id=llm_id)
+        handler.on_llm_new_token("好", run_id=llm_id)
+        end_trace(trace)
+
+        stages = trace.breakdown()
+        assert {"query_rewrite", "vector_search", "llm", "llm_first_token"} <= set(stages)
+        spans = {s.name: s for s in trace.spans}
+        assert spans["VectorStoreRetriever"].attributes["documents"] == 2
+        # 未收到结束事件的模型调用在追踪结束时一并结束
+        assert all(s.end_ns is not None for s in trace.spans)
+
+
+class TestJsonlSpanExporter:
+    """测试 jsonl 导出"""
+
+    def test_export(self, tmp_path):
+        """测试每个 span 写入一行 JSON"""
+        log_file = str(tmp_path / "trace.jsonl")
+        exporter = tracing.JsonlSpanExporter(log_file)
+        with patch.object(tracing.tracer, "export"):
+            with span("ingest") as root:
+                with span("split", stage="split"):
+                    pass
+        exporter.export(root.trace)
+        exporter._logger.complete()
+
+        with open(log_file, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert [r["name"] for r in records] == ["ingest", "split"]
+        assert records[1]["parent_id"] == records[0]["span_id"]
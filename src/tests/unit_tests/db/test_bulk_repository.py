@@ -0,0 +1,101 @@
+"""
+批量CRUD单元测试
+
+测试批量操作在一个会话中按批次执行，以及批量分配雪花ID
+"""
+
+from contextlib import asynccontextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from agent_server.core.exceptions import BadRequestException
+from agent_server.db.repository import base as repository_base
+from agent_server.db.repository.chat_message_repository import chat_message_repository
+from agent_server.schemas.chat.chat_message_schema import ChatMessageCreate
+from agent_server.utils.id_util import SnowflakeGenerator
+
+
+class _RecordingSession:
+    """记录执行的语句和参数"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def execute(self, statement, params=None):
+        self.calls.append((statement, params))
+        result = MagicMock()
+        result.rowcount = len(params) if params else 2
+        return result
+
+
+@pytest.fixture
+def session():
+    recording = _RecordingSession()
+    scopes = []
+
+    @asynccontextmanager
+    async def _scope(*args, **kwargs):
+        scopes.append(recording)
+        yield recording
+
+    with patch.object(repository_base, "async_session_scope", _scope):
+        recording.scopes = scopes
+        yield recording
+
+
+def _sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+class TestBulkRepository:
+    """测试BaseRepository批量操作"""
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_batches_in_one_session(self, session):
+        """测试批量插入只开启一个会话，按批次executemany，并分配唯一ID"""
+        objs = [ChatMessageCreate(conversation_id=1, question=f"q{i}") for i in range(5)]
+        ids = await chat_message_repository.bulk_create(objs_in=objs, batch_size=2)
+        assert len(session.scopes) == 1
+        assert [len(params) for _, params in session.calls] == [2, 2, 1]
+        assert len(set(ids)) == 5
+        assert _sql(session.calls[0][0]).startswith("INSERT INTO chat_message")
+
+    @pytest.mark.asyncio
+    async def test_bulk_upsert_conflict(self, session):
+        """测试批量upsert生成 ON CONFLICT 语句"""
+        objs = [ChatMessageCreate(id=1, conversation_id=1, question="q")]
+        await chat_message_repository.bulk_upsert(objs_in=objs, update_fields=["answer"])
+        sql = _sql(session.calls[0][0])
+        assert "ON CONFLICT (id) DO UPDATE SET answer = excluded.answer" in sql
+        assert "updated_time = now()" in sql
+
+        await chat_message_repository.bulk_upsert(objs_in=objs, update_fields=[])
+        assert "ON CONFLICT (id) DO NOTHING" in _sql(session.calls[1][0])
+
+    @pytest.mark.asyncio
+    async def test_bulk_update_requires_id(self, session):
+        """测试批量更新要求每行包含主键"""
+        with pytest.raises(BadRequestException):
+            await chat_message_repository.bulk_update(objs_in=[{"answer": "a"}])
+        assert await chat_message_repository.bulk_update(objs_in=[{"id": 1, "answer": "a"}]) == 1
+
+    @pytest.mark.asyncio
+    async def test_bulk_delete(self, session):
+        """测试批量删除按批次 IN 删除"""
+        await chat_message_repository.bulk_delete(ids=[1, 2, 3], batch_size=2)
+        assert len(session.calls) == 2
+        assert "DELETE FROM chat_message WHERE chat_message.id IN" in _sql(session.calls[0][0])
+
+
+class TestNextIds:
+    """测试批量生成雪花ID"""
+
+    def test_unique_and_increasing(self):
+        """测试批量ID唯一递增，跨毫秒时序列号重置"""
+        generator = SnowflakeGenerator(1, 1)
+        ids = generator.next_ids(10000)
+        assert len(set(ids)) == 10000
+        assert ids == sorted(ids)
+        assert generator.next_id() > ids[-1]
@@ -0,0 +1,32 @@
+"""
+数据库结构升级单元测试
+
+使用 SQLite 模拟升级前的 knowledge_file 表，测试补加 file_hash 列与索引，且可以重复执行
+"""
+
+from sqlalchemy import create_engine, inspect, text
+
+from agent_server.db.init_db import upgrade_schema
+
+
+def test_upgrade_adds_file_hash_column():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE knowledge_file (id BIGINT PRIMARY KEY, file_name VARCHAR(255))"))
+        conn.execute(text("INSERT INTO knowledge_file (id, file_name) VALUES (1, 'a.pdf')"))
+
+        assert upgrade_schema(conn) == ["knowledge_file.file_hash"]
+        # 已升级时不再执行
+        assert upgrade_schema(conn) == []
+
+        inspector = inspect(conn)
+        assert "file_hash" in {c["name"] for c in inspector.get_columns("knowledge_file")}
+        assert "ix_knowledge_file_file_hash" in {i["name"] for i in inspector.get_indexes("knowledge_file")}
+        # 已有的记录哈希为空，不会被误判为重复文件
+        assert conn.execute(text("SELECT file_hash FROM knowledge_file")).scalar_one() == ""
+
+
+def test_missing_table_skipped():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        assert upgrade_schema(conn) == []
@@ -0,0 +1,89 @@
+"""
+游标分页单元测试
+
+测试游标编解码和 keyset 查询条件
+"""
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import BigInteger
+from sqlalchemy.dialects import postgresql
+
+from agent_server.core.exceptions import BadRequestException
+from agent_server.db.repository import base as repository_base
+from agent_server.db.repository.base import decode_cursor, encode_cursor
+from agent_server.db.repository.chat_conversation_repository import chat_conversation_repository
+
+
+def _fake_scope(rows: list, statements: list):
+    """模拟会话，记录执行的语句并返回给定的行"""
+    class _Session:
+        async def scalars(self, statement):
+            statements.append(statement)
+            result = MagicMock()
+            result.all.return_value = rows
+            return result
+
+    @asynccontextmanager
+    async def _scope(*args, **kwargs):
+        yield _Session()
+
+    return _scope
+
+
+class TestCursor:
+    """测试游标编解码"""
+
+    def test_round_trip_datetime(self):
+        """测试时间字段游标编解码"""
+        value = datetime(2025, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+        cursor = encode_cursor(value, 1950000000000000000)
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == (value, 1950000000000000000)
+
+    def test_invalid_cursor(self):
+        """测试非法游标"""
+        with pytest.raises(BadRequestException):
+            decode_cursor("not-a-cursor")
+
+
+class TestGetPage:
+    """测试keyset分页查询"""
+
+    @pytest.mark.asyncio
+    async def test_next_cursor_from_last_row(self):
+        """测试多取一行判断下一页，游标指向当前页最后一行"""
+        rows = [
+            MagicMock(id=i, updated_time=datetime(2025, 1, 1, tzinfo=timezone.utc))
+            for i in range(3, 0, -1)
+        ]
+        statements = []
+        with patch.object(repository_base, "async_session_scope", _fake_scope(rows, statements)):
+            items, next_cursor = await chat_conversation_repository.get_page(limit=2)
+        assert [item.id for item in items] == [3, 2]
+        assert decode_cursor(next_cursor)[1] == 2
+
+    @pytest.mark.asyncio
+    async def test_last_page(self):
+        """测试最后一页不返回游标"""
+        statements = []
+        with patch.object(repository_base, "async_session_scope", _fake_scope([], statements)):
+            items, next_cursor = await chat_conversation_repository.get_page(limit=2)
+        assert items == [] and next_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_keyset_condition(self):
+        """测试带游标时使用 (updated_time, id) 行比较而不是 OFFSET"""
+        cursor = encode_cursor(datetime(2025, 1, 1, tzinfo=timezone.utc), 42)
+        statements = []
+        with patch.object(repository_base, "async_session_scope", _fake_scope([], statements)):
+            await chat_conversation_repository.get_page(cursor=cursor, limit=10)
+        # 按应用使用的 asyncpg 驱动编译，游标 id 以 BIGINT 绑定
+        compiled = statements[0].compile(dialect=postgresql.asyncpg.dialect())
+        sql = str(compiled)
+        assert "(chat_conversation.updated_time, chat_conversation.id) <" in sql
+        assert any(isinstance(bind.type, BigInteger) and bind.value == 42 for bind in compiled.binds.values())
+        assert "OFFSET" not in sql
@@ -0,0 +1,138 @@
+"""
+连接池监控单元测试
+
+测试连接获取耗时、连接池饱和度与慢查询指纹统计
+"""
+
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from agent_server.db.pool_monitor import (
+    InstrumentedQueuePool,
+    LatencyHistogram,
+    PoolMonitor,
+    fingerprint_statement,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """使用带统计的连接池的 sqlite 文件数据库引擎"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'monitor.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=2,
+        max_overflow=1,
+    )
+    yield engine
+    engine.dispose()
+
+
+class TestLatencyHistogram:
+    """测试耗时直方图"""
+
+    def test_quantiles(self):
+        """测试分位数按分桶上界估算"""
+        histogram = LatencyHistogram()
+        for _ in range(90):
+            histogram.observe(0.0008)
+        for _ in range(10):
+            histogram.observe(0.3)
+
+        snapshot = histogram.snapshot()
+        assert snapshot["count"] == 100
+        assert snapshot["p50_ms"] == 1
+        assert snapshot["p95_ms"] == 500
+        assert snapshot["buckets"]["le_1ms"] == 90
+
+    def test_empty(self):
+        """测试无数据时分位数为空"""
+        snapshot = LatencyHistogram().snapshot()
+        assert snapshot["count"] == 0
+        assert snapshot["p99_ms"] is None
+
+
+class TestFingerprint:
+    """测试语句指纹"""
+
+    def test_literals_and_params_normalized(self):
+        """测试字面量、参数、IN 列表不同的同类语句指纹相同"""
+        a = fingerprint_statement("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'a'")
+        b = fingerprint_statement("SELECT * FROM t WHERE id = 1")
+        c = fingerprint_statement("SELECT *  FROM t\n WHERE id IN ($1, $2) AND name = %(name)s")
+        assert a == c
+        assert a != b
+
+
+class TestPoolMonitor:
+    """测试连接池监控"""
+
+    def test_checkout_and_saturation(self, engine):
+        """测试连接获取耗时与饱和度"""
+        monitor = PoolMonitor()
+        monitor.register("sync", engine)
+
+        conn1 = engine.connect()
+        conn2 = engine.connect()
+        pool = monitor.snapshot()["pools"]["sync"]
+        assert pool["pool_class"] == "InstrumentedQueuePool"
+        assert pool["checkedout"] == 2
+        assert pool["saturation"] == round(2 / 3, 4)
+        assert pool["peak_checkedout"] == 2
+        assert pool["checkout_latency"]["count"] == 2
+        conn1.close()
+        conn2.close()
+
+        assert monitor.snapshot()["pools"]["sync"]["checkedout"] == 0
+        monitor.unregister("sync")
+        assert monitor.snapshot()["pools"] == {}
+
+    def test_slow_queries_grouped_by_fingerprint(self, engine):
+        """测试慢查询按指纹聚合"""
+        monitor = PoolMonitor()
+        monitor.register("sync", engine)
+
+        with patch("agent_server.db.pool_monitor.Settings.db_settings.SLOW_QUERY_MS", 0):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
+                conn.execute(text("SELECT 'x' || 'y'"))
+
+        queries = monitor.snapshot()["queries"]
+        assert queries["latency"]["count"] == 3
+        counts = sorted(entry["count"] for entry in queries["slow_queries"])
+        assert counts == [1, 2]
+
+        monitor.reset()
+        snapshot = monitor.snapshot()
+        assert snapshot["queries"]["slow_queries"] == []
+        assert snapshot["pools"]["sync"]["checkout_latency"]["count"] == 0
+        monitor.unregister("sync")
+
+    def test_failed_statements_leave_no_state(self, engine):
+        """测试出错的语句不在连接上残留开始时间，之后的语句耗时照常统计"""
+        monitor = PoolMonitor()
+        monitor.register("sync", engine)
+
+        with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conn.execute(text("SELECT * FROM missing_table"))
+                conn.rollback()
+            conn.execute(text("SELECT 1"))
+            assert "query_start_time" not in conn.connection.info
+
+        assert monitor.snapshot()["queries"]["latency"]["count"] == 1
+        monitor.unregister("sync")
+
+    def test_slow_query_top_n(self, engine):
+        """测试慢查询指纹数量上限"""
+        monitor = PoolMonitor()
+        with patch("agent_server.db.pool_monitor.Settings.db_settings.SLOW_QUERY_MS", 0), \
+                patch("agent_server.db.pool_monitor.Settings.db_settings.SLOW_QUERY_TOP_N", 2):
+            for statement in ("SELECT a", "SELECT b", "SELECT c"):
+                monitor.queries.record(statement, 0.5)
+        assert len(monitor.snapshot()["queries"]["slow_queries"]) == 2
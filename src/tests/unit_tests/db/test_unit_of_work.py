@@ -0,0 +1,73 @@
+"""
+工作单元单元测试
+
+测试 uow() 块内的 async_session_scope 复用同一个Session
+"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from agent_server.db.session import async_session_scope, get_current_session, uow
+
+
+@pytest.fixture
+def session_factory():
+    """模拟会话工厂，每次调用返回一个新的模拟Session"""
+    sessions = []
+
+    def _factory():
+        session = AsyncMock(spec=AsyncSession)
+        sessions.append(session)
+        return session
+
+    with patch("agent_server.db.base.get_async_session_factory", return_value=_factory):
+        yield sessions
+
+
+class TestUnitOfWork:
+    """测试uow工作单元"""
+
+    @pytest.mark.asyncio
+    async def test_scopes_share_session(self, session_factory):
+        """测试块内多次 async_session_scope 只创建一个Session并只提交一次"""
+        async with uow() as session:
+            async with async_session_scope() as first:
+                pass
+            async with async_session_scope() as second:
+                pass
+            assert first is second is session
+            assert get_current_session() is session
+        assert len(session_factory) == 1
+        session.commit.assert_awaited_once()
+        session.close.assert_awaited_once()
+        assert get_current_session() is None
+
+    @pytest.mark.asyncio
+    async def test_rollback_on_error(self, session_factory):
+        """测试块内异常时整体回滚且不提交"""
+        with pytest.raises(ValueError):
+            async with uow():
+                async with async_session_scope():
+                    raise ValueError("boom")
+        session = session_factory[0]
+        session.rollback.assert_awaited_once()
+        session.commit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_nested_uow(self, session_factory):
+        """测试嵌套工作单元复用外层Session"""
+        async with uow() as outer:
+            async with uow() as inner:
+                assert inner is outer
+        assert len(session_factory) == 1
+
+    @pytest.mark.asyncio
+    async def test_scope_without_uow(self, session_factory):
+        """测试不在工作单元中时每个 async_session_scope 独立创建Session"""
+        async with async_session_scope():
+            pass
+        async with async_session_scope():
+            pass
+        assert len(session_factory) == 2
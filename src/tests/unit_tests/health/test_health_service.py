@@ -0,0 +1,89 @@
+"""
+依赖健康检查单元测试
+
+测试并发检查、超时、结果缓存与就绪判定
+"""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from agent_server.app.health.health_service import HealthService
+
+
+@pytest.fixture(autouse=True)
+def health_settings():
+    """缩短超时时间，便于测试"""
+    with patch("agent_server.app.health.health_service.Settings.basic_settings.HEALTH_CHECK_TIMEOUT", 0.2), \
+            patch("agent_server.app.health.health_service.Settings.basic_settings.HEALTH_CHECK_CACHE_TTL", 60):
+        yield
+
+
+def make_check(calls: list, delay: float = 0, error: Exception | None = None, details=None):
+    async def _check():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return details
+    return _check
+
+
+class TestHealthService:
+    """测试依赖健康检查"""
+
+    @pytest.mark.asyncio
+    async def test_all_ok(self):
+        """测试依赖全部正常"""
+        service = HealthService()
+        service.register("database", make_check([], details={"checkedout": 1}))
+        service.register("redis", make_check([]))
+
+        report = await service.check()
+        assert report["status"] == "ok"
+        assert report["ready"] is True
+        assert report["dependencies"]["database"]["details"] == {"checkedout": 1}
+        assert "latency_ms" in report["dependencies"]["redis"]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_with_timeout(self):
+        """测试依赖并发检查，超时的依赖不拖慢整体探测"""
+        service = HealthService()
+        service.register("slow", make_check([], delay=5))
+        service.register("fast", make_check([], delay=0.1))
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        report = await service.check()
+        assert loop.time() - start < 1
+        assert report["dependencies"]["slow"]["error"].startswith("timeout")
+        assert report["status"] == "unavailable"
+
+    @pytest.mark.asyncio
+    async def test_non_critical_degraded(self):
+        """测试非关键依赖失败时为 degraded 且仍然就绪"""
+        service = HealthService()
+        service.register("database", make_check([]))
+        service.register("embedding", make_check([], error=RuntimeError("quota")), critical=lambda: False)
+
+        report = await service.check()
+        assert report["status"] == "degraded"
+        assert report["ready"] is True
+        assert service.critical_names() == ["database"]
+        assert "quota" in report["dependencies"]["embedding"]["error"]
+
+    @pytest.mark.asyncio
+    async def test_cached_and_single_flight(self):
+        """测试并发探测只执行一次检查，缓存期内直接返回结果"""
+        calls = []
+        service = HealthService()
+        service.register("redis", make_check(calls, delay=0.05))
+
+        reports = await asyncio.gather(*(service.check() for _ in range(5)))
+        assert len(calls) == 1
+        assert all(r["status"] == "ok" for r in reports)
+
+        report = await service.check()
+        assert len(calls) == 1
+        assert report["dependencies"]["redis"]["cached"] is True
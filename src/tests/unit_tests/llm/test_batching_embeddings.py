@@ -0,0 +1,138 @@
+"""
+查询嵌入动态批处理单元测试
+
+测试并发查询合并为少量 aembed_documents 调用、批处理指标、按端点区分批处理器与配置重新加载后重建，
+以及 ModelFactory 只包装 OpenAI 兼容模型
+"""
+
+import asyncio
+import copy
+import pickle
+import threading
+from unittest.mock import patch
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from agent_server.app.llm import batching_embeddings
+from agent_server.app.llm.batching_embeddings import BatchingEmbeddings
+from agent_server.app.llm.mode_factory import ModelFactory
+from agent_server.core.metrics import MICRO_BATCH_SIZE, MICRO_BATCH_WAIT
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self):
+        self.batches: list[list[str]] = []
+
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text))]
+
+    async def aembed_documents(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0.01)
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def batch_config():
+    config = {"enabled": True, "max_batch_size": 16, "max_wait_ms": 20}
+    with patch.object(batching_embeddings.Settings.model_settings, "EMBEDDING_QUERY_BATCH_CONFIG", config), \
+            patch.object(batching_embeddings, "_batchers", {}):
+        yield
+
+
+class TestBatchingEmbeddings:
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_merged(self):
+        inner = FakeEmbeddings()
+        # 每轮对话各自创建一个实例，同一模型共用批处理器
+        chats = [BatchingEmbeddings(inner, model="m-test") for _ in range(100)]
+        batches_before = MICRO_BATCH_SIZE.count(batcher="embedding-query:m-test")
+        waits_before = MICRO_BATCH_WAIT.count(batcher="embedding-query:m-test")
+
+        vectors = await asyncio.gather(*(chat.aembed_query("q" * (i + 1)) for i, chat in enumerate(chats)))
+
+        assert vectors == [[float(i + 1)] for i in range(100)]
+        assert len(inner.batches) == 7
+        assert all(len(batch) <= 16 for batch in inner.batches)
+        assert MICRO_BATCH_SIZE.count(batcher="embedding-query:m-test") - batches_before == 7
+        assert MICRO_BATCH_WAIT.count(batcher="embedding-query:m-test") - waits_before == 100
+
+    @pytest.mark.asyncio
+    async def test_other_calls_pass_through(self):
+        inner = FakeEmbeddings()
+        embeddings = BatchingEmbeddings(inner, model="m-test")
+        assert await embeddings.aembed_documents(["a", "bb"]) == [[1.0], [2.0]]
+        assert embeddings.embed_query("abc") == [3.0]
+        assert embeddings.batches == inner.batches
+        assert not hasattr(embeddings, "missing")
+
+    def test_copy_and_pickle(self):
+        embeddings = BatchingEmbeddings(FakeEmbeddings(), model="m-test", base_url="http://a/v1")
+        for restored in (copy.copy(embeddings), copy.deepcopy(embeddings), pickle.loads(pickle.dumps(embeddings))):
+            assert isinstance(restored, BatchingEmbeddings)
+            assert (restored.model, restored.base_url) == ("m-test", "http://a/v1")
+            assert restored.embed_query("abc") == [3.0]
+
+    @pytest.mark.asyncio
+    async def test_batcher_per_endpoint(self):
+        old, new = FakeEmbeddings(), FakeEmbeddings()
+        await BatchingEmbeddings(old, model="m-test", base_url="http://a/v1", api_key="k1").aembed_query("a")
+        # 同一模型换了接口地址或 API Key 时使用新的客户端
+        await BatchingEmbeddings(new, model="m-test", base_url="http://b/v1", api_key="k1").aembed_query("bb")
+        await BatchingEmbeddings(new, model="m-test", base_url="http://a/v1", api_key="k2").aembed_query("ccc")
+        # 同一端点复用已有的批处理器
+        await BatchingEmbeddings(new, model="m-test", base_url="http://a/v1", api_key="k1").aembed_query("d")
+        assert old.batches == [["a"], ["d"]]
+        assert new.batches == [["bb"], ["ccc"]]
+
+    @pytest.mark.asyncio
+    async def test_settings_reload_rebuilds_batchers(self):
+        old, new = FakeEmbeddings(), FakeEmbeddings()
+        await BatchingEmbeddings(old, model="m-test").aembed_query("a")
+
+        holder = type(batching_embeddings.Settings).__dict__["model_settings"].holder
+        assert batching_embeddings._clear_batchers in holder._callbacks
+        batching_embeddings._clear_batchers(None, None)
+
+        await BatchingEmbeddings(new, model="m-test").aembed_query("bb")
+        assert (old.batches, new.batches) == ([["a"]], [["bb"]])
+
+    def test_queries_from_two_loops(self):
+        """两个线程各自运行事件循环并发查询，共用批处理器时都能完成"""
+        inner = FakeEmbeddings()
+        barrier = threading.Barrier(2)
+        results = {}
+
+        async def query(text: str) -> list[float]:
+            barrier.wait()
+            return await asyncio.wait_for(BatchingEmbeddings(inner, model="m-test").aembed_query(text), timeout=2)
+
+        threads = [threading.Thread(target=lambda t=text: results.update({t: asyncio.run(query(t))}))
+                   for text in ("a", "bb")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        assert results == {"a": [1.0], "bb": [2.0]}
+
+    def test_model_factory_wraps_openai_compatible_only(self):
+        info = {"platform_type": "openai", "api_key": "sk-test", "api_base_url": "http://127.0.0.1:1/v1"}
+        with patch("agent_server.app.llm.mode_factory.get_model_info", return_value=info):
+            embeddings = ModelFactory.get_embeddings(embed_model="text-embedding-3-small")
+            assert isinstance(embeddings.embeddings, BatchingEmbeddings)
+            assert (embeddings.embeddings.base_url, embeddings.embeddings.api_key) == ("http://127.0.0.1:1/v1", "sk-test")
+
+            with patch.object(batching_embeddings.Settings.model_settings, "EMBEDDING_QUERY_BATCH_CONFIG",
+                              {"enabled": False}):
+                embeddings = ModelFactory.get_embeddings(embed_model="text-embedding-3-small")
+                assert not isinstance(embeddings.embeddings, BatchingEmbeddings)
+
+        # Ollama 对查询另加前缀，不合并
+        info = {"platform_type": "ollama", "api_key": "", "api_base_url": "http://127.0.0.1:11434/v1"}
+        with patch("agent_server.app.llm.mode_factory.get_model_info", return_value=info):
+            embeddings = ModelFactory.get_embeddings(embed_model="bge")
+            assert not isinstance(embeddings.embeddings, BatchingEmbeddings)
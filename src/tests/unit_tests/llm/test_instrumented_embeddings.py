@@ -0,0 +1,38 @@
+"""
+嵌入模型包装单元测试
+
+测试嵌入调用与属性访问的转发，以及包装后的模型可以被复制与序列化
+"""
+
+import copy
+import pickle
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agent_server.app.llm.instrumented_embeddings import InstrumentedEmbeddings
+
+
+@pytest.fixture
+def embeddings():
+    return InstrumentedEmbeddings(DeterministicFakeEmbedding(size=4), model="fake")
+
+
+class TestInstrumentedEmbeddings:
+    def test_forward_calls_and_attributes(self, embeddings):
+        assert embeddings.size == 4
+        assert embeddings.embed_query("你好") == DeterministicFakeEmbedding(size=4).embed_query("你好")
+        assert not hasattr(embeddings, "missing")
+        with pytest.raises(AttributeError):
+            _ = embeddings.missing
+
+    def test_missing_wrapped_model(self):
+        # copy、pickle 还原时先创建空实例，属性探测应得到 AttributeError 而不是 KeyError
+        empty = InstrumentedEmbeddings.__new__(InstrumentedEmbeddings)
+        assert not hasattr(empty, "size")
+
+    def test_copy_and_pickle(self, embeddings):
+        for restored in (copy.copy(embeddings), copy.deepcopy(embeddings), pickle.loads(pickle.dumps(embeddings))):
+            assert isinstance(restored, InstrumentedEmbeddings)
+            assert restored.model == "fake"
+            assert restored.embed_query("你好") == embeddings.embed_query("你好")
@@ -0,0 +1,88 @@
+"""
+本地嵌入模型单元测试
+
+使用假的 BGE-M3 模型，测试模型只加载一次、并发请求合并为一次推理，以及 ModelFactory 的 local 平台
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from agent_server.app.llm import local_embeddings
+from agent_server.app.llm.instrumented_embeddings import InstrumentedEmbeddings
+from agent_server.app.llm.local_embeddings import LocalEmbeddingRuntime, LocalEmbeddings
+from agent_server.app.llm.mode_factory import ModelFactory
+from agent_server.config.settings import ModelSettings
+from agent_server.utils.llm_util import ModelRegistry
+
+
+class FakeBGEM3:
+    def __init__(self):
+        self.calls: list[list[str]] = []
+        self.threads: set[str] = set()
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        self.threads.add(threading.current_thread().name)
+        return {"dense_vecs": np.array([[float(len(text)), 1.0] for text in texts])}
+
+
+@pytest.fixture
+def fake_model():
+    model = FakeBGEM3()
+    loads = []
+
+    def load(runtime):
+        loads.append(runtime.model_name)
+        return model
+
+    config = {"model_path": "BAAI/bge-m3", "batch_size": 8, "max_wait_ms": 20, "inference_threads": 1}
+    with patch.object(LocalEmbeddingRuntime, "_load_model", load), \
+            patch.object(local_embeddings, "get_local_embedding_config", lambda name: dict(config)), \
+            patch.object(local_embeddings, "_runtimes", {}):
+        model.loads = loads
+        yield model
+
+
+class TestLocalEmbeddings:
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_batched(self, fake_model):
+        embeddings = [LocalEmbeddings("bge-m3") for _ in range(2)]
+        vectors = await asyncio.gather(*(embeddings[i % 2].aembed_query("q" * i) for i in range(1, 6)))
+        assert vectors == [[float(i), 1.0] for i in range(1, 6)]
+        # 不同实例、不同协程的请求合并为一次推理，模型只加载一次，推理在专用线程中执行
+        assert fake_model.calls == [["q", "qq", "qqq", "qqqq", "qqqqq"]]
+        assert fake_model.loads == ["bge-m3"]
+        assert all(name.startswith("embed-bge-m3") for name in fake_model.threads)
+
+    @pytest.mark.asyncio
+    async def test_aembed_documents(self, fake_model):
+        vectors = await LocalEmbeddings("bge-m3").aembed_documents(["a", "bb"])
+        assert vectors == [[1.0, 1.0], [2.0, 1.0]]
+
+    def test_sync_embed_from_threads(self, fake_model):
+        embeddings = LocalEmbeddings("bge-m3")
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda i: embeddings.embed_documents(["x" * i]), range(1, 9)))
+        assert results == [[[float(i), 1.0]] for i in range(1, 9)]
+        assert embeddings.embed_query("abc") == [3.0, 1.0]
+        assert fake_model.loads == ["bge-m3"]
+        assert len(fake_model.threads) == 1
+
+    def test_model_factory_local_platform(self, fake_model):
+        with patch("agent_server.app.llm.mode_factory.get_model_info",
+                   return_value={"platform_type": "local", "api_key": "", "api_base_url": ""}):
+            embeddings = ModelFactory.get_embeddings(embed_model="bge-m3")
+        assert isinstance(embeddings, InstrumentedEmbeddings)
+        assert isinstance(embeddings.embeddings, LocalEmbeddings)
+        assert embeddings.embed_query("ab") == [2.0, 1.0]
+
+    def test_default_config_not_local(self):
+        """默认配置不启用本地平台，默认嵌入模型不依赖 FlagEmbedding"""
+        model_settings = ModelSettings()
+        info = ModelRegistry(model_settings).get(model_settings.DEFAULT_EMBEDDING_MODEL)
+        assert info is None or info["platform_type"] != "local"
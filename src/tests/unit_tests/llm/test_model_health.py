@@ -0,0 +1,119 @@
+"""
+模型端点健康状态单元测试
+
+测试后台探测、失败退避、恢复，以及请求路径只读取缓存状态
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from agent_server.app.llm import model_health as model_health_module
+from agent_server.app.llm.mode_factory import ModelFactory
+from agent_server.app.llm.model_health import ModelHealthRegistry, STATUS_ERROR, STATUS_OK, STATUS_UNKNOWN
+
+
+@pytest.fixture(autouse=True)
+def model_health_settings():
+    settings = "agent_server.app.llm.model_health.Settings.basic_settings"
+    with patch(f"{settings}.MODEL_HEALTH_CHECK_INTERVAL", 10), \
+            patch(f"{settings}.MODEL_HEALTH_CHECK_MAX_BACKOFF", 60), \
+            patch(f"{settings}.HEALTH_CHECK_TIMEOUT", 0.2), \
+            patch.object(model_health_module.random, "uniform", lambda a, b: 1.0):
+        yield
+
+
+class FakeClock:
+    """只替换探测调度用的 monotonic，事件循环仍使用真实时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.time = SimpleNamespace(monotonic=lambda: self.now, time=time.time, perf_counter=time.perf_counter)
+
+
+def make_probe(calls: list, results: list):
+    async def probe():
+        calls.append(1)
+        result = results.pop(0) if results else None
+        if isinstance(result, Exception):
+            raise result
+        if result == "hang":
+            await asyncio.sleep(5)
+    return probe
+
+
+class TestModelHealthRegistry:
+    @pytest.mark.asyncio
+    async def test_probe_interval_backoff_and_recovery(self):
+        calls = []
+        registry = ModelHealthRegistry()
+        registry.register("embedding:m", make_probe(calls, [None, RuntimeError("quota"), "hang", None]))
+        clock = FakeClock()
+
+        with patch.object(model_health_module, "time", clock.time):
+            state = registry.get("embedding:m")
+            assert state.status == STATUS_UNKNOWN and state.available
+
+            await registry.probe_due()
+            assert (state.status, len(calls), state.next_check_at) == (STATUS_OK, 1, 1010.0)
+
+            # 未到期时不探测
+            await registry.probe_due()
+            assert len(calls) == 1
+
+            clock.now = 1010.0
+            await registry.probe_due()
+            assert (state.status, state.consecutive_failures, state.next_check_at) == (STATUS_ERROR, 1, 1030.0)
+            assert not state.available and "quota" in state.error
+
+            clock.now = 1030.0
+            await registry.probe_due()
+            # 超时同样视为失败，退避间隔翻倍
+            assert (state.consecutive_failures, state.next_check_at) == (2, 1070.0)
+            assert state.error.startswith("TimeoutError")
+
+            clock.now = 1070.0
+            await registry.probe_due()
+            assert (state.status, state.consecutive_failures, state.error) == (STATUS_OK, 0, "")
+            assert state.next_check_at == 1080.0
+        assert len(calls) == 4
+
+    @pytest.mark.asyncio
+    async def test_backoff_capped(self):
+        registry = ModelHealthRegistry()
+        registry.register("embedding:m", make_probe([], [RuntimeError("down")] * 10))
+        clock = FakeClock()
+        with patch.object(model_health_module, "time", clock.time):
+            for _ in range(5):
+                clock.now = registry.get("embedding:m").next_check_at
+                await registry.probe_due()
+            assert registry.get("embedding:m").next_check_at - clock.now == 60
+
+    @pytest.mark.asyncio
+    async def test_background_task(self):
+        calls = []
+        registry = ModelHealthRegistry()
+        registry.register("embedding:m", make_probe(calls, []))
+        registry.start()
+        for _ in range(100):
+            if calls:
+                break
+            await asyncio.sleep(0.01)
+        await registry.stop()
+        assert not registry.started()
+        assert registry.snapshot()["embedding:m"]["status"] == STATUS_OK
+
+    def test_check_embed_model_reads_cached_status(self):
+        """check_embed_model 不调用嵌入模型"""
+        registry = ModelHealthRegistry()
+        with patch.object(model_health_module, "model_health", registry), \
+                patch.object(ModelFactory, "get_embeddings") as get_embeddings:
+            assert ModelFactory.check_embed_model("bge-m3") == (True, "")
+            state = registry.get("embedding:bge-m3")
+            state.status, state.error = STATUS_ERROR, "RuntimeError: quota"
+            ok, msg = ModelFactory.check_embed_model("bge-m3")
+        assert not ok and "quota" in msg
+        get_embeddings.assert_not_called()
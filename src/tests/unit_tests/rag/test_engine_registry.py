@@ -0,0 +1,95 @@
+"""
+向量库引擎注册表单元测试
+
+测试引擎按需创建、并发获取只创建一次、lifespan 启动与关闭，以及 fork 后丢弃父进程的引擎
+"""
+
+import threading
+
+import pytest
+
+from agent_server.app.rag.vector_store.engine_registry import VsEngineRegistry
+
+
+class FakeEngine:
+    def __init__(self):
+        self.closed = False
+        self.discarded = False
+
+
+def make_registry(created: list, closed: list | None = None) -> VsEngineRegistry:
+    def _create():
+        engine = FakeEngine()
+        created.append(engine)
+        return engine
+
+    async def _close(engine):
+        engine.closed = True
+        if closed is not None:
+            closed.append(engine)
+
+    def _discard(engine):
+        engine.discarded = True
+
+    registry = VsEngineRegistry()
+    registry.register("fake", _create, _close, _discard)
+    return registry
+
+
+class TestVsEngineRegistry:
+    def test_get_engine_creates_once(self):
+        created = []
+        registry = make_registry(created)
+
+        assert registry.get_engine("fake") is registry.get_engine("fake")
+        assert len(created) == 1
+
+    def test_concurrent_get_engine(self):
+        created = []
+        registry = make_registry(created)
+        barrier = threading.Barrier(8)
+        engines = []
+
+        def _get():
+            barrier.wait()
+            engines.append(registry.get_engine("fake"))
+
+        threads = [threading.Thread(target=_get) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(created) == 1
+        assert all(engine is created[0] for engine in engines)
+
+    def test_unknown_type(self):
+        with pytest.raises(ValueError):
+            VsEngineRegistry().get_engine("milvus")
+
+    @pytest.mark.asyncio
+    async def test_startup_and_close(self):
+        created, closed = [], []
+        registry = make_registry(created, closed)
+
+        # 未注册的类型跳过
+        await registry.startup(["fake", "faiss"])
+        assert registry.started() == ["fake"]
+
+        await registry.close()
+        assert closed == created and created[0].closed
+        assert registry.started() == []
+
+        # 关闭后再次获取时重新创建
+        assert registry.get_engine("fake") is not created[0]
+
+    def test_after_fork_discards_without_closing(self):
+        created = []
+        registry = make_registry(created)
+        parent_engine = registry.get_engine("fake")
+
+        registry._after_fork()
+
+        assert parent_engine.discarded and not parent_engine.closed
+        assert registry.started() == []
+        assert registry.get_engine("fake") is not parent_engine
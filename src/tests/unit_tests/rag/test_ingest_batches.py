@@ -0,0 +1,100 @@
+"""
+流式分批入库单元测试
+
+测试 save_vector_store_batches 的批次边界、返回的文本块数与对生成器的惰性消费，以及 lazy_load_documents 的流式加载
+"""
+
+import types
+from unittest.mock import patch
+
+import pytest
+from langchain_community.document_loaders import CSVLoader, TextLoader
+from langchain_core.documents import Document
+
+from agent_server.app.rag.document_loader.loader_factory import get_document_loader, lazy_load_documents
+
+
+@pytest.fixture
+def service():
+    from agent_server.app.rag.vector_store.base import VsService
+
+    class FakeVsService(VsService):
+        """每个文档分割为 2 个文本块，记录每次写入时生成器已产出的文档数"""
+
+        def __init__(self):
+            self.kn_name = "test"
+            self.batches: list[list[str]] = []
+            self.produced_at_save: list[int] = []
+            self.produced = 0
+            self.id_prefixes: list[str | None] = []
+
+        def save_vector_store(self, docs, id_prefix=None):
+            self.batches.append([doc.page_content for doc in docs])
+            self.id_prefixes.append(id_prefix)
+            self.produced_at_save.append(self.produced)
+            return [f"{doc.page_content}-{i}" for doc in docs for i in range(2)]
+
+        def get_vector_store(self):
+            pass
+
+        def get_vector_store_retriever(self, top_k, score_threshold):
+            pass
+
+    return FakeVsService()
+
+
+def documents(service, count: int):
+    for i in range(count):
+        service.produced += 1
+        yield Document(page_content=f"doc-{i}")
+
+
+class TestSaveVectorStoreBatches:
+    def test_batch_boundaries_and_count(self, service):
+        total = service.save_vector_store_batches(documents(service, 7), batch_size=3)
+
+        assert total == 14
+        assert service.batches == [["doc-0", "doc-1", "doc-2"], ["doc-3", "doc-4", "doc-5"], ["doc-6"]]
+
+    def test_consumes_generator_lazily(self, service):
+        service.save_vector_store_batches(documents(service, 7), batch_size=3)
+
+        # 每个批次写入时，生成器只产出了到该批次为止的文档
+        assert service.produced_at_save == [3, 6, 7]
+
+    def test_exact_multiple_and_empty(self, service):
+        assert service.save_vector_store_batches(documents(service, 4), batch_size=2) == 8
+        assert [len(batch) for batch in service.batches] == [2, 2]
+        assert service.save_vector_store_batches(iter([]), batch_size=2) == 0
+        assert len(service.batches) == 2
+
+    def test_default_batch_size(self, service):
+        from agent_server.app.rag.vector_store import base
+
+        with patch.object(base.Settings.kn_settings, "INGEST_BATCH_SIZE", 4):
+            service.save_vector_store_batches(documents(service, 5))
+        assert [len(batch) for batch in service.batches] == [4, 1]
+
+    def test_id_prefix_per_batch(self, service):
+        service.save_vector_store_batches(documents(service, 5), batch_size=2, id_prefix="kn:hash")
+        assert service.id_prefixes == ["kn:hash:0", "kn:hash:1", "kn:hash:2"]
+
+        service.save_vector_store_batches(documents(service, 1), batch_size=2)
+        assert service.id_prefixes[-1] is None
+
+
+class TestLazyLoadDocuments:
+    def test_loader_by_extension(self, tmp_path):
+        assert isinstance(get_document_loader(str(tmp_path / "a.csv")), CSVLoader)
+        assert isinstance(get_document_loader(str(tmp_path / "a.unknown")), TextLoader)
+
+    def test_csv_rows_streamed(self, tmp_path):
+        path = tmp_path / "rows.csv"
+        path.write_text("name,value\na,1\nb,2\nc,3\n", encoding="utf-8")
+
+        docs = lazy_load_documents(str(path))
+        assert isinstance(docs, types.GeneratorType)
+        first = next(docs)
+        assert first.page_content == "name: a\nvalue: 1"
+        assert first.metadata["row"] == 0
+        assert [doc.metadata["row"] for doc in docs] == [1, 2]
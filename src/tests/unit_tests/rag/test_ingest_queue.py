@@ -0,0 +1,329 @@
+"""
+文档入库队列单元测试
+
+使用内存中的 Redis 替身，测试入队去重、可靠出队、完成/重试/失败、遗留任务恢复、入库进程的并发处理与吞吐统计，以及上传接口对同一文件的并发去重
+"""
+
+import asyncio
+import fnmatch
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from agent_server.app.rag.ingest import ingest_worker
+from agent_server.app.rag.ingest.ingest_queue import IngestJob, IngestQueue, JOB_DONE, JOB_FAILED, JOB_QUEUED
+from agent_server.app.rag.ingest.ingest_worker import IngestWorker
+from agent_server.app.rag.vector_store.engine_registry import vs_engine_registry
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self._redis = redis
+        self._calls = []
+
+    def __getattr__(self, name):
+        def _buffer(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+        return _buffer
+
+    async def execute(self):
+        return [await getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in self._calls]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeRedis:
+    """只实现入库队列用到的命令"""
+
+    def __init__(self):
+        self.data: dict = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def sadd(self, key, member):
+        members = self.data.setdefault(key, set())
+        if member in members:
+            return 0
+        members.add(member)
+        return 1
+
+    async def eval(self, script, numkeys, *args):
+        # 按入队脚本的语义执行：去重、写入任务状态并入队
+        inflight_key, job_key, queue_key = args[:numkeys]
+        dedupe_key, _ttl, raw, *fields = args[numkeys:]
+        if not await self.sadd(inflight_key, dedupe_key):
+            return 0
+        await self.hset(job_key, mapping=dict(zip(fields[::2], fields[1::2])))
+        await self.lpush(queue_key, raw)
+        return 1
+
+    async def srem(self, key, member):
+        self.data.get(key, set()).discard(member)
+
+    async def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def hincrby(self, key, field, amount):
+        h = self.data.setdefault(key, {})
+        h[field] = str(int(h.get(field, 0)) + amount)
+
+    async def hincrbyfloat(self, key, field, amount):
+        h = self.data.setdefault(key, {})
+        h[field] = str(float(h.get(field, 0)) + amount)
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def lpush(self, key, value):
+        self.data.setdefault(key, []).insert(0, value)
+
+    async def lmove(self, src, dst, wherefrom, whereto):
+        items = self.data.get(src)
+        if not items:
+            return None
+        value = items.pop()
+        self.data.setdefault(dst, []).insert(0, value)
+        return value
+
+    async def blmove(self, src, dst, timeout, wherefrom, whereto):
+        value = await self.lmove(src, dst, wherefrom, whereto)
+        if value is None:
+            await asyncio.sleep(0.01)
+        return value
+
+    async def lrem(self, key, count, value):
+        items = self.data.get(key, [])
+        if value in items:
+            items.remove(value)
+
+    async def llen(self, key):
+        return len(self.data.get(key, []))
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def scan_iter(self, match):
+        for key in list(self.data):
+            if fnmatch.fnmatchcase(key, match) and self.data[key]:
+                yield key
+
+    async def aclose(self):
+        pass
+
+
+def make_queue() -> IngestQueue:
+    queue = IngestQueue(prefix="test:ingest:")
+    queue._redis = FakeRedis()
+    return queue
+
+
+def make_job(name: str = "a.pdf", file_hash: str = "h1") -> IngestJob:
+    return IngestJob(kn_name="default", file_path=f"/tmp/{name}", file_name=name, file_hash=file_hash, file_size=10)
+
+
+class TestIngestQueue:
+    @pytest.mark.asyncio
+    async def test_enqueue_dedupe(self):
+        queue = make_queue()
+        job = make_job()
+
+        assert await queue.enqueue(job)
+        assert not await queue.enqueue(make_job())
+        assert await queue.enqueue(make_job("b.pdf", "h2"))
+        assert (await queue.stats())["backlog"] == 2
+        assert await queue.get_job(job.job_id) == {
+            "status": JOB_QUEUED, "kn_name": "default", "file_name": "a.pdf", "enqueued_at": str(job.enqueued_at),
+        }
+
+    @pytest.mark.asyncio
+    async def test_enqueue_failure_leaves_no_dedupe_mark(self):
+        queue = make_queue()
+        with patch.object(queue._redis, "eval", AsyncMock(side_effect=ConnectionError("redis down"))):
+            with pytest.raises(ConnectionError):
+                await queue.enqueue(make_job())
+        # 去重与入队在同一脚本中执行，失败后不残留去重标记，相同文件可以再次入队
+        assert await queue.enqueue(make_job())
+
+    @pytest.mark.asyncio
+    async def test_dequeue_and_complete(self):
+        queue = make_queue()
+        job = make_job()
+        await queue.enqueue(job)
+
+        got, raw = await queue.dequeue("w1")
+        assert got.job_id == job.job_id
+        stats = await queue.stats()
+        assert (stats["backlog"], stats["processing"]) == (0, 1)
+
+        await queue.complete("w1", raw, got, docs_count=7, seconds=2.0)
+        stats = await queue.stats()
+        assert (stats["processing"], stats["completed"], stats["docs"], stats["avg_job_seconds"]) == (0, 1, 7, 2.0)
+        assert (await queue.get_job(job.job_id))["status"] == JOB_DONE
+        # 完成后相同文件可以再次入队
+        assert await queue.enqueue(make_job())
+
+    @pytest.mark.asyncio
+    async def test_fail_with_retry_and_final(self):
+        queue = make_queue()
+        job = make_job()
+        await queue.enqueue(job)
+
+        got, raw = await queue.dequeue("w1")
+        await queue.fail("w1", raw, got, "boom", retry=True)
+        assert (await queue.get_job(job.job_id))["status"] == JOB_QUEUED
+
+        got, raw = await queue.dequeue("w1")
+        assert got.attempts == 1
+        await queue.fail("w1", raw, got, "boom", retry=False)
+        stats = await queue.stats()
+        assert (stats["backlog"], stats["processing"], stats["failed"]) == (0, 0, 1)
+        assert (await queue.get_job(job.job_id))["status"] == JOB_FAILED
+        assert await queue.enqueue(make_job())
+
+    @pytest.mark.asyncio
+    async def test_recover_only_dead_workers(self):
+        queue = make_queue()
+        await queue.enqueue(make_job("a.pdf", "h1"))
+        await queue.enqueue(make_job("b.pdf", "h2"))
+        await queue.dequeue("dead")
+        await queue.dequeue("alive")
+        await queue.heartbeat("alive", {"worker_id": "alive"}, ttl=30)
+
+        assert await queue.recover() == 1
+        stats = await queue.stats()
+        assert (stats["backlog"], stats["processing"]) == (1, 1)
+        assert [w["worker_id"] for w in stats["workers"]] == ["alive"]
+
+
+class TestIngestWorker:
+    @pytest.mark.asyncio
+    async def test_processes_jobs_concurrently_with_retries(self):
+        queue = make_queue()
+        for i in range(4):
+            await queue.enqueue(make_job(f"{i}.pdf", f"h{i}"))
+        await queue.enqueue(make_job("bad.pdf", "bad"))
+
+        running = 0
+        max_running = 0
+
+        async def ingest(job: IngestJob) -> int:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            if job.file_name == "bad.pdf":
+                raise RuntimeError("parse error")
+            return 3
+
+        worker = IngestWorker(queue=queue, concurrency=2, worker_id="w1", ingest_func=ingest)
+        with patch.object(ingest_worker.Settings.kn_settings, "INGEST_MAX_ATTEMPTS", 2):
+            task = asyncio.create_task(worker.run())
+            for _ in range(200):
+                stats = await queue.stats()
+                if stats["completed"] + stats["failed"] == 5:
+                    break
+                await asyncio.sleep(0.01)
+            worker.stop()
+            await asyncio.wait_for(task, 2)
+
+        stats = await queue.stats()
+        assert (stats["completed"], stats["failed"], stats["docs"], stats["backlog"], stats["processing"]) == (4, 1, 12, 0, 0)
+        assert max_running == 2
+        # 失败的任务重试一次后标记为失败
+        assert worker.failed == 2 and worker.processed == 4
+        info = worker.info()
+        assert info["docs"] == 12 and 0 < info["utilization"] <= 1
+        # 停止后心跳被删除
+        assert stats["workers"] == []
+
+    @pytest.mark.asyncio
+    async def test_run_worker_probes_embed_model(self):
+        """测试入库进程启动时登记并探测默认嵌入模型，退出时停止探测"""
+        events = []
+
+        class FakeModelHealth:
+            def register_embed_model(self, embed_model):
+                events.append(("register", embed_model))
+
+            def start(self):
+                events.append("start")
+
+            async def stop(self):
+                events.append("stop")
+
+        async def run(self):
+            events.append("run")
+
+        with patch("agent_server.db.base.setup_database_connection", AsyncMock()), \
+                patch("agent_server.db.base.close_database_connection", AsyncMock()), \
+                patch.object(vs_engine_registry, "startup", AsyncMock()), \
+                patch.object(vs_engine_registry, "close", AsyncMock()), \
+                patch("agent_server.app.llm.model_health.model_health", FakeModelHealth()), \
+                patch("agent_server.utils.llm_util.get_default_embedding", lambda: "m-test"), \
+                patch.object(ingest_worker, "id_generator", SimpleNamespace(node_id=1)), \
+                patch.object(ingest_worker, "ingest_queue", make_queue()), \
+                patch.object(ingest_worker, "shutdown_process_pool"), \
+                patch.object(IngestWorker, "run", run):
+            await ingest_worker.run_worker(concurrency=1)
+
+        assert events == [("register", "m-test"), "start", "run", "stop"]
+
+
+class TestUploadRoute:
+    @pytest.mark.asyncio
+    async def test_concurrent_uploads_ingest_once(self, tmp_path):
+        """测试同一文件并发上传时只入库一次，入库失败后可以重新上传"""
+        from agent_server.api.v1 import rag_routes
+
+        async def save_upload_file(file, directory):
+            return tmp_path / "a.pdf", "same-hash", 3
+
+        async def is_file_ingested(kn_name, file_hash):
+            # 两个请求都在这里让出事件循环，检查之前必须已经占用
+            await asyncio.sleep(0.01)
+            return False
+
+        ingested = []
+
+        async def ingest_file(kn_name, file_path, file_name, file_hash, file_size):
+            ingested.append(file_hash)
+            await asyncio.sleep(0.01)
+            if len(ingested) == 2:
+                raise RuntimeError("embedding down")
+            return 1
+
+        class Upload:
+            filename = "a.pdf"
+
+        with patch.object(rag_routes, "save_upload_file", save_upload_file), \
+                patch.object(rag_routes, "is_file_ingested", is_file_ingested), \
+                patch.object(rag_routes, "ingest_file", ingest_file), \
+                patch.object(rag_routes.Settings.kn_settings, "INGEST_MODE", "inline"):
+            first, second = await asyncio.gather(*(rag_routes.upload_file(None, Upload()) for _ in range(2)))
+            assert ingested == ["same-hash"]
+            assert {first.body.decode(), second.body.decode()} == {"a.pdf 已成功保存", "a.pdf 已存在，无需重复保存"}
+            assert rag_routes._ingesting_files == set()
+
+            with pytest.raises(RuntimeError):
+                await rag_routes.upload_file(None, Upload())
+            # 入库失败时释放占用
+            assert rag_routes._ingesting_files == set()
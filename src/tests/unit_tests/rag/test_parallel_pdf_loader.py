@@ -0,0 +1,99 @@
+"""
+多进程 PDF 文本提取单元测试
+
+用 pypdf 生成多页 PDF，校验 ParallelPyPDFLoader 与 PyPDFLoader 的 page_content、metadata 与页面顺序一致；
+设置环境变量 PDF_BENCHMARK_FILE 为 PDF 路径时额外对比两者的加载耗时
+"""
+
+import os
+import time
+
+import pytest
+from langchain_community.document_loaders import PyPDFLoader
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from agent_server.app.rag.document_loader.parallel_pdf_loader import ParallelPyPDFLoader
+from agent_server.utils.process_util import get_cpu_count
+
+
+def make_pdf(path, pages: int) -> str:
+    """生成每页一行文本的 PDF，前两页使用罗马数字页码标签，并带有标题、作者、创建时间元数据"""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for i in range(pages):
+        page = writer.add_blank_page(612, 792)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td (Page {i + 1} of report) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+    writer.set_page_label(0, 1, style="/r")
+    writer.set_page_label(2, pages - 1, style="/D", start=1)
+    writer.add_metadata({
+        "/Title": " 年度报告 ",
+        "/Author": "agent",
+        "/CreationDate": "D:20240101120000+08'00'",
+    })
+    writer.write(str(path))
+    return str(path)
+
+
+def dump(docs) -> list[tuple[str, dict]]:
+    return [(doc.page_content, doc.metadata) for doc in docs]
+
+
+@pytest.fixture(scope="module")
+def pdf_file(tmp_path_factory):
+    return make_pdf(tmp_path_factory.mktemp("pdf") / "report.pdf", 7)
+
+
+class TestParallelPyPDFLoader:
+    def test_serial_matches_pypdf_loader(self, pdf_file):
+        expected = dump(PyPDFLoader(pdf_file).lazy_load())
+        assert [text for text, _ in expected] == [f"Page {i} of report" for i in range(1, 8)]
+        assert dump(ParallelPyPDFLoader(pdf_file, max_workers=1).lazy_load()) == expected
+
+    def test_parallel_matches_pypdf_loader(self, pdf_file):
+        expected = dump(PyPDFLoader(pdf_file).lazy_load())
+        # 7 页按每任务 2 页切为 4 个任务，分发到 2 个进程，结果仍按页码顺序产出
+        docs = dump(ParallelPyPDFLoader(pdf_file, pages_per_task=2, min_parallel_pages=0, max_workers=2).lazy_load())
+        assert docs == expected
+        assert [metadata["page"] for _, metadata in docs] == list(range(7))
+        assert [metadata["page_label"] for _, metadata in docs] == ["i", "ii", "1", "2", "3", "4", "5"]
+        assert docs[0][1]["title"] == "年度报告"
+        assert docs[0][1]["creationdate"] == "2024-01-01T12:00:00+08:00"
+        assert docs[0][1]["total_pages"] == 7
+
+    def test_few_pages_stay_in_process(self, tmp_path):
+        pdf_file = make_pdf(tmp_path / "short.pdf", 3)
+        loader = ParallelPyPDFLoader(pdf_file, min_parallel_pages=10, max_workers=2)
+        assert dump(loader.lazy_load()) == dump(PyPDFLoader(pdf_file).lazy_load())
+
+    @pytest.mark.skipif(not os.getenv("PDF_BENCHMARK_FILE"), reason="设置 PDF_BENCHMARK_FILE 后运行耗时对比")
+    def test_benchmark(self, record_property):
+        file_path = os.environ["PDF_BENCHMARK_FILE"]
+
+        def run(loader_factory, repeat: int = 3):
+            best, docs = float("inf"), []
+            for _ in range(repeat):
+                begin = time.perf_counter()
+                docs = list(loader_factory().lazy_load())
+                best = min(best, time.perf_counter() - begin)
+            return best, docs
+
+        # 预热进程池，避免把子进程启动时间计入对比
+        list(ParallelPyPDFLoader(file_path, min_parallel_pages=0).lazy_load())
+
+        serial_time, serial_docs = run(lambda: PyPDFLoader(file_path))
+        parallel_time, parallel_docs = run(lambda: ParallelPyPDFLoader(file_path, min_parallel_pages=0))
+        record_property("pages", len(serial_docs))
+        record_property("workers", get_cpu_count())
+        record_property("pypdf_loader_seconds", round(serial_time, 3))
+        record_property("parallel_loader_seconds", round(parallel_time, 3))
+        assert dump(parallel_docs) == dump(serial_docs)
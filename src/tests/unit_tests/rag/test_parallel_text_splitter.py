@@ -0,0 +1,78 @@
+"""
+多进程文档分割单元测试
+"""
+
+import pytest
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from agent_server.app.rag.text_splitter.parallel_text_splitter import (
+    parallel_split_documents,
+    shard_documents,
+)
+from agent_server.utils.process_util import shutdown_process_pool
+
+
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+def _make_documents(count: int) -> list[Document]:
+    return [
+        Document(
+            page_content="\n\n".join(f"第{i}页 第{j}段 " + "lorem ipsum dolor sit amet " * (j + 5) for j in range(i % 7 + 1)),
+            metadata={"source": "test.pdf", "page": i},
+        )
+        for i in range(count)
+    ]
+
+
+class TestShardDocuments:
+    """测试文档分片"""
+
+    def test_shards_are_contiguous(self):
+        """分片按原顺序连续划分，不丢失、不重复文档"""
+        docs = _make_documents(50)
+        shards = shard_documents(docs, 8)
+        assert 1 < len(shards) <= 8
+        assert [doc for shard in shards for doc in shard] == docs
+
+    def test_more_shards_than_documents(self):
+        """分片数量不超过文档数量"""
+        docs = _make_documents(3)
+        shards = shard_documents(docs, 16)
+        assert len(shards) <= 3
+        assert [doc for shard in shards for doc in shard] == docs
+
+    def test_empty_documents(self):
+        assert shard_documents([], 4) == []
+
+
+class TestParallelSplitDocuments:
+    """测试多进程分割结果与串行分割一致"""
+
+    @classmethod
+    def teardown_class(cls):
+        shutdown_process_pool()
+
+    @pytest.mark.parametrize("max_workers", [1, 2])
+    def test_same_as_serial(self, max_workers):
+        docs = _make_documents(40)
+        serial_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            chunk_size=64,
+            chunk_overlap=16,
+            add_start_index=True,
+            separators=SEPARATORS,
+        )
+        expected = serial_splitter.split_documents(docs)
+
+        result = parallel_split_documents(
+            docs,
+            chunk_size=64,
+            chunk_overlap=16,
+            separators=SEPARATORS,
+            max_workers=max_workers,
+        )
+
+        assert [d.page_content for d in result] == [d.page_content for d in expected]
+        assert [d.metadata for d in result] == [d.metadata for d in expected]
+        assert all("start_index" in d.metadata for d in result)
@@ -0,0 +1,146 @@
+"""
+文本块近似重复过滤单元测试
+"""
+
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from agent_server.app.rag.document_transformer.redundant_chunk_filter import (
+    filter_redundant_chunks,
+    find_non_redundant_indices,
+)
+
+
+def _embeddings_with_duplicates(n_unique: int, dim: int = 64, seed: int = 42):
+    """生成 n_unique 个随机向量，并在其后追加每个向量的近似重复"""
+    rng = np.random.default_rng(seed)
+    unique = rng.standard_normal((n_unique, dim)).astype(np.float32)
+    duplicates = unique + rng.normal(scale=0.01, size=unique.shape).astype(np.float32)
+    return np.vstack([unique, duplicates])
+
+
+class TestFindNonRedundantIndices:
+    """测试近似重复文本块的查找"""
+
+    @pytest.mark.parametrize("exact_max_chunks", [10000, 0])
+    def test_keeps_first_occurrence(self, exact_max_chunks):
+        """精确比较与 LSH 都只保留每组近似重复中最先出现的文本块"""
+        embeddings = _embeddings_with_duplicates(200)
+        keep = find_non_redundant_indices(
+            embeddings,
+            similarity_threshold=0.95,
+            block_size=64,
+            exact_max_chunks=exact_max_chunks,
+        )
+        assert keep == list(range(200))
+
+    def test_duplicates_within_block(self):
+        """同一个计算块内的重复也会被过滤"""
+        embeddings = [[1.0, 0.0], [0.0, 1.0], [1.0, 0.001], [0.0, 2.0]]
+        assert find_non_redundant_indices(embeddings, block_size=16) == [0, 1]
+
+    def test_no_duplicates(self):
+        embeddings = np.eye(8, dtype=np.float32)
+        assert find_non_redundant_indices(embeddings) == list(range(8))
+
+    def test_empty(self):
+        assert find_non_redundant_indices([]) == []
+
+
+class TestFilterRedundantChunks:
+    """测试文本块过滤"""
+
+    def test_filter_documents_and_embeddings(self):
+        docs = [Document(page_content=f"chunk-{i}", metadata={"start_index": i}) for i in range(3)]
+        embeddings = [[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]]
+
+        kept_docs, kept_embeddings = filter_redundant_chunks(docs, embeddings)
+
+        assert [d.page_content for d in kept_docs] == ["chunk-0", "chunk-2"]
+        assert kept_embeddings == [[1.0, 0.0], [0.0, 1.0]]
+
+    def test_length_mismatch(self):
+        with pytest.raises(ValueError):
+            filter_redundant_chunks([Document(page_content="a")], [])
+
+
+class CountingEmbeddings:
+    def __init__(self, vectors: dict[str, list[float]]):
+        self.vectors = vectors
+        self.calls: list[list[str]] = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [self.vectors[text] for text in texts]
+
+
+class FakeStore:
+    def __init__(self):
+        self.added_embeddings = []
+        self.added_documents = []
+
+    def add_embeddings(self, texts, embeddings, metadatas, ids=None):
+        self.added_embeddings.append((texts, embeddings, metadatas))
+        return ids or [f"id-{i}" for i in range(len(texts))]
+
+    def add_documents(self, docs, ids=None):
+        self.added_documents.append(docs)
+        return ids or [f"id-{i}" for i in range(len(docs))]
+
+
+class TestAddToVectorStore:
+    """测试入库时过滤重复文本块并复用过滤时计算的嵌入向量"""
+
+    @pytest.fixture
+    def service(self):
+        from agent_server.app.rag.vector_store.base import VsService
+
+        class FakeVsService(VsService):
+            save_vector_store = get_vector_store = get_vector_store_retriever = lambda self, *args: None
+
+        service = FakeVsService.__new__(FakeVsService)
+        service.embeddings = CountingEmbeddings({"a": [1.0, 0.0], "a'": [1.0, 0.001], "b": [0.0, 1.0]})
+        service.store = FakeStore()
+        return service
+
+    def test_embeds_once_and_writes_vectors(self, service):
+        from agent_server.app.rag.vector_store import base
+
+        docs = [Document(page_content=text, metadata={"i": i}) for i, text in enumerate(["a", "a'", "b"])]
+        with patch.object(base.Settings.kn_settings, "ENABLE_REDUNDANT_FILTER", True):
+            ids = service.add_to_vector_store(docs)
+
+        assert ids == ["id-0", "id-1"]
+        # 只嵌入一次，过滤时的向量直接写入向量库
+        assert service.embeddings.calls == [["a", "a'", "b"]]
+        assert service.store.added_embeddings == [(["a", "b"], [[1.0, 0.0], [0.0, 1.0]], [{"i": 0}, {"i": 2}])]
+        assert service.store.added_documents == []
+
+    def test_filter_disabled_writes_documents(self, service):
+        from agent_server.app.rag.vector_store import base
+
+        docs = [Document(page_content="a"), Document(page_content="a'")]
+        with patch.object(base.Settings.kn_settings, "ENABLE_REDUNDANT_FILTER", False):
+            service.add_to_vector_store(docs)
+
+        assert service.embeddings.calls == []
+        assert service.store.added_documents == [docs]
+
+    @pytest.mark.parametrize("enable_filter", [True, False])
+    def test_deterministic_ids(self, service, enable_filter):
+        """测试按前缀生成的文本块 id 在重试时保持不变，过滤掉的文本块不影响其它文本块的 id"""
+        from agent_server.app.rag.vector_store import base
+
+        def write():
+            docs = [Document(page_content=text) for text in ["a", "a'", "b"]]
+            with patch.object(base.Settings.kn_settings, "ENABLE_REDUNDANT_FILTER", enable_filter):
+                return service.add_to_vector_store(docs, id_prefix="kn:hash:0")
+
+        first, retry = write(), write()
+        expected = base.make_chunk_ids("kn:hash:0", 3)
+        assert first == retry == ([expected[0], expected[2]] if enable_filter else expected)
+        assert len(set(expected)) == 3
+        assert base.make_chunk_ids("kn:hash:1", 3)[0] not in expected
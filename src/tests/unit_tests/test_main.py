@@ -0,0 +1,78 @@
+"""
+服务入口单元测试
+
+测试按服务角色挂载路由，以及进程内共享的 Redis 连接池
+"""
+
+import pytest
+import redis
+
+from agent_server import main
+from agent_server.app.chat import chat_service
+from agent_server.config.settings import Settings
+from agent_server.utils import redis_util
+
+
+def api_groups(app) -> set[str]:
+    return {path.split("/")[2] for path in app.openapi()["paths"] if path.startswith("/api/")}
+
+
+class TestApiRole:
+    def test_all(self):
+        app = main.create_app(role="all")
+
+        assert app.state.role == "all"
+        assert {"chat", "prompt", "conversation", "rag", "upload", "monitor"} <= api_groups(app)
+
+    def test_chat_and_ingest_are_disjoint(self):
+        chat_groups = api_groups(main.create_app(role="chat"))
+        ingest_groups = api_groups(main.create_app(role="ingest"))
+
+        assert {"chat", "prompt", "conversation"} <= chat_groups
+        assert not {"rag", "upload"} & chat_groups
+        assert {"rag", "upload"} <= ingest_groups
+        assert not {"chat", "prompt", "conversation"} & ingest_groups
+        # 探测与监控接口所有角色都挂载
+        assert "monitor" in chat_groups and "monitor" in ingest_groups
+
+    def test_role_from_env(self, monkeypatch):
+        monkeypatch.setenv(main.API_ROLE_ENV, "ingest")
+        assert main.get_api_role() == "ingest"
+        assert main.get_api_role("chat") == "chat"
+
+    def test_invalid_role(self):
+        with pytest.raises(ValueError):
+            main.get_api_role("admin")
+
+
+class TestRedisPool:
+    def test_shared_pool_and_reset_after_fork(self):
+        redis_util.close_redis_pool()
+        pool = redis_util.get_redis_pool()
+
+        assert redis_util.get_redis_client().connection_pool is pool
+        assert redis_util.get_redis_pool() is pool
+
+        redis_util._reset_after_fork()
+        assert redis_util.get_redis_pool() is not pool
+        redis_util.close_redis_pool()
+
+    def test_blocking_pool(self):
+        redis_util.close_redis_pool()
+        pool = redis_util.get_redis_pool()
+
+        # 连接数用尽时等待空闲连接，而不是立即抛出 "Too many connections"
+        assert isinstance(pool, redis.BlockingConnectionPool)
+        assert pool.max_connections == Settings.basic_settings.REDIS_MAX_CONNECTIONS
+        assert pool.timeout == Settings.basic_settings.REDIS_POOL_TIMEOUT
+        redis_util.close_redis_pool()
+
+    def test_chat_history_uses_shared_pool(self):
+        redis_util.close_redis_pool()
+        histories = [
+            chat_service.TracedRedisChatMessageHistory(session_id=str(i), key_prefix="test:") for i in range(2)
+        ]
+
+        assert chat_service.get_redis_client is redis_util.get_redis_client
+        assert all(history.redis_client.connection_pool is redis_util.get_redis_pool() for history in histories)
+        redis_util.close_redis_pool()
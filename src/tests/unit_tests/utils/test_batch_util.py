@@ -0,0 +1,122 @@
+"""
+动态批处理单元测试
+
+测试并发输入的合并、批次上限、等待窗口、异常分发与取消，以及多个事件循环同时使用一个批处理器
+"""
+
+import asyncio
+import gc
+import threading
+
+import pytest
+
+from agent_server.utils.batch_util import MicroBatcher
+
+
+def make_batcher(batches: list, max_batch_size: int = 8, max_wait_ms: float = 20, error: Exception | None = None):
+    async def func(items: list[int]) -> list[int]:
+        batches.append(list(items))
+        await asyncio.sleep(0.01)
+        if error:
+            raise error
+        return [item * 10 for item in items]
+    return MicroBatcher(func, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name="test")
+
+
+class TestMicroBatcher:
+    @pytest.mark.asyncio
+    async def test_concurrent_submits_merged(self):
+        batches = []
+        batcher = make_batcher(batches)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        assert results == [0, 10, 20, 30, 40]
+        assert batches == [[0, 1, 2, 3, 4]]
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size_flushes_immediately(self):
+        batches = []
+        batcher = make_batcher(batches, max_batch_size=4, max_wait_ms=1000)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(8)))
+        # 批次满时不等待窗口结束
+        assert loop.time() - start < 0.5
+        assert results == [i * 10 for i in range(8)]
+        assert batches == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+    @pytest.mark.asyncio
+    async def test_submit_many_split_across_batches(self):
+        batches = []
+        batcher = make_batcher(batches, max_batch_size=3)
+        first, second = await asyncio.gather(batcher.submit_many([1, 2]), batcher.submit_many([3, 4, 5, 6]))
+        assert (first, second) == ([10, 20], [30, 40, 50, 60])
+        assert batches == [[1, 2, 3], [4, 5, 6]]
+
+    @pytest.mark.asyncio
+    async def test_wait_window(self):
+        batches = []
+        batcher = make_batcher(batches, max_wait_ms=30)
+        first = asyncio.create_task(batcher.submit(1))
+        await asyncio.sleep(0.005)
+        second = asyncio.create_task(batcher.submit(2))
+        assert await asyncio.gather(first, second) == [10, 20]
+        assert batches == [[1, 2]]
+
+        # 窗口结束后提交的输入进入下一个批次
+        assert await batcher.submit(3) == 30
+        assert batches == [[1, 2], [3]]
+
+    @pytest.mark.asyncio
+    async def test_error_fans_out(self):
+        batcher = make_batcher([], error=RuntimeError("model down"))
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) and str(r) == "model down" for r in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_affect_batch(self):
+        batches = []
+        batcher = make_batcher(batches)
+        cancelled = asyncio.create_task(batcher.submit(1))
+        kept = asyncio.create_task(batcher.submit(2))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        assert await kept == 20
+        assert cancelled.cancelled()
+        assert batches == [[1, 2]]
+
+
+class TestMicroBatcherLoops:
+    def test_two_loops_concurrently(self):
+        """两个线程各自运行事件循环，同时提交时各自凑批，都能拿到结果"""
+        batches = []
+        batcher = make_batcher(batches, max_batch_size=100, max_wait_ms=50)
+        barrier = threading.Barrier(2)
+        results: dict[int, list[int]] = {}
+
+        async def submit_all(offset: int) -> list[int]:
+            # 两个事件循环的输入同时处于等待窗口内
+            barrier.wait()
+            return await asyncio.gather(*(batcher.submit(offset + i) for i in range(3)))
+
+        def run(offset: int) -> None:
+            results[offset] = asyncio.run(asyncio.wait_for(submit_all(offset), timeout=2))
+
+        threads = [threading.Thread(target=run, args=(offset,)) for offset in (0, 100)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert results == {0: [0, 10, 20], 100: [1000, 1010, 1020]}
+        # 不同事件循环的输入不合并
+        assert sorted(batches) == [[0, 1, 2], [100, 101, 102]]
+
+    def test_sequential_loops_and_state_released(self):
+        """每个用例一个事件循环时依次使用，事件循环关闭回收后不保留其状态"""
+        batches = []
+        batcher = make_batcher(batches)
+        assert asyncio.run(batcher.submit(1)) == 10
+        assert asyncio.run(batcher.submit(2)) == 20
+        assert batches == [[1], [2]]
+        gc.collect()
+        assert len(batcher._states) == 0
@@ -0,0 +1,56 @@
+"""
+上传文件保存单元测试
+
+测试分块保存时计算的 SHA-256 与文件大小、按内容哈希命名去重，以及失败时清理临时文件
+"""
+
+import hashlib
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from agent_server.utils import file_util
+from agent_server.utils.file_util import save_upload_file
+
+
+def make_upload(content: bytes, filename: str = "Report.PDF") -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+class TestSaveUploadFile:
+    @pytest.mark.asyncio
+    async def test_hash_size_and_name(self, tmp_path, monkeypatch):
+        # 使用较小的块，覆盖多次读取
+        monkeypatch.setattr(file_util, "UPLOAD_CHUNK_SIZE", 7)
+        content = b"research agent " * 100
+
+        path, file_hash, size = await save_upload_file(make_upload(content), tmp_path / "docs")
+
+        assert file_hash == hashlib.sha256(content).hexdigest()
+        assert size == len(content)
+        assert path == tmp_path / "docs" / f"{file_hash}.pdf"
+        assert path.read_bytes() == content
+
+    @pytest.mark.asyncio
+    async def test_same_content_saved_once(self, tmp_path):
+        first = await save_upload_file(make_upload(b"same", "a.txt"), tmp_path)
+        second = await save_upload_file(make_upload(b"same", "b.txt"), tmp_path)
+        other = await save_upload_file(make_upload(b"other", "a.txt"), tmp_path)
+
+        assert first == second
+        assert other[1] != first[1]
+        # 只留下按哈希命名的文件，没有遗留的临时文件
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted([first[0].name, other[0].name])
+
+    @pytest.mark.asyncio
+    async def test_failed_upload_removes_part_file(self, tmp_path):
+        upload = make_upload(b"partial")
+
+        async def broken_read(size: int = -1) -> bytes:
+            raise ConnectionResetError("client disconnected")
+
+        upload.read = broken_read
+        with pytest.raises(ConnectionResetError):
+            await save_upload_file(upload, tmp_path)
+        assert list(tmp_path.iterdir()) == []
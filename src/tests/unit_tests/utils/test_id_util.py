@@ -0,0 +1,210 @@
+"""
+雪花ID生成器单元测试
+
+多线程共用一个生成器、多进程（fork）各自分配节点ID时生成的ID不重复；Redis 租约使用内存中的替身
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from agent_server.utils import id_util
+from agent_server.utils.id_util import (
+    MAX_NODE_ID,
+    MAX_SEQUENCE,
+    MULTI_PROCESS_ENV,
+    SnowflakeGenerator,
+    WorkerIdLease,
+    WORKER_ID_ENV,
+)
+
+
+class FakeLeaseRedis:
+    """只实现租约用到的命令，多个生成器共享同一份数据以模拟多个进程"""
+
+    def __init__(self):
+        self.data: dict = {}
+        self._lock = threading.Lock()
+
+    def set(self, key, value, nx=False, ex=None):
+        with self._lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value
+            return True
+
+    def eval(self, script, numkeys, key, owner, *args):
+        with self._lock:
+            if self.data.get(key) != owner:
+                return 0
+            if "del" in script:
+                del self.data[key]
+            return 1
+
+
+def unavailable_redis():
+    raise ConnectionError("redis unavailable")
+
+
+def make_generator(client_factory=unavailable_redis) -> SnowflakeGenerator:
+    return SnowflakeGenerator(lease=WorkerIdLease(client_factory=client_factory, prefix="test:snowflake:"))
+
+
+def _generate_in_child(generator: SnowflakeGenerator, count: int, conn) -> None:
+    conn.send((generator.node_id, generator.next_ids(count // 2) + [generator.next_id() for _ in range(count // 2)]))
+    conn.close()
+
+
+@pytest.fixture(autouse=True)
+def no_worker_id_env(monkeypatch):
+    monkeypatch.delenv(WORKER_ID_ENV, raising=False)
+    monkeypatch.delenv(MULTI_PROCESS_ENV, raising=False)
+
+
+class TestSnowflakeGenerator:
+    def test_threads_no_collision(self):
+        """多线程同时调用 next_id / next_ids 不产生重复ID"""
+        generator = SnowflakeGenerator(1, 1)
+
+        def worker(index: int) -> list[int]:
+            if index % 2:
+                return [generator.next_id() for _ in range(5000)]
+            return [i for _ in range(50) for i in generator.next_ids(100)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(worker, range(8)))
+
+        ids = [i for result in results for i in result]
+        assert len(ids) == len(set(ids)) == 40000
+        # 每个线程拿到的ID递增
+        assert all(result == sorted(result) for result in results)
+
+    # 测试进程中有日志等后台线程，子进程只生成ID，不受 fork 警告影响
+    @pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning")
+    def test_processes_no_collision(self):
+        """fork 出的子进程重新分配节点ID，与父进程及其它子进程生成的ID不重复"""
+        generator = make_generator()
+        parent_ids = generator.next_ids(1000)
+
+        ctx = multiprocessing.get_context("fork")
+        pipes, processes = [], []
+        for _ in range(4):
+            receiver, sender = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_generate_in_child, args=(generator, 20000, sender))
+            process.start()
+            pipes.append(receiver)
+            processes.append(process)
+        results = [receiver.recv() for receiver in pipes]
+        for process in processes:
+            process.join(10)
+
+        node_ids = {node_id for node_id, _ in results} | {generator.node_id}
+        assert len(node_ids) == 5
+        ids = parent_ids + [i for _, child_ids in results for i in child_ids]
+        assert len(ids) == len(set(ids)) == 81000
+
+    def test_next_ids_spans_milliseconds(self):
+        """批量生成超过单毫秒序列号上限时等待下一毫秒，结果与逐个生成一致地递增"""
+        generator = SnowflakeGenerator(0, 3)
+        ids = generator.next_ids(3 * (MAX_SEQUENCE + 1) + 10)
+        assert len(set(ids)) == len(ids)
+        assert ids == sorted(ids)
+        assert len({i >> 22 for i in ids}) >= 4
+        assert {(i >> 12) & MAX_NODE_ID for i in ids} == {3}
+
+    def test_sequence_exhausted_sleeps(self):
+        """序列号用完时休眠到下一毫秒，而不是空转"""
+        generator = SnowflakeGenerator(1, 1)
+        now = 1_700_000_000_000
+        clock = iter([now, now, now + 1])
+        generator.last_timestamp, generator.sequence = now, MAX_SEQUENCE
+        with patch.object(id_util, "_current_millis", lambda: next(clock)), \
+                patch.object(id_util.time, "sleep") as sleep:
+            new_id = generator.next_id()
+        sleep.assert_called_once_with(0.001)
+        assert new_id >> 22 == now + 1 - id_util.EPOCH
+        assert new_id & MAX_SEQUENCE == 0
+
+    def test_clock_backward(self):
+        """小幅时钟回拨时等待，大幅回拨时报错"""
+        generator = SnowflakeGenerator(1, 1)
+        now = 1_700_000_000_000
+        generator.last_timestamp, generator.sequence = now, 5
+        clock = iter([now - 3, now])
+        with patch.object(id_util, "_current_millis", lambda: next(clock)), patch.object(id_util.time, "sleep"):
+            assert generator.next_id() & MAX_SEQUENCE == 6
+
+        with patch.object(id_util, "_current_millis", lambda: now - 1000):
+            with pytest.raises(ValueError):
+                generator.next_id()
+
+
+class TestNodeIdAssignment:
+    def test_env(self, monkeypatch):
+        monkeypatch.setenv(WORKER_ID_ENV, "70")
+        generator = make_generator()
+        assert (generator.node_id, generator.node_source) == (70, "env")
+        assert (generator.datacenter_id, generator.worker_id) == (2, 6)
+
+        monkeypatch.setenv(WORKER_ID_ENV, "1024")
+        with pytest.raises(ValueError):
+            make_generator().next_id()
+
+    def test_redis_lease_unique_across_generators(self):
+        """共享同一个 Redis 的多个生成器各自租到不同的节点ID"""
+        redis = FakeLeaseRedis()
+        with patch.object(WorkerIdLease, "_start_renewal"):
+            generators = [make_generator(lambda: redis) for _ in range(5)]
+            with ThreadPoolExecutor(max_workers=5) as pool:
+                results = list(pool.map(lambda g: g.next_ids(5000), generators))
+
+        assert {g.node_source for g in generators} == {"redis"}
+        assert len({g.node_id for g in generators}) == 5
+        assert len(redis.data) == 5
+        ids = [i for result in results for i in result]
+        assert len(ids) == len(set(ids))
+
+        lease = generators[0]._lease
+        node_id = lease.node_id
+        lease.release()
+        assert lease.key(node_id) not in redis.data
+
+    def test_lease_lost_reassigns(self):
+        """续期发现租约丢失后重新租用"""
+        redis = FakeLeaseRedis()
+        with patch.object(WorkerIdLease, "_start_renewal"):
+            generator = make_generator(lambda: redis)
+            old_node_id = generator.node_id
+            lease = generator._lease
+            # 租约过期后被其它进程占用
+            redis.data[lease.key(old_node_id)] = "other"
+            assert not lease.renew()
+            lease.on_lost()
+            assert generator.node_id != old_node_id
+            assert generator.node_source == "redis"
+
+    def test_fallback_to_pid(self):
+        generator = make_generator()
+        with patch.object(id_util.logger, "warning") as warning:
+            assert (generator.node_id, generator.node_source) == (os.getpid() & MAX_NODE_ID, "pid")
+        assert "单进程" in warning.call_args.args[0]
+
+    def test_multi_process_fails_fast(self, monkeypatch):
+        """多进程部署时不退回到按进程号分配"""
+        monkeypatch.setenv(MULTI_PROCESS_ENV, "1")
+        with pytest.raises(RuntimeError, match=WORKER_ID_ENV):
+            make_generator().next_id()
+
+        # 配置了节点ID或可以租用时正常分配
+        redis = FakeLeaseRedis()
+        with patch.object(WorkerIdLease, "_start_renewal"):
+            generator = make_generator(lambda: redis)
+            generator.next_id()
+            assert generator.node_source == "redis"
+        monkeypatch.setenv(WORKER_ID_ENV, "7")
+        generator = make_generator()
+        assert (generator.node_id, generator.node_source) == (7, "env")
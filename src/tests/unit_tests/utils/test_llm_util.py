@@ -0,0 +1,78 @@
+"""
+模型索引单元测试
+
+测试 ModelRegistry 的索引查询、默认模型与配置重新加载后的重建
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from agent_server.config.settings import ModelSettings, PlatformConfig
+from agent_server.utils import llm_util
+from agent_server.utils.llm_util import ModelRegistry
+
+
+def make_model_settings(**kwargs) -> ModelSettings:
+    platforms = [
+        PlatformConfig(platform_name="deepseek", platform_type="deepseek", api_key="k1",
+                       llm_models=["deepseek-chat", "deepseek-reasoner"]),
+        PlatformConfig(platform_name="dashscope", platform_type="dashscope", api_key="k2",
+                       llm_models=["qwen-max"], embed_models=["text-embedding-v3"]),
+        PlatformConfig(platform_name="ollama", platform_type="ollama", api_base_url="http://127.0.0.1:11434/v1",
+                       llm_models=["qwen-max"], embed_models=["bge-m3"]),
+    ]
+    kwargs.setdefault("DEFAULT_LLM_MODEL", "deepseek-chat")
+    kwargs.setdefault("DEFAULT_EMBEDDING_MODEL", "bge-m3")
+    return ModelSettings(MODEL_PLATFORMS=platforms, **kwargs)
+
+
+class TestModelRegistry:
+    """测试模型索引"""
+
+    def test_index(self):
+        """测试按名称、类型、平台查询"""
+        registry = ModelRegistry(make_model_settings())
+
+        assert list(registry.models(model_type="llm")) == ["deepseek-chat", "deepseek-reasoner", "qwen-max"]
+        assert list(registry.models(model_type="embed", platform_type="dashscope")) == ["text-embedding-v3"]
+        assert registry.get("deepseek-chat")["api_key"] == "k1"
+        # 同名模型未指定平台时取最后配置的平台
+        assert registry.get("qwen-max")["platform_type"] == "ollama"
+        assert registry.get("qwen-max", platform_type="dashscope")["api_key"] == "k2"
+        assert registry.get("missing") is None
+        assert len(registry.by_name["qwen-max"]) == 2
+        assert registry.platform_configs["ollama"].api_base_url == "http://127.0.0.1:11434/v1"
+
+    def test_immutable(self):
+        """测试索引不可修改"""
+        registry = ModelRegistry(make_model_settings())
+        with pytest.raises(TypeError):
+            registry.get("deepseek-chat")["api_key"] = "changed"
+        with pytest.raises(TypeError):
+            registry.models(model_type="llm")["new"] = {}
+
+    def test_default_fallback(self):
+        """测试默认模型不可用时使用该类型的第一个模型"""
+        registry = ModelRegistry(make_model_settings(DEFAULT_LLM_MODEL="gpt-4o", DEFAULT_EMBEDDING_MODEL="missing"))
+        assert registry.default_llm == "deepseek-chat"
+        assert registry.default_embedding == "text-embedding-v3"
+
+
+class TestModelRegistryRebuild:
+    """测试配置快照变化后重建索引"""
+
+    def test_rebuild_on_new_snapshot(self):
+        """测试 ModelSettings 快照变化后首次访问时重建"""
+        first, second = make_model_settings(), make_model_settings(DEFAULT_LLM_MODEL="qwen-max")
+        with patch.object(llm_util, "Settings") as settings, patch.object(llm_util, "_registry", None):
+            settings.model_settings = first
+            registry = llm_util.get_model_registry()
+            assert llm_util.get_model_registry() is registry
+            assert llm_util.get_default_llm() == "deepseek-chat"
+            assert llm_util.get_model_info("deepseek-chat", platform_type="deepseek")["model_type"] == "llm"
+            assert list(llm_util.get_config_models(model_name="bge-m3")) == ["bge-m3"]
+
+            settings.model_settings = second
+            assert llm_util.get_model_registry() is not registry
+            assert llm_util.get_default_llm() == "qwen-max"
@@ -0,0 +1,78 @@
+"""
+冷启动分析单元测试
+
+测试 importtime 输出解析、导入树输出，以及导入 agent_server.main 的耗时与内存预算（CI 基准）
+预算可通过环境变量 COLD_START_MAX_SECONDS、COLD_START_MAX_RSS_MB 调整
+"""
+
+import os
+
+import pytest
+
+from agent_server.utils.startup_profile import (
+    DEFERRED_MODULES,
+    measure_cold_start,
+    parse_importtime,
+    render_tree,
+)
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+AGENT_DIR = os.path.join(SRC_DIR, "agent_server")
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     b.c
+import time:       200 |        300 |   b
+import time:        50 |         50 |   d
+import time:      1000 |       1350 | a
+import time:         5 |          5 | e
+"""
+
+
+class TestParseImporttime:
+    def test_builds_tree(self):
+        roots = parse_importtime(IMPORTTIME_OUTPUT)
+
+        assert [n.name for n in roots] == ["a", "e"]
+        a = roots[0]
+        assert (a.self_us, a.cumulative_us) == (1000, 1350)
+        assert [n.name for n in a.children] == ["b", "d"]
+        assert [n.name for n in a.children[0].children] == ["b.c"]
+
+    def test_ignores_other_lines(self):
+        assert parse_importtime("ROOT: .\nTraceback ...\n") == []
+
+    def test_render_tree_filters_and_sorts(self):
+        text = render_tree(parse_importtime(IMPORTTIME_OUTPUT), min_ms=0.08)
+        names = [line.split()[-1] for line in text.splitlines()[1:]]
+
+        assert names == ["a", "b", "b.c"]
+
+    def test_render_tree_max_depth(self):
+        text = render_tree(parse_importtime(IMPORTTIME_OUTPUT), min_ms=0, max_depth=1)
+        names = [line.split()[-1] for line in text.splitlines()[1:]]
+
+        assert names == ["a", "e"]
+
+
+@pytest.fixture(scope="module")
+def profile():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC_DIR, AGENT_DIR, env.get("PYTHONPATH")]))
+    env.setdefault("RESEARCHAGENT_LANGCHAIN_AGENT_ROOT", AGENT_DIR)
+    return measure_cold_start("agent_server.main", env=env, cwd=SRC_DIR)
+
+
+class TestColdStart:
+    def test_deferred_modules_not_loaded(self, profile):
+        # 重量级依赖只能在首次使用时导入
+        assert profile.loaded_deferred_modules == [], f"启动时加载了 {profile.loaded_deferred_modules}"
+        assert "torch" in DEFERRED_MODULES
+
+    def test_import_time_budget(self, profile):
+        budget = float(os.getenv("COLD_START_MAX_SECONDS", "6"))
+        assert profile.import_seconds <= budget, f"导入耗时 {profile.import_seconds:.2f}s 超过预算 {budget}s"
+
+    def test_rss_budget(self, profile):
+        budget = float(os.getenv("COLD_START_MAX_RSS_MB", "300"))
+        assert profile.max_rss_mb <= budget, f"启动内存 {profile.max_rss_mb:.0f}MB 超过预算 {budget}MB"